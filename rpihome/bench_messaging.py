@@ -0,0 +1,258 @@
+#!/usr/bin/python3
+""" bench_messaging.py: Prints the cost of the inter-process messaging paths, each against the
+    path it replaced.  Timings depend on the machine and how busy it is, so they are reported
+    here rather than checked by the tests.
+    Usage: bench_messaging.py
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import timeit
+from modules.channel import PriorityChannel
+from modules.message import Message
+from modules.router import PeerChannels, Router
+from modules.wakeup import wait_for_input
+from modules.work_queue import WorkQueue
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+def peer_latency(count=2000):
+    """ Per-message latency p11 -> p16 through a relay thread standing in for p00, against the
+    direct peer channel """
+    p00_queue = multiprocessing.Queue(-1)
+    p16_queue = multiprocessing.Queue(-1)
+    router = Router()
+    router.add_route("16", p16_queue)
+    running = [True]
+
+    def relay():
+        while running[0]:
+            try:
+                router.route(Message(raw=p00_queue.get(timeout=0.05)))
+            except queue.Empty:
+                pass
+
+    def measure(channels):
+        start = time.perf_counter()
+        for i in range(count):
+            channels.put_nowait("11,16,161,fylt1,on")
+            p16_queue.get(timeout=5)
+        return (time.perf_counter() - start) / count
+
+    relay_thread = threading.Thread(target=relay)
+    relay_thread.start()
+    try:
+        relayed = measure(PeerChannels(p00_queue))
+        direct = measure(PeerChannels(p00_queue, {"16": p16_queue}))
+    finally:
+        running[0] = False
+        relay_thread.join()
+    return "p11->p16 latency: relayed %.1f us (2 hops), direct %.1f us (1 hop)" % (relayed * 1e6, direct * 1e6)
+
+
+
+# Baseline Message Class **************************************************************************
+class BaselineMessage(object):
+    """ Frozen copy of the Message class as it was before __slots__ and the packed form, kept
+    so message_codec() times the new class against the one it replaced """
+    def __init__(self, logger=None, **kwargs):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.source = str()
+        self.dest = str()
+        self.type = str()
+        self.name = str()
+        self.payload = str()
+        self.part = []
+        # Process input variables if present
+        if kwargs is not None:
+            for key, value in kwargs.items():
+                if key == "source":
+                    self.source = value
+                if key == "dest":
+                    self.dest = value
+                if key == "type":
+                    self.type = value
+                if key == "name":
+                    self.name = value
+                if key == "payload":
+                    self.payload = value
+                if key == "raw":
+                    self.raw = value
+
+    @property
+    def raw(self):
+        return (self.source + "," + self.dest + "," + self.type + "," +
+                self.name + "," + self.payload)
+
+    @raw.setter
+    def raw(self, value):
+        if isinstance(value, str) is True:
+            self.part = value.split(sep=",", maxsplit=4)
+            if len(self.part) >= 1:
+                self.source = self.part[0]
+            if len(self.part) >= 2:
+                self.dest = self.part[1]
+            if len(self.part) >= 3:
+                self.type = self.part[2]
+            if len(self.part) >= 4:
+                self.name = self.part[3]
+            if len(self.part) >= 5:
+                self.payload = self.part[4]
+
+    @property
+    def source(self):
+        return self.__source
+
+    @source.setter
+    def source(self, value):
+        if isinstance(value, str) is True:
+            self.__source = value
+
+    @property
+    def dest(self):
+        return self.__dest
+
+    @dest.setter
+    def dest(self, value):
+        if isinstance(value, str) is True:
+            self.__dest = value
+
+    @property
+    def type(self):
+        return self.__type
+
+    @type.setter
+    def type(self, value):
+        if isinstance(value, str) is True:
+            self.__type = value
+
+    @property
+    def name(self):
+        return self.__name
+
+    @name.setter
+    def name(self, value):
+        if isinstance(value, str) is True:
+            self.__name = value
+
+    @property
+    def payload(self):
+        return self.__payload
+
+    @payload.setter
+    def payload(self, value):
+        if isinstance(value, str) is True:
+            self.__payload = value
+
+
+
+def message_codec(number=20000):
+    """ Cost of constructing, serializing and parsing a message, the baseline class against the
+    current one in both wire forms.  The gain is in constructing and parsing, and comes from
+    __slots__ and plain attributes in place of the validating setters; the packed form costs
+    about the same to build as the csv one and is there for its size, commas in payloads and the
+    correlation id, not for speed """
+    fields = dict(source="11", dest="16", type="161", name="fylt1", payload="on")
+    old, new = BaselineMessage(**fields), Message(**fields)
+    raw, packed = new.raw, new.packed
+
+    def cost(function):
+        return timeit.timeit(function, number=number) / number * 1e6
+
+    lines = ["Message cost (us)   baseline      csv   packed"]
+    lines.append("  construct         %8.2f %8.2f %8s" % (cost(lambda: BaselineMessage(**fields)),
+                                                          cost(lambda: Message(**fields)), "-"))
+    lines.append("  serialize         %8.2f %8.2f %8.2f" % (cost(lambda: old.raw), cost(lambda: new.raw),
+                                                            cost(lambda: new.packed)))
+    lines.append("  parse             %8.2f %8.2f %8.2f" % (cost(lambda: BaselineMessage(raw=raw)),
+                                                            cost(lambda: Message(raw=raw)),
+                                                            cost(lambda: Message(raw=packed))))
+    return "\n".join(lines)
+
+
+def work_queue(number=2000):
+    """ Per-message cost of the internal work stage: multiprocessing.Queue (pack, pickle, feeder
+    thread, pipe, unpack) against the in-process WorkQueue """
+    msg = Message(source="16", dest="11", type="160A", name="fylt1", payload="found")
+    mp_queue = multiprocessing.Queue(-1)
+    start = time.perf_counter()
+    for i in range(number):
+        mp_queue.put_nowait(msg.packed)
+        Message(raw=mp_queue.get(timeout=5))
+    mp_cost = (time.perf_counter() - start) / number
+    mp_queue.close()
+    deque = WorkQueue()
+    start = time.perf_counter()
+    for i in range(number):
+        deque.put_nowait(msg)
+        deque.get_nowait()
+    deque_cost = (time.perf_counter() - start) / number
+    return "Work queue per-message cost: multiprocessing.Queue %.2f us, WorkQueue %.2f us" % (mp_cost * 1e6, deque_cost * 1e6)
+
+
+def flooded_service(channel, result):
+    """ Minimal service loop: drains its incoming queue, spending 1 ms on each data message,
+    until a kill code arrives """
+    start = time.monotonic()
+    handled = 0
+    while True:
+        wait_for_input([channel], 1)
+        try:
+            msg = Message(raw=channel.get_nowait())
+        except queue.Empty:
+            continue
+        if msg.type == "999":
+            break
+        time.sleep(0.001)
+        handled += 1
+    result.put((time.monotonic() - start, handled))
+
+
+def shutdown_under_flood(count=5000):
+    """ How long a service that spends 1 ms per data message takes to see a kill code sent
+    behind a flood of data.  Through a single FIFO it would take over count ms """
+    channel = PriorityChannel(maxsize=0)
+    result = multiprocessing.Queue()
+    for i in range(count):
+        channel.put_nowait(Message(source="16", dest="11", type="160A", name="dev%d" % i, payload="found").packed)
+    service = multiprocessing.Process(target=flooded_service, args=(channel, result))
+    service.start()
+    time.sleep(0.2)
+    channel.put_nowait(Message(source="00", dest="11", type="999").packed)
+    elapsed, handled = result.get(timeout=30)
+    service.join(5)
+    # Unread data left in a lane must not hold up exit
+    for lane in channel.lanes:
+        lane.cancel_join_thread()
+    channel.close()
+    return "Kill code seen after %.2f s with %d of %d data messages handled" % (elapsed, handled, count)
+
+
+# Main Routine ************************************************************************************
+def main():
+    """ Main function called when run """
+    print(peer_latency())
+    print(message_codec())
+    print(work_queue())
+    print(shutdown_under_flood())
+
+
+# Run as Script ***********************************************************************************
+if __name__ == "__main__":
+    main()
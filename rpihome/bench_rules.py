@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+""" bench_rules.py: Runs each device's rules from the rules file and its hand-written class
+    through the same inputs (a week in steps, every combination of users home, with and without
+    someone just arriving), reports any input on which they set a different state, and prints
+    the cost of a check_rules() call for each.
+    Usage: bench_rules.py [rules file] [minutes per step]
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import datetime
+import itertools
+import logging
+import os
+import queue
+import sys
+import time
+from modules.rules import load_definitions
+from devices.device_rules import create_devices
+from devices.device_rpi_lr1 import RPImain
+from devices.device_wemo_br1lt1 import Wemo_br1lt1
+from devices.device_wemo_br1lt2 import Wemo_br1lt2
+from devices.device_wemo_br2lt1 import Wemo_br2lt1
+from devices.device_wemo_br2lt2 import Wemo_br2lt2
+from devices.device_wemo_br3lt1 import Wemo_br3lt1
+from devices.device_wemo_br3lt2 import Wemo_br3lt2
+from devices.device_wemo_cclt1 import Wemo_cclt1
+from devices.device_wemo_drlt1 import Wemo_drlt1
+from devices.device_wemo_ewlt1 import Wemo_ewlt1
+from devices.device_wemo_fylt1 import Wemo_fylt1
+from devices.device_wemo_lrlt1 import Wemo_lrlt1
+from devices.device_wemo_lrlt2 import Wemo_lrlt2
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Hand-written class for each device the rules file describes
+CLASSES = {"br1lt1": Wemo_br1lt1, "br1lt2": Wemo_br1lt2, "br2lt1": Wemo_br2lt1, "br2lt2": Wemo_br2lt2,
+           "br3lt1": Wemo_br3lt1, "br3lt2": Wemo_br3lt2, "cclt1": Wemo_cclt1, "drlt1": Wemo_drlt1,
+           "ewlt1": Wemo_ewlt1, "fylt1": Wemo_fylt1, "lrlt1": Wemo_lrlt1, "lrlt2": Wemo_lrlt2}
+
+
+def inputs(start, step, days=7):
+    """ Yields the check_rules() keyword arguments for every step over a number of days, with
+    every combination of users home, each either just arrived or home for a while """
+    when = start
+    while when < start + datetime.timedelta(days=days):
+        for home in itertools.product((False, True), repeat=3):
+            for arrived in (datetime.timedelta(minutes=-5), datetime.timedelta(minutes=-60)):
+                yield dict(datetime=when, homeArray=list(home), homeTime=[when + arrived] * 3,
+                           utcOffset=datetime.timedelta(hours=-6),
+                           sunriseOffset=datetime.timedelta(minutes=0), sunsetOffset=datetime.timedelta(minutes=0))
+        when += step
+
+
+def hand_written(name, msg_out_queue):
+    """ Returns the hand-written device for a name """
+    if name == "rpi":
+        return RPImain(name, msg_out_queue)
+    return CLASSES[name](name, "0.0.0.0", msg_out_queue)
+
+
+def compare(definition, cases, msg_out_queue):
+    """ Runs both versions of one device through the cases.  Returns the inputs on which they
+    disagreed and the seconds each took """
+    definition = dict(definition, enabled=True)
+    rules = create_devices([definition], msg_out_queue)[0][0]
+    written = hand_written(definition["name"], msg_out_queue)
+    states, timings = [], []
+    for device in (written, rules):
+        started = time.perf_counter()
+        states.append([device.check_rules(**kwargs) for kwargs in cases])
+        timings.append(time.perf_counter() - started)
+    mismatches = [kwargs for kwargs, a, b in zip(cases, states[0], states[1]) if a != b]
+    return mismatches, timings
+
+
+# Main Routine ************************************************************************************
+def main():
+    """ Main function called when run """
+    process_path = os.path.dirname(os.path.abspath(sys.argv[0]))
+    rules_file = sys.argv[1] if len(sys.argv) > 1 else process_path + "/devices/rules.json"
+    step = datetime.timedelta(minutes=int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    # Turning lights on and off is logged at info; keep it off the console
+    logging.getLogger().setLevel(logging.WARNING)
+    cases = list(inputs(datetime.datetime(2016, 11, 7), step))
+    msg_out_queue = queue.Queue()
+    print("%-8s %12s %12s %8s" % ("device", "class us", "rules us", "differ"))
+    for definition in load_definitions(rules_file):
+        if "rules" not in definition:
+            continue
+        mismatches, timings = compare(definition, cases, msg_out_queue)
+        print("%-8s %12.2f %12.2f %8d" % (definition["name"], timings[0] / len(cases) * 1e6,
+                                          timings[1] / len(cases) * 1e6, len(mismatches)))
+        for kwargs in mismatches[:5]:
+            print("    differs at %s home=%s" % (kwargs["datetime"], kwargs["homeArray"]))
+
+
+# Run as Script ***********************************************************************************
+if __name__ == "__main__":
+    main()
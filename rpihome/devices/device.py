@@ -5,8 +5,8 @@
 # Import Required Libraries (Standard, Third Party, Local) ****************************************
 import datetime
 import logging
-from rpihome.modules.sun import Sun
-from rpihome.modules.message import Message
+from modules.sun import LAT, LONG, ephemeris
+from modules.message import Message
 
 
 # Authorship Info *********************************************************************************
@@ -20,10 +20,18 @@ __email__ = "csmaue@gmail.com"
 __status__ = "Development"
 
 
+# A moment after a time, for rules that include the time itself in a range
+EPSILON = datetime.timedelta(microseconds=1)
+
+
 
 
 # Device state class ******************************************************************************
 class Device(object):
+    # Times of day the device's rules compare against.  None means they aren't described, so
+    # the rules are checked every time
+    transition_times = None
+
     def __init__(self, name, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)        
@@ -39,7 +47,8 @@ class Device(object):
         self.homeArray = []
         self.homeTime = []
         self.homeNew = False
-        self.s = Sun(lat=38.566, long=-90.410)
+        self.lat = LAT
+        self.long = LONG
         self.utcOffset = datetime.timedelta(hours=0)
         self.sunriseOffset = datetime.timedelta(minutes=0)
         self.sunsetOffset = datetime.timedelta(minutes=0)
@@ -162,4 +171,31 @@ class Device(object):
             self.__utcOffset = value
         else:
             self.logger.error("Improper type attmpted to load into self.utcOffset \
-                          (should be type: datetime.timedelta)")                                  
+                          (should be type: datetime.timedelta)")
+
+
+    def sun_times(self):
+        """ Returns the sunrise, sunset and solar noon (as datetimes) on the date being checked.
+        These come from a cache shared by every device, so they are only calculated once a day """
+        return ephemeris(self.dt.date(), self.utcOffset, self.lat, self.long)
+
+
+    def transition_candidates(self):
+        """ Returns the datetimes (besides midnight) at or just after which the device's rules
+        could give a different answer, given the inputs of the last check_rules call """
+        return [datetime.datetime.combine(self.dt.date(), t) for t in self.transition_times]
+
+
+    def next_transition(self):
+        """ Returns the earliest time after the last check_rules call at which the rules could
+        give a different answer with the same inputs (at the latest, the next midnight), or
+        None if that isn't known """
+        if self.transition_times is None:
+            return None
+        next_time = datetime.datetime.combine(self.dt.date() + datetime.timedelta(days=1), datetime.time(0))
+        for candidate in self.transition_candidates():
+            # Ranges are checked with both < and <=, so the moment after a time counts as well
+            for moment in (candidate, candidate + EPSILON):
+                if self.dt < moment < next_time:
+                    next_time = moment
+        return next_time
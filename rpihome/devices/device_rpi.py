@@ -6,7 +6,7 @@
 import copy
 import logging
 from .device import Device
-from rpihome.modules.message import Message
+from modules.message import Message
 
 
 # Authorship Info **********************************************************************************
@@ -35,12 +35,12 @@ class DeviceRPI(Device):
             if self.state is True:
                 self.msg_to_send = Message(source="11", dest="15", type="150", name="rpi",
                                            payload="export DISPLAY=:0; xset s reset")
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                 self.logger.debug("Sending wake command to RPi Monitor")
             else:
                 self.msg_to_send = Message(source="11", dest="15", type="150", name="rpi",
                                            payload="export DISPLAY=:0; xset s activate")
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                 self.logger.debug("Sending sleep command to RPi Monitor")
             self.state_mem = copy.copy(self.state)
                               
\ No newline at end of file
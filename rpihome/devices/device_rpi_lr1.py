@@ -24,6 +24,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class RPImain(DeviceRPI):
+    # Times of day the rules below compare against
+    transition_times = (datetime.time(5,30), datetime.time(6,30), datetime.time(22,0))
+
     def __init__(self, name, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)        
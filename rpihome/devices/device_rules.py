@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+""" device_rules.py: Devices whose automation rules come from a rules file rather than a
+    hand-written check_rules() method, and a factory creating the devices a rules file lists
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import datetime
+import importlib
+import logging
+from .device_rpi import DeviceRPI
+from .device_wemo import DeviceWemo
+from modules.rules import RuleSet
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+def create_devices(definitions, msg_out_queue, logger=None):
+    """ Creates the enabled devices in a list of definitions (from rules.load_definitions).
+    Returns the list of devices and the list of those whose rules are run automatically.  A
+    definition names the device and gives either its kind ("wemo" with an address, or "rpi")
+    and rules, or the hand-written class ("module.Class" within devices) that implements it """
+    devices, automated = [], []
+    for definition in definitions:
+        if definition.get("enabled", True) is False:
+            continue
+        name = definition["name"]
+        if "class" in definition:
+            module, cls = definition["class"].rsplit(".", 1)
+            device_class = getattr(importlib.import_module("." + module, __package__), cls)
+            if definition.get("kind", "wemo") == "rpi":
+                device = device_class(name, msg_out_queue)
+            else:
+                device = device_class(name, definition["address"], msg_out_queue)
+        elif definition.get("kind") == "rpi":
+            device = RuleRPI(name, msg_out_queue, RuleSet(name, definition["rules"], logger), logger)
+        elif definition.get("kind") == "wemo":
+            device = RuleWemo(name, definition["address"], msg_out_queue,
+                              RuleSet(name, definition["rules"], logger), logger)
+        else:
+            raise ValueError("Unknown kind of device [%s] for [%s]" % (definition.get("kind"), name))
+        devices.append(device)
+        if definition.get("automated", True) is True:
+            automated.append(device)
+    return devices, automated
+
+
+
+# Rule Device Class *******************************************************************************
+class RuleDevice(object):
+    """ check_rules() for a device whose rules are a compiled RuleSet (in self.rules).  Mixed
+    into a device class ahead of it """
+    def check_rules(self, **kwargs):
+        """ Sets the device state from its rules """
+        # Process input variables if present (looked up directly; this runs for every device)
+        self.dt = kwargs.get("datetime", self.dt)
+        self.homeArray = kwargs.get("homeArray", self.homeArray)
+        self.homeTime = kwargs.get("homeTime", self.homeTime)
+        self.utcOffset = kwargs.get("utcOffset", self.utcOffset)
+        self.sunriseOffset = kwargs.get("sunriseOffset", self.sunriseOffset)
+        self.sunsetOffset = kwargs.get("sunsetOffset", self.sunsetOffset)
+        # Split the time once for every condition that uses it
+        self.weekday = self.dt.weekday()
+        self.time_of_day = self.dt.time()
+        # Look up sunrise / sunset times if the rules use them
+        if self.rules.sun is True:
+            self.sunrise, self.sunset, self.solarnoon = self.sun_times()
+        # First case that holds sets the state
+        state = self.rules.evaluate(self)
+        if state is not None and state != self.state:
+            self.logger.info("Turning %s %s", "on" if state is True else "off", self.name)
+            self.state = state
+        # Return result
+        return self.state
+
+
+    def transition_candidates(self):
+        """ The times of day the rules compare against, sunrise and sunset (each with its
+        offset) if the rules use them, and the end of each user's arrival window """
+        candidates = [datetime.datetime.combine(self.dt.date(), t) for t in self.rules.times]
+        if self.rules.sun is True:
+            candidates += [self.sunrise + self.sunriseOffset, self.sunset + self.sunsetOffset]
+        if self.rules.arrival is not None:
+            candidates += [when + self.rules.arrival for when in self.homeTime]
+        return candidates
+
+
+
+# Rule Wemo Class *********************************************************************************
+class RuleWemo(RuleDevice, DeviceWemo):
+    """ Wemo switch controlled by rules from a rules file """
+    transition_times = ()
+
+    def __init__(self, name, address, msg_out_queue, rules, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init parent class
+        super().__init__(name, address, msg_out_queue, self.logger)
+        self.rules = rules
+
+
+
+# Rule RPI Class **********************************************************************************
+class RuleRPI(RuleDevice, DeviceRPI):
+    """ RPi screen controlled by rules from a rules file """
+    transition_times = ()
+
+    def __init__(self, name, msg_out_queue, rules, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init parent class
+        super().__init__(name, msg_out_queue, self.logger)
+        self.rules = rules
@@ -7,7 +7,7 @@ import copy
 import datetime
 import logging
 from .device import Device
-from rpihome.modules.message import Message
+from modules.message import Message
 
 
 
@@ -36,7 +36,7 @@ class DeviceWemo(Device):
     def discover_device(self):
         self.logger.debug("Sending command to wemo gateway to find device at address: %s", self.address)
         self.msg_to_send = Message(source="11", dest="16", type="160", name=self.name, payload=self.address)
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
 
 
     def command(self):
@@ -45,11 +45,11 @@ class DeviceWemo(Device):
         if self.state != self.state_mem:
             if self.state is True:
                 self.msg_to_send = Message(source="11", dest="16", type="161", name=self.name, payload="on")
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                 self.logger.debug("Sending command to wemo gateway to turn ON device: %s", self.name)
             else:
                 self.msg_to_send = Message(source="11", dest="16", type="161", name=self.name, payload="off")
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                 self.logger.debug("Sending command to wemo gateway to turn OFF device: %s", self.name)
             pass
             # Snapshot new device state in memory so the command is only sent once
@@ -22,6 +22,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class Wemo_br1lt1(DeviceWemo):
+    # Times of day the rules below compare against
+    transition_times = (datetime.time(5,50), datetime.time(6,30), datetime.time(7,0))
+
     def __init__(self, name, ip, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)
@@ -22,6 +22,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class Wemo_br3lt1(DeviceWemo):
+    # Times of day the rules below compare against
+    transition_times = (datetime.time(6,0), datetime.time(6,30))
+
     def __init__(self, name, ip, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)        
@@ -24,6 +24,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class Wemo_bylt1(DeviceWemo):
+    # The rules below only change state at the end of the on-time
+    transition_times = ()
+
     def __init__(self, name, ip, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)        
@@ -53,15 +56,21 @@ class Wemo_bylt1(DeviceWemo):
                     self.sunsetOffset = value   
                 if key == "timeout":
                     self.timeout = value                                                          
-        # Calculate sunrise / sunset times
-        self.sunrise = datetime.datetime.combine(datetime.datetime.today(), self.s.sunrise(self.dt, self.utcOffset))
-        self.sunset = datetime.datetime.combine(datetime.datetime.today(), self.s.sunset(self.dt, self.utcOffset)) 
+        # Look up sunrise / sunset times
+        self.sunrise, self.sunset, self.solarnoon = self.sun_times()
         # Decision tree to automatically time-out light after 15 minutes in the "on" state
         if self.status == 1:
-            if datetime.datetime.now() >= self.statusChangeTS + self.timeout:
+            if self.dt >= self.statusChangeTS + self.timeout:
                 self.state = False
                 self.state_mem = None
                 self.status = None
                 self.statusChangeTS = None
         # Return result
-        return self.state
\ No newline at end of file
+        return self.state
+
+
+    def transition_candidates(self):
+        """ The end of the on-time """
+        if self.status == 1 and isinstance(self.statusChangeTS, datetime.datetime) is True:
+            return [self.statusChangeTS + self.timeout]
+        return []
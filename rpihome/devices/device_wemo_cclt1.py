@@ -22,6 +22,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class Wemo_cclt1(DeviceWemo):
+    # Times of day the rules below compare against (besides sunrise / sunset)
+    transition_times = ()
+
     def __init__(self, name, ip, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)        
@@ -55,9 +58,8 @@ class Wemo_cclt1(DeviceWemo):
         for h in self.homeArray:
             if h is True:
                 self.home = True        
-        # Calculate sunrise / sunset times
-        self.sunrise = datetime.datetime.combine(self.dt, self.s.sunrise(self.dt, self.utcOffset))
-        self.sunset = datetime.datetime.combine(self.dt, self.s.sunset(self.dt, self.utcOffset))                        
+        # Look up sunrise / sunset times
+        self.sunrise, self.sunset, self.solarnoon = self.sun_times()
         # Decision tree to determine if screen should be awake or not
         if self.home is True:
             # If after 5am but before sunrise + the offset minutes
@@ -79,4 +81,9 @@ class Wemo_cclt1(DeviceWemo):
                 self.logger.info("Turning off cclt1")
             self.state = False
         # Return result
-        return self.state          
\ No newline at end of file
+        return self.state
+
+
+    def transition_candidates(self):
+        """ Sunrise and sunset, each with its offset """
+        return [self.sunrise + self.sunriseOffset, self.sunset + self.sunsetOffset]
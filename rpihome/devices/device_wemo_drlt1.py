@@ -24,6 +24,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class Wemo_drlt1(DeviceWemo):
+    # Times of day the rules below compare against
+    transition_times = (datetime.time(5,50), datetime.time(6,30), datetime.time(7,0))
+
     def __init__(self, name, ip, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)        
@@ -53,9 +56,8 @@ class Wemo_drlt1(DeviceWemo):
                     self.sunsetOffset = value
                 if key == "timeout":
                     self.timeout = value
-        # Calculate sunrise / sunset times
-        self.sunrise = datetime.datetime.combine(datetime.datetime.today(), self.s.sunrise(self.dt, self.utcOffset))
-        self.sunset = datetime.datetime.combine(datetime.datetime.today(), self.s.sunset(self.dt, self.utcOffset)) 
+        # Look up sunrise / sunset times
+        self.sunrise, self.sunset, self.solarnoon = self.sun_times()
         # Determine if anyone is home
         for h in self.homeArray:
             if h is True:
@@ -24,6 +24,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class Wemo_ewlt1(DeviceWemo):
+    # Times of day the rules below compare against (besides sunrise / sunset)
+    transition_times = ()
+
     def __init__(self, name, ip, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)        
@@ -53,9 +56,8 @@ class Wemo_ewlt1(DeviceWemo):
                     self.sunsetOffset = value   
                 if key == "timeout":
                     self.timeout = value                                                          
-        # Calculate sunrise / sunset times
-        self.sunrise = datetime.datetime.combine(self.dt, self.s.sunrise(self.dt, self.utcOffset))
-        self.sunset = datetime.datetime.combine(self.dt, self.s.sunset(self.dt, self.utcOffset)) 
+        # Look up sunrise / sunset times
+        self.sunrise, self.sunset, self.solarnoon = self.sun_times()
         # Determine if anyone is home
         for h in self.homeArray:
             if h is True:
@@ -93,4 +95,11 @@ class Wemo_ewlt1(DeviceWemo):
                 self.logger.info("Turning off ewlt1")
             self.state = False
         # Return result
-        return self.state                 
+        return self.state
+
+
+    def transition_candidates(self):
+        """ Sunrise and sunset, each with its offset, and the end of each user's first ten
+        minutes at home """
+        return ([self.sunrise + self.sunriseOffset, self.sunset + self.sunsetOffset] +
+                [when + datetime.timedelta(minutes=10) for when in self.homeTime])
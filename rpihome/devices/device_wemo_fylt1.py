@@ -24,6 +24,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class Wemo_fylt1(DeviceWemo):
+    # Times of day the rules below compare against (besides sunrise / sunset)
+    transition_times = ()
+
     def __init__(self, name, ip, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)
@@ -53,9 +56,8 @@ class Wemo_fylt1(DeviceWemo):
                     self.sunsetOffset = value   
                 if key == "timeout":
                     self.timeout = value                                                         
-        # Calculate sunrise / sunset times
-        self.sunrise = datetime.datetime.combine(self.dt.date(), self.s.sunrise(self.dt, self.utcOffset))
-        self.sunset = datetime.datetime.combine(self.dt.date(), self.s.sunset(self.dt, self.utcOffset)) 
+        # Look up sunrise / sunset times
+        self.sunrise, self.sunset, self.solarnoon = self.sun_times()
         # Decision tree to determine if screen should be awake or not
         if self.dt <= self.sunrise + self.sunriseOffset:
             if self.state is False:
@@ -71,4 +73,8 @@ class Wemo_fylt1(DeviceWemo):
             self.state = False
         # Return result
         return self.state
-                    
\ No newline at end of file
+
+
+    def transition_candidates(self):
+        """ Sunrise and sunset, each with its offset """
+        return [self.sunrise + self.sunriseOffset, self.sunset + self.sunsetOffset]
@@ -22,6 +22,9 @@ __status__ = "Development"
 
 # Device class ********************************************************************************************************
 class Wemo_lrlt2(DeviceWemo):
+    # Times of day the rules below compare against
+    transition_times = (datetime.time(5,0), datetime.time(22,0))
+
     def __init__(self, name, ip, msg_out_queue, logger=None):
         # Configure logger
         self.logger = logger or logging.getLogger(__name__)        
@@ -55,9 +58,8 @@ class Wemo_lrlt2(DeviceWemo):
         for h in self.homeArray:
             if h is True:
                 self.home = True
-        # Calculate sunrise / sunset times
-        self.sunrise = datetime.datetime.combine(self.dt, self.s.sunrise(self.dt, self.utcOffset))
-        self.sunset = datetime.datetime.combine(self.dt, self.s.sunset(self.dt, self.utcOffset))
+        # Look up sunrise / sunset times
+        self.sunrise, self.sunset, self.solarnoon = self.sun_times()
         # Decision tree to determine if screen should be awake or not
         if self.home is True:
             # If after 5am but before sunrise + the offset minutes
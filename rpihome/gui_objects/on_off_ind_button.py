@@ -132,20 +132,20 @@ class OnIndOffButtonFrame(object):
     def on_action(self):
         logging.debug("On button pressed")
         self.msg_to_send = Message(source="02", dest="16", type="161", name=self.name, payload="on")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         logging.debug("Sending message [%s]", self.msg_to_send.raw)
         self.set_indicator_green()
 
     def ind_action(self):
         logging.debug("Ind button pressed")
         self.msg_to_send = Message(source="02", dest="16", type="162", name=self.name)
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         logging.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def off_action(self):
         logging.debug("Off button pressed")
         self.msg_to_send = Message(source="02", dest="16", type="161", name=self.name, payload="off")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         logging.debug("Sending message [%s]", self.msg_to_send.raw)
         self.set_indicator_red()
 
@@ -175,10 +175,10 @@ class HomeUser2(HomeGeneral):
         if self.yes != self.mem:
             if self.yes is True:
                 self.msg_to_send = Message(source="13", dest="11", type="100", name="user2", payload="1")
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                 self.logger.debug("Sending 'user2 home' message to logic solver")                
             else:
                 self.msg_to_send = Message(source="13", dest="11", type="100", name="user2", payload="0")
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                 self.logger.debug("Sending 'user2 NOT home' message to logic solver")                 
             self.mem = copy.copy(self.yes)                           
\ No newline at end of file
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+""" batch.py: Helper class used by the process loops to drain their internal work queue in
+    batches, bounded by a per-tick time budget so bursts clear in one tick without starving the
+    heartbeat and timer work
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import logging
+from .clock import Clock
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Work Queue Drain Class **************************************************************************
+class WorkDrain(object):
+    """ Pulls messages from a queue and hands each to a handler until the queue is empty or the
+    time budget (in seconds) for the tick is used up, as read from clock's monotonic time.  Keeps
+    counters describing each tick """
+    def __init__(self, budget=0.05, logger=None, clock=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.budget = budget
+        self.clock = clock or Clock()
+        self.last_count = 0
+        self.last_depth = 0
+        self.last_drain_time = 0.0
+        self.max_depth = 0
+        self.max_drain_time = 0.0
+        self.total_count = 0
+        self.budget_hits = 0
+
+
+    def drain(self, queue, handler):
+        """ Processes messages from queue with handler(item) until it is empty or the budget is
+        spent.  Returns the number of messages processed """
+        start = self.clock.monotonic_time()
+        count = 0
+        while True:
+            try:
+                item = queue.get_nowait()
+            except:
+                break
+            handler(item)
+            count += 1
+            if self.clock.monotonic_time() - start >= self.budget:
+                self.budget_hits += 1
+                break
+        # Update counters
+        self.last_drain_time = self.clock.monotonic_time() - start
+        self.last_count = count
+        self.last_depth = self.depth(queue)
+        self.total_count += count
+        self.max_depth = max(self.max_depth, count + self.last_depth)
+        self.max_drain_time = max(self.max_drain_time, self.last_drain_time)
+        if self.last_depth > 0 and count > 0:
+            self.logger.debug("Work queue budget of %.3fs used after %d messages, %d left for next tick",
+                              self.budget, count, self.last_depth)
+        return count
+
+
+    def depth(self, queue):
+        """ Returns the number of messages waiting in queue, or 0 where the platform can't tell """
+        try:
+            return queue.qsize()
+        except NotImplementedError:
+            return 0
+
+
+    def counters(self):
+        """ Returns a dictionary of the drain counters """
+        return {"last_count": self.last_count,
+                "last_depth": self.last_depth,
+                "last_drain_time": self.last_drain_time,
+                "max_depth": self.max_depth,
+                "max_drain_time": self.max_drain_time,
+                "total_count": self.total_count,
+                "budget_hits": self.budget_hits}
+
+
+    def report(self):
+        """ Returns a one line summary of the drain counters for logging """
+        return ("%d messages processed, max depth %d, max drain time %.1f ms, budget reached %d times" %
+                (self.total_count, self.max_depth, self.max_drain_time * 1e3, self.budget_hits))
@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+""" channel.py: Two lane inter-process message queue.  Control messages (kill, restart,
+    heartbeat) travel in their own lane and are always read before bulk data, so a backlog of
+    data can't hold up a shutdown.  The data lane is bounded.  Producers only ever add to it;
+    the consumer moves what arrives into a backlog of its own the same size, and when that is
+    full applies a per message type policy to each message it takes in
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import collections
+import logging
+import multiprocessing
+import queue
+from .message import Message, peek_type
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Message types sent in the control lane
+CONTROL_TYPES = frozenset(("001", "005", "900", "999"))
+# Overflow policies for the data lane
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+# Policy applied per message type when it arrives at a full backlog.  Home/away updates and wemo
+# commands only matter in their latest form so older copies for the same (type, name) are
+# coalesced.  Gateway requests and replies (020-022, 160, 162 and their acks) each carry their
+# own correlation id and are never coalesced, or their pending requests could only time out;
+# anything not listed waits in the data lane, where producers block for up to block_timeout
+# seconds once it is full too
+POLICIES = {"100": COALESCE, "150": DROP_OLDEST, "161": COALESCE}
+# Default number of messages the data lane (and the consumer's backlog) holds
+MAXSIZE = 200
+# Counter slots
+OVERFLOWS = 0
+DROPPED = 1
+COALESCED = 2
+
+
+# Priority Channel Class **************************************************************************
+class PriorityChannel(object):
+    """ Drop-in replacement for the multiprocessing.Queue used as a process' incoming message
+    queue.  Messages are sorted into a control lane and a data lane by their type code when they
+    are put, and get_nowait() only returns data once the control lane is empty.  The data lane is
+    bounded (unless maxsize <= 0) and only the consuming process reads it, so messages keep the
+    order they were put in.  The consumer's backlog is local to that process; overflow, drop and
+    coalesce counters live in shared memory so any process can read them """
+    def __init__(self, maxsize=MAXSIZE, policies=None, default_policy=BLOCK, block_timeout=0.5,
+                 control_types=CONTROL_TYPES, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.maxsize = maxsize
+        self.policies = POLICIES if policies is None else policies
+        self.default_policy = default_policy
+        self.block_timeout = block_timeout
+        self.control_types = control_types
+        self.control = multiprocessing.Queue(-1)
+        self.data = multiprocessing.Queue(maxsize)
+        self.lanes = (self.control, self.data)
+        self.backlog = collections.deque()
+        self.full = False
+        self.counters = multiprocessing.Array("i", 3)
+
+
+    def put_nowait(self, item):
+        """ Adds a message (in either wire form) to the lane matching its type.  If the data
+        lane is full the producer waits up to block_timeout for the consumer to make room, then
+        drops the message """
+        if peek_type(item) in self.control_types:
+            self.control.put_nowait(item)
+            return
+        try:
+            self.data.put_nowait(item)
+            return
+        except queue.Full:
+            self.count(OVERFLOWS)
+        try:
+            self.data.put(item, timeout=self.block_timeout)
+        except queue.Full:
+            self.count(DROPPED)
+            self.logger.warning("Queue full for %.1fs, dropped message [%s]", self.block_timeout,
+                                Message(raw=item).raw)
+
+
+    def pull(self):
+        """ Consumer side: moves the messages waiting in the data lane into the backlog, applying
+        the overflow policy of each one that arrives when the backlog is full.  Stops reading
+        (leaving the rest in the lane) once a message that can't be coalesced or make room by
+        dropping the oldest is taken in over the limit """
+        while self.full is False:
+            try:
+                item = self.data.get_nowait()
+            except queue.Empty:
+                return
+            policy = self.policies.get(peek_type(item), self.default_policy)
+            key = self.key(item) if policy == COALESCE else None
+            if self.maxsize > 0 and len(self.backlog) >= self.maxsize:
+                if policy == COALESCE:
+                    self.coalesce(key)
+                if policy in (COALESCE, DROP_OLDEST) and len(self.backlog) >= self.maxsize:
+                    self.backlog.popleft()
+                    self.count(DROPPED)
+                self.full = len(self.backlog) >= self.maxsize
+            self.backlog.append((key, item))
+
+
+    def key(self, item):
+        """ Returns the (type, name, corr_id) messages are coalesced by """
+        msg = Message(raw=item)
+        return (msg.type, msg.name, msg.corr_id)
+
+
+    def coalesce(self, key):
+        """ Removes the messages in the backlog with the same key as one arriving """
+        keep = [entry for entry in self.backlog if entry[0] != key]
+        if len(keep) < len(self.backlog):
+            for i in range(len(self.backlog) - len(keep)):
+                self.count(COALESCED)
+            self.backlog = collections.deque(keep)
+
+
+    def count(self, slot):
+        """ Increments one of the shared counters """
+        with self.counters.get_lock():
+            self.counters[slot] += 1
+
+
+    def counts(self):
+        """ Returns a dictionary of the overflow, dropped and coalesced counters along with the
+        current data lane depth (plus the backlog when called by the consumer) """
+        with self.counters.get_lock():
+            overflows, dropped, coalesced = self.counters[:]
+        return {"overflows": overflows, "dropped": dropped, "coalesced": coalesced, "depth": self.depth()}
+
+
+    def depth(self):
+        """ Returns the number of messages in the data lane (the lane size on platforms where
+        multiprocessing.Queue can't report it) and the backlog """
+        try:
+            return self.data.qsize() + len(self.backlog)
+        except NotImplementedError:
+            return self.maxsize + len(self.backlog)
+
+
+    def get_nowait(self):
+        """ Returns the next control message if there is one, otherwise the next data message.
+        Raises queue.Empty if both lanes and the backlog are empty """
+        try:
+            return self.control.get_nowait()
+        except queue.Empty:
+            pass
+        self.pull()
+        if len(self.backlog) == 0:
+            raise queue.Empty
+        item = self.backlog.popleft()[1]
+        self.full = False
+        return item
+
+
+    def empty(self):
+        """ Returns True if both lanes and the backlog are empty """
+        return len(self.backlog) == 0 and self.control.empty() and self.data.empty()
+
+
+    def qsize(self):
+        """ Returns the number of messages waiting in both lanes and the backlog """
+        return self.control.qsize() + self.data.qsize() + len(self.backlog)
+
+
+    def close(self):
+        """ Closes both lanes """
+        self.control.close()
+        self.data.close()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+""" clock.py: Clock read once per pass of a process' main loop.  Each tick takes one snapshot of
+    the wall clock (a datetime, handed to every rule checked during the pass so they all see
+    the same "now") and one of the monotonic clock (seconds, for liveness and request
+    timeouts).  A simulated clock with the same interface is set or advanced by hand for tests
+    and replays
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import datetime
+import time
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Clock Class *************************************************************************************
+class Clock(object):
+    """ Snapshots of the wall and monotonic clocks, taken by tick() """
+    def __init__(self):
+        self.now = None
+        self.monotonic = None
+        self.tick()
+
+
+    def tick(self):
+        """ Takes a new snapshot of both clocks and returns the wall clock time """
+        self.now = self.wall_time()
+        self.monotonic = self.monotonic_time()
+        return self.now
+
+
+    def wall_time(self):
+        """ Returns the current wall clock time (not the snapshot) """
+        return datetime.datetime.now()
+
+
+    def monotonic_time(self):
+        """ Returns the current monotonic clock time in seconds (not the snapshot) """
+        return time.monotonic()
+
+
+
+# Simulated Clock Class ***************************************************************************
+class SimulatedClock(Clock):
+    """ Clock that only moves when told to.  The monotonic time is the number of seconds the
+    clock has been moved forward since it was created """
+    def __init__(self, start=None):
+        self.wall = start or datetime.datetime(2016, 1, 1)
+        self.elapsed = 0.0
+        Clock.__init__(self)
+
+
+    def set(self, when):
+        """ Moves the clock to a datetime (forward or back) and takes a snapshot """
+        self.elapsed += max(0.0, (when - self.wall).total_seconds())
+        self.wall = when
+        return self.tick()
+
+
+    def advance(self, seconds):
+        """ Moves the clock forward a number of seconds and takes a snapshot """
+        return self.set(self.wall + datetime.timedelta(seconds=seconds))
+
+
+    def wall_time(self):
+        return self.wall
+
+
+    def monotonic_time(self):
+        return self.elapsed
@@ -1,5 +1,14 @@
+import bisect
 import datetime
 import logging
+try:
+    import zoneinfo
+except ImportError:
+    zoneinfo = None
+
+
+# Default timezone (St. Louis, MO)
+TIMEZONE = "America/Chicago"
 
 class USdst(object):
     def __init__(self, logger=None):
@@ -130,6 +139,101 @@ class USdst(object):
             return False
 
 
+
+class ZoneOffsets(object):
+    """ UTC offset for naive local datetimes in a timezone from the zoneinfo database.  Each
+    year's transitions are found once and cached, and the offset of the current stretch between
+    transitions is remembered, so most lookups are two comparisons """
+    def __init__(self, key=TIMEZONE, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        if zoneinfo is None:
+            raise KeyError("zoneinfo not available (python 3.9+ needed) for timezone %s" % key)
+        self.key = key
+        self.zone = zoneinfo.ZoneInfo(key)
+        self.years = {}
+        self.current = (datetime.datetime.max, datetime.datetime.min, None, None)
+
+    def offset_at(self, instant):
+        """ Returns the (UTC offset, DST offset) in effect at an aware datetime """
+        local = instant.astimezone(self.zone)
+        return local.utcoffset(), local.dst()
+
+    def find_transitions(self, year):
+        """ Returns a year's transitions as a list of (local time the change happens, as read on
+        the clock before it, UTC offset after, DST offset after), starting with January 1st and
+        the offsets in effect then.  The zone is checked once a day, so a stretch shorter than a
+        month (a suspended DST, say) is not stepped over """
+        offset, dst = self.offset_at(datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc))
+        transitions = [(datetime.datetime(year, 1, 1), offset, dst)]
+        low = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc)
+        while low.year == year:
+            high = low + datetime.timedelta(days=1)
+            if self.offset_at(high) == (offset, dst):
+                low = high
+                continue
+            day_end = high
+            # Narrow the change down to the second
+            while (high - low).total_seconds() > 1:
+                middle = low + (high - low) / 2
+                if self.offset_at(middle) == (offset, dst):
+                    low = middle
+                else:
+                    high = middle
+            before = offset
+            offset, dst = self.offset_at(high)
+            transitions.append(((high + before).replace(tzinfo=None, microsecond=0), offset, dst))
+            low = day_end
+        return transitions
+
+    def transitions(self, year):
+        """ Returns a year's transitions and the list of their start times (for bisecting),
+        finding them the first time they are needed """
+        cached = self.years.get(year)
+        if cached is None:
+            transitions = self.find_transitions(year)
+            cached = self.years[year] = (transitions, [transition[0] for transition in transitions])
+        return cached
+
+    def lookup(self, when):
+        """ Returns (start, end, UTC offset, DST offset) of the stretch between transitions
+        that holds a naive local datetime """
+        transitions, starts = self.transitions(when.year)
+        index = bisect.bisect_right(starts, when) - 1
+        start, offset, dst = transitions[index]
+        # The last stretch of a year is looked up again on January 1st
+        if index + 1 < len(transitions):
+            end = transitions[index + 1][0]
+        else:
+            end = datetime.datetime(when.year + 1, 1, 1)
+        return start, end, offset, dst
+
+    def stretch(self, when):
+        """ Returns the cached stretch holding when, looking up a new one if when is outside it """
+        if not self.current[0] <= when < self.current[1]:
+            self.current = self.lookup(when)
+        return self.current
+
+    def utc_offset(self, when=None):
+        """ Returns the UTC offset (a timedelta) in effect at a naive local datetime """
+        return self.stretch(when or datetime.datetime.now())[2]
+
+    def is_active(self, when=None):
+        """ Returns True if daylight saving time is in effect at a naive local datetime """
+        return bool(self.stretch(when or datetime.datetime.now())[3])
+
+    def next_transition(self, when=None, years=2):
+        """ Returns the local time of the next change of UTC offset after a naive local datetime,
+        as read on the clock before the change, or None if there isn't one in the next few years """
+        when = when or datetime.datetime.now()
+        for year in range(when.year, when.year + years + 1):
+            for start, offset, dst in self.transitions(year)[0][1:]:
+                if start > when:
+                    return start
+        return None
+
+
 if __name__ == "__main__":
     dst_check = USdst()
     dt_to_check = datetime.datetime.combine(datetime.date(2016,3,13), datetime.datetime.now().time())
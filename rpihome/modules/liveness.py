@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+""" liveness.py: Shared-memory table of per-process heartbeat timestamps and status flags.
+    Each process writes its own slot and p00 / the gui read the whole table in one go, so
+    liveness checks don't go through the message queues
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import multiprocessing
+import time
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Status flags
+STOPPED = 0
+RUNNING = 1
+# Process codes with a slot in the table
+PROCESS_CODES = ("00", "01", "02", "11", "13", "15", "16", "17")
+# Seconds between writes of a process' own slot
+BEAT_INTERVAL = 5
+# Age (seconds) of the p00 slot at which a child process gives up and shuts down
+COMM_TIMEOUT = 30
+# Age (seconds) of a child slot at which it is reported as down
+STALE_TIMEOUT = 15
+
+
+# Liveness Table Class ****************************************************************************
+class LivenessTable(object):
+    """ Table of time.monotonic() timestamps and status flags, one slot per process code, held
+    in shared memory.  Created by p00 and handed to each child process when it is spawned.  A
+    slot that has never been written is aged from when the table was created, so a process
+    running with a table of its own doesn't time out the moment it starts """
+    def __init__(self, codes=PROCESS_CODES):
+        self.created = time.monotonic()
+        self.codes = tuple(codes)
+        self.slots = {code: index for index, code in enumerate(self.codes)}
+        self.stamps = multiprocessing.Array("d", len(self.codes))
+        self.status = multiprocessing.Array("b", len(self.codes), lock=self.stamps.get_lock())
+
+
+    def beat(self, code, now=None):
+        """ Marks a process as running and updates its timestamp """
+        if now is None:
+            now = time.monotonic()
+        slot = self.slots[code]
+        with self.stamps.get_lock():
+            self.stamps.get_obj()[slot] = now
+            self.status.get_obj()[slot] = RUNNING
+
+
+    def stop(self, code):
+        """ Marks a process as stopped """
+        with self.stamps.get_lock():
+            self.status.get_obj()[self.slots[code]] = STOPPED
+
+
+    def age(self, code, now=None):
+        """ Returns the number of seconds since a process last wrote its slot (or since the
+        table was created, if it never has) """
+        if now is None:
+            now = time.monotonic()
+        return now - (self.stamps[self.slots[code]] or self.created)
+
+
+    def read(self, now=None):
+        """ Returns a dictionary of process code -> (age in seconds, status flag) for the whole
+        table, read under a single lock """
+        if now is None:
+            now = time.monotonic()
+        with self.stamps.get_lock():
+            stamps = self.stamps.get_obj()[:]
+            status = self.status.get_obj()[:]
+        return {code: (now - (stamps[slot] or self.created), status[slot]) for code, slot in self.slots.items()}
+
+
+    def alive(self, timeout=STALE_TIMEOUT, now=None):
+        """ Returns a dictionary of process code -> True if the process is running and has
+        written its slot within timeout seconds """
+        return {code: (status == RUNNING and age <= timeout)
+                for code, (age, status) in self.read(now).items()}
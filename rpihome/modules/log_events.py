@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+""" log_events.py: Streaming parser that turns the text debug log (and its rotated, possibly
+    compressed, copies) into a stream of typed events, one per logged inter-process message.
+    Everything is a generator so a month of logs is read a line at a time; events can be fed
+    to a replay or packed into compact columnar arrays for analysis
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import array
+import collections
+import os
+import re
+import time
+from .log_json import MESSAGE_PATTERN
+from .log_rotate import ROTATED_PATTERN, open_log
+from .message import ESCAPE, PROCESS_INDEX, TYPE_INDEX, Message
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Text log line: process name, asctime, level name, message (see logger_mp.listener_configurer)
+LINE_PATTERN = re.compile(r"^(.*?)\s*,\s+(\d{4}-\d\d-\d\d \d\d):(\d\d):(\d\d),(\d{3})\s*,\s+(\w+)\s*, (.*)$")
+# One event, with time in seconds since the epoch and msg a Message
+LogEvent = collections.namedtuple("LogEvent", "time process level msg")
+
+
+def log_files(filename):
+    """ Returns a log file's rotated copies, oldest first, followed by the file itself """
+    dir_name, base_name = os.path.split(os.path.abspath(filename))
+    prefix = base_name + "."
+    files = [os.path.join(dir_name, name) for name in os.listdir(dir_name)
+             if name.startswith(prefix) and ROTATED_PATTERN.match(name[len(prefix):])]
+    files.sort(key=os.path.getmtime)
+    if os.path.exists(filename):
+        files.append(filename)
+    return files
+
+
+def read_lines(filenames):
+    """ Yields each line (without its line ending) from a sequence of log files in turn """
+    for filename in filenames:
+        with open_log(filename) as f:
+            for line in f:
+                yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def parse_events(lines, where=None):
+    """ Yields a LogEvent for each line that logs an inter-process message.  Every message is
+    logged at several points as it moves between processes; where (a piece of text, e.g.
+    "Transfered message") keeps only the lines from one of them """
+    hours = {}
+    for line in lines:
+        if where is not None and where not in line:
+            continue
+        match = LINE_PATTERN.match(line)
+        if match is None:
+            continue
+        process, hour, minute, second, msec, level, text = match.groups()
+        found = MESSAGE_PATTERN.search(text)
+        if found is None:
+            continue
+        # Convert the hour once, then add the minutes and seconds
+        start = hours.get(hour)
+        if start is None:
+            start = hours[hour] = time.mktime(time.strptime(hour, "%Y-%m-%d %H"))
+        yield LogEvent(start + int(minute) * 60 + int(second) + int(msec) / 1000.0,
+                       process, level, Message(*found.groups()))
+
+
+def log_events(filename, where=None):
+    """ Yields the events from a log file and all of its rotated copies, oldest first """
+    return parse_events(read_lines(log_files(filename)), where)
+
+
+
+# Event Columns Class *****************************************************************************
+class EventColumns(object):
+    """ Events packed into typed arrays, one per field.  Source, dest and type are stored as
+    their wire format indexes (ESCAPE for a type code the wire format doesn't know); device
+    names, payloads and processes are stored as indexes into lists of the distinct values """
+    def __init__(self):
+        self.time = array.array("d")
+        self.source = array.array("B")
+        self.dest = array.array("B")
+        self.type = array.array("B")
+        self.name = array.array("H")
+        self.payload = array.array("I")
+        self.process = array.array("B")
+        self.names = []
+        self.payloads = []
+        self.processes = []
+        self.name_index = {}
+        self.payload_index = {}
+        self.process_index = {}
+
+
+    def intern(self, values, index, value):
+        """ Returns the position of value in values (found through index), adding it if new """
+        position = index.get(value)
+        if position is None:
+            position = index[value] = len(values)
+            values.append(value)
+        return position
+
+
+    def append(self, event):
+        """ Adds one event """
+        msg = event.msg
+        self.time.append(event.time)
+        self.source.append(PROCESS_INDEX.get(msg.source, ESCAPE))
+        self.dest.append(PROCESS_INDEX.get(msg.dest, ESCAPE))
+        self.type.append(TYPE_INDEX.get(msg.type, ESCAPE))
+        self.name.append(self.intern(self.names, self.name_index, msg.name))
+        self.payload.append(self.intern(self.payloads, self.payload_index, msg.payload))
+        self.process.append(self.intern(self.processes, self.process_index, event.process))
+
+
+    def extend(self, events):
+        """ Adds every event from an iterable and returns self """
+        for event in events:
+            self.append(event)
+        return self
+
+
+    def __len__(self):
+        return len(self.time)
@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+""" log_json.py: Structured log sink.  Each record is written as one JSON object per line with
+    the fields of any inter-process message it mentions pulled out (source, dest, type, device
+    name, payload).  A sidecar index of (time, byte offset) pairs is kept next to each file so
+    a time range can be read without scanning the whole file
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import bisect
+import json
+import logging
+import os
+import re
+import struct
+from .log_rotate import GZ_SUFFIX, CompressingRotatingHandler, open_log
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Messages are logged in their csv form inside square brackets, e.g. [11,16,161,ewlt1,1]
+MESSAGE_PATTERN = re.compile(r"\[(\d\d),(\d\d),(\w*),([^,\]]*),([^\]]*)\]")
+MESSAGE_FIELDS = ("source", "dest", "type", "name", "payload")
+# Index entries: record time (seconds since the epoch), byte offset of the record in the file
+INDEX_ENTRY = struct.Struct("!dQ")
+INDEX_SUFFIX = ".idx"
+# Seconds between index entries
+INDEX_INTERVAL = 10.0
+# Records from different processes reach the listener slightly out of time order, so reading
+# a range only stops once records are this many seconds past its end
+ORDER_SLACK = 5.0
+
+
+def index_filename(filename):
+    """ Returns the name of the index kept alongside a log file (the same for its compressed
+    copy) """
+    if filename.endswith(GZ_SUFFIX):
+        filename = filename[:-len(GZ_SUFFIX)]
+    return filename + INDEX_SUFFIX
+
+
+# JSON Formatter Class ****************************************************************************
+class JsonFormatter(logging.Formatter):
+    """ Formats a record as a single line JSON object """
+    def format(self, record):
+        entry = {"time": record.created,
+                 "process": record.processName,
+                 "logger": record.name,
+                 "level": record.levelname,
+                 "message": record.getMessage()}
+        match = MESSAGE_PATTERN.search(entry["message"])
+        if match is not None:
+            entry.update(zip(MESSAGE_FIELDS, match.groups()))
+        return json.dumps(entry, separators=(",", ":"))
+
+
+
+# JSON Lines Handler Class ************************************************************************
+class JsonLinesHandler(CompressingRotatingHandler):
+    """ Rotating, compressed JSON-lines file with a time -> byte offset index.  An index entry
+    is written for the first record of each file and then every index_interval seconds.  The
+    index holds offsets into the uncompressed data and is left uncompressed """
+    def __init__(self, filename, backupCount=24, index_interval=INDEX_INTERVAL, **kwargs):
+        CompressingRotatingHandler.__init__(self, filename, backupCount=backupCount, encoding="utf-8", **kwargs)
+        self.setFormatter(JsonFormatter())
+        self.index_interval = index_interval
+        self.index = None
+        self.last_index_time = None
+        self.created = None
+
+
+    def emit(self, record):
+        try:
+            if self.last_index_time is None or record.created >= self.last_index_time + self.index_interval:
+                self.write_index(record.created)
+        except Exception:
+            self.handleError(record)
+        # The rollover check is left to the parent; doRollover() indexes the new file
+        self.created = record.created
+        try:
+            CompressingRotatingHandler.emit(self, record)
+        finally:
+            self.created = None
+
+
+    def doRollover(self):
+        """ Rotates the file (and its index) and, when a record being emitted caused it, starts
+        the new file's index with that record """
+        CompressingRotatingHandler.doRollover(self)
+        if self.created is not None:
+            self.write_index(self.created)
+
+
+    def write_index(self, created):
+        """ Records the offset the next record will be written at """
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.flush()
+        if self.index is None:
+            self.index = open(index_filename(self.baseFilename), "ab")
+        self.index.write(INDEX_ENTRY.pack(created, self.stream.tell()))
+        self.index.flush()
+        self.last_index_time = created
+
+
+    def rotate(self, source, dest):
+        """ Moves the index along with the file it belongs to """
+        self.close_index()
+        if os.path.exists(index_filename(source)):
+            os.replace(index_filename(source), index_filename(dest))
+        CompressingRotatingHandler.rotate(self, source, dest)
+
+
+    def companions(self, filename):
+        """ The index goes when its file is removed """
+        return [index_filename(filename)]
+
+
+    def close_index(self):
+        """ Closes the index file so the next entry starts a new one """
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        self.last_index_time = None
+
+
+    def close(self):
+        self.close_index()
+        CompressingRotatingHandler.close(self)
+
+
+
+# Query Functions *********************************************************************************
+def find_offset(filename, start):
+    """ Returns the byte offset in a JSON-lines log file to start reading from to find the
+    records at or after time start.  Returns 0 if the file has no index """
+    try:
+        with open(index_filename(filename), "rb") as f:
+            data = f.read()
+    except OSError:
+        return 0
+    entries = list(INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % INDEX_ENTRY.size]))
+    times = [created for created, offset in entries]
+    # Step back past entries within the slack so out of order records aren't missed
+    pos = bisect.bisect_left(times, start - ORDER_SLACK) - 1
+    return entries[pos][1] if pos >= 0 else 0
+
+
+def read_range(filename, start=None, end=None, **fields):
+    """ Yields the records (as dictionaries) in a JSON-lines log file (compressed or not) with a
+    time between start and end whose fields equal the keyword arguments given, e.g.
+    type="161", name="ewlt1" """
+    with open_log(filename) as f:
+        if start is not None:
+            f.seek(find_offset(filename, start))
+        for line in f:
+            try:
+                entry = json.loads(line.decode("utf-8"))
+            except ValueError:
+                continue
+            if end is not None and entry["time"] > end + ORDER_SLACK:
+                break
+            if start is not None and entry["time"] < start:
+                continue
+            if end is not None and entry["time"] > end:
+                continue
+            if all(entry.get(key) == value for key, value in fields.items()):
+                yield entry
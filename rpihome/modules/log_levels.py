@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+""" log_levels.py: Per-process, per-logger log level map.  Levels are applied to the loggers
+    inside each worker process, so records below the level are dropped before they are built,
+    pickled and sent to the log listener.  Levels are changed at runtime with a type 005
+    message whose payload lists "logger=LEVEL" pairs, e.g. "root=INFO;p16_wemo_gateway=DEBUG"
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import logging
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Name used in the map for the root logger
+ROOT = "root"
+# Level every process' root logger starts at unless the map says otherwise
+DEFAULT_LEVEL = "DEBUG"
+
+
+def parse_levels(payload):
+    """ Converts a "logger=LEVEL;logger=LEVEL" string into a dictionary of logger name -> level
+    name.  Unknown level names are skipped """
+    levels = {}
+    for item in payload.split(";"):
+        name, sep, level = item.partition("=")
+        level = level.strip().upper()
+        if sep and isinstance(logging.getLevelName(level), int):
+            levels[name.strip() or ROOT] = level
+    return levels
+
+
+def format_levels(levels):
+    """ Converts a dictionary of logger name -> level name into a message payload """
+    return ";".join("%s=%s" % (name, level) for name, level in sorted(levels.items()))
+
+
+def apply_levels(levels):
+    """ Sets the level of each logger named in the dictionary within the calling process """
+    for name, level in levels.items():
+        if name == ROOT:
+            logging.getLogger().setLevel(level)
+        else:
+            logging.getLogger(name).setLevel(level)
+
+
+
+# Log Level Map Class *****************************************************************************
+class LogLevelMap(object):
+    """ Level map for every process, held by p00.  Each child is handed its own entry when it is
+    spawned and p00 records every 005 message it forwards, so a level change survives a restart
+    of the process it was sent to """
+    def __init__(self, default=DEFAULT_LEVEL, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.default = default
+        self.map = {}
+
+
+    def update(self, code, levels):
+        """ Merges a dictionary of logger name -> level name into a process' entry """
+        self.map.setdefault(code, {}).update(levels)
+        self.logger.info("Log levels for p%s now [%s]", code, format_levels(self.levels(code)))
+
+
+    def levels(self, code):
+        """ Returns the level dictionary for a process, including its root level """
+        levels = {ROOT: self.default}
+        levels.update(self.map.get(code, {}))
+        return levels
+
+
+    def record(self, msg):
+        """ Routing side effect that keeps the map in step with the 005 messages sent to each
+        process """
+        self.update(msg.dest, parse_levels(msg.payload))
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+""" log_ring.py: Fixed-size shared-memory ring of the most recent formatted log lines.  p01
+    writes every record it handles into the ring and the gui reads only the lines added since
+    the sequence number it last saw, so the alarm window needs no file access
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import logging
+import multiprocessing
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Number of lines the ring holds
+SLOTS = 256
+# Bytes stored per line; longer lines are truncated
+WIDTH = 256
+
+
+# Log Ring Class **********************************************************************************
+class LogRing(object):
+    """ Ring of log lines held in shared memory.  Each write goes to slot seq % slots and bumps
+    the sequence counter, so a reader holding a sequence number can tell exactly which lines are
+    new and whether any were overwritten before it got to them """
+    def __init__(self, slots=SLOTS, width=WIDTH):
+        self.slots = slots
+        self.width = width
+        self.text = multiprocessing.Array("c", slots * width)
+        self.lengths = multiprocessing.Array("H", slots, lock=self.text.get_lock())
+        self.seq = multiprocessing.Value("Q", 0, lock=self.text.get_lock())
+
+
+    def write(self, line):
+        """ Adds a line to the ring, overwriting the oldest once it is full """
+        data = line.encode("utf-8")[:self.width]
+        with self.text.get_lock():
+            seq = self.seq.get_obj().value
+            start = (seq % self.slots) * self.width
+            self.text.get_obj()[start:start + len(data)] = data
+            self.lengths.get_obj()[seq % self.slots] = len(data)
+            self.seq.get_obj().value = seq + 1
+
+
+    def read_since(self, last_seq):
+        """ Returns (sequence number, lines) with every line written after last_seq that is still
+        in the ring.  Pass the returned sequence number back in on the next call """
+        with self.text.get_lock():
+            seq = self.seq.get_obj().value
+            # Lines older than the ring are gone; a number ahead of the ring means it was recreated
+            if last_seq < seq - self.slots or last_seq > seq:
+                last_seq = max(0, seq - self.slots)
+            text = self.text.get_obj()
+            lengths = self.lengths.get_obj()
+            data = []
+            for i in range(last_seq, seq):
+                start = (i % self.slots) * self.width
+                data.append(text[start:start + lengths[i % self.slots]])
+        return seq, [line.decode("utf-8", errors="ignore") for line in data]
+
+
+    def last_seq(self):
+        """ Returns the sequence number of the next line to be written """
+        return self.seq.value
+
+
+
+# Log Ring Handler Class **************************************************************************
+class LogRingHandler(logging.Handler):
+    """ Logging handler that formats each record and writes it to a LogRing """
+    def __init__(self, ring, level=logging.NOTSET):
+        logging.Handler.__init__(self, level)
+        self.ring = ring
+
+
+    def emit(self, record):
+        try:
+            self.ring.write(self.format(record))
+        except Exception:
+            self.handleError(record)
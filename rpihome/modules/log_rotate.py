@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+""" log_rotate.py: Rotating log file handler for the SD card.  Files rotate hourly or once they
+    reach a size limit, rotated files are gzip compressed on a background thread, and the
+    oldest rotated files are removed to keep the total under a byte cap
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import threading
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Size (bytes) at which the live file is rotated early
+MAX_BYTES = 8 * 1024 * 1024
+# Cap (bytes) on the live file plus all rotated files
+MAX_TOTAL_BYTES = 64 * 1024 * 1024
+# Rotated files are named <file>.<hour>[.<n>][.gz]; n keeps size rotations within an hour apart
+ROTATED_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}(\.\d+)?(\.gz)?$")
+GZ_SUFFIX = ".gz"
+
+
+def open_log(filename):
+    """ Opens a log file for reading in binary mode, compressed or not """
+    if filename.endswith(GZ_SUFFIX):
+        return gzip.open(filename, "rb")
+    return open(filename, "rb")
+
+
+def compress(filename):
+    """ Replaces a file with a gzip compressed copy that keeps its modification time.  Returns
+    the name of the compressed file """
+    target = filename + GZ_SUFFIX
+    with open(filename, "rb") as source, gzip.open(target + ".tmp", "wb") as dest:
+        shutil.copyfileobj(source, dest)
+    stat = os.stat(filename)
+    os.utime(target + ".tmp", (stat.st_atime, stat.st_mtime))
+    os.replace(target + ".tmp", target)
+    os.remove(filename)
+    return target
+
+
+# Compressing Rotating Handler Class **************************************************************
+class CompressingRotatingHandler(logging.handlers.TimedRotatingFileHandler):
+    """ TimedRotatingFileHandler (hourly) that also rotates at max_bytes.  Rotated files are
+    handed to a background thread that compresses them and then removes the oldest rotated
+    files until at most backupCount remain and the total size is under max_total_bytes """
+    def __init__(self, filename, backupCount=24, max_bytes=MAX_BYTES, max_total_bytes=MAX_TOTAL_BYTES,
+                 encoding=None, logger=None):
+        logging.handlers.TimedRotatingFileHandler.__init__(self, filename, when="h", interval=1,
+                                                           backupCount=backupCount, encoding=encoding)
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.work = queue.Queue()
+        self.worker = threading.Thread(target=self.compress_loop, name="log-compress", daemon=True)
+        self.worker.start()
+
+
+    def shouldRollover(self, record):
+        if logging.handlers.TimedRotatingFileHandler.shouldRollover(self, record):
+            return True
+        # fstat rather than tell() so the stream's write buffer isn't flushed on every record
+        if self.max_bytes > 0 and self.stream is not None:
+            return os.fstat(self.stream.fileno()).st_size >= self.max_bytes
+        return False
+
+
+    def rotation_filename(self, default_name):
+        """ Adds a counter, one past the highest in use, when the hour's file was already rotated
+        by size.  Counters of pruned files aren't reused so names stay in order """
+        dir_name, base_name = os.path.split(default_name)
+        pattern = re.compile(re.escape(base_name) + r"(?:\.(\d+))?(?:\.gz)?$")
+        counts = [int(match.group(1) or 0) for match in map(pattern.match, os.listdir(dir_name)) if match]
+        if len(counts) == 0:
+            return default_name
+        return "%s.%d" % (default_name, max(counts) + 1)
+
+
+    def rotate(self, source, dest):
+        """ Renames the live file and queues it for compression """
+        logging.handlers.TimedRotatingFileHandler.rotate(self, source, dest)
+        self.work.put(dest)
+
+
+    def getFilesToDelete(self):
+        """ Retention is applied by the background thread once compression is done """
+        return []
+
+
+    def rotated_files(self):
+        """ Returns the rotated files (compressed or not), oldest first """
+        dir_name, base_name = os.path.split(self.baseFilename)
+        prefix = base_name + "."
+        files = [os.path.join(dir_name, name) for name in os.listdir(dir_name)
+                 if name.startswith(prefix) and ROTATED_PATTERN.match(name[len(prefix):])]
+        return sorted(files, key=os.path.getmtime)
+
+
+    def companions(self, filename):
+        """ Returns any files stored alongside a rotated file that go when it is removed """
+        return []
+
+
+    def size(self, filename):
+        """ Returns the bytes used by a file and its companions (0 for any that don't exist) """
+        return sum(os.path.getsize(name) for name in [filename] + self.companions(filename)
+                   if os.path.exists(name))
+
+
+    def prune(self):
+        """ Removes the oldest rotated files beyond backupCount or the byte cap.  Returns the
+        list of files removed """
+        files = self.rotated_files()
+        sizes = {filename: self.size(filename) for filename in files}
+        total = sum(sizes.values()) + self.size(self.baseFilename)
+        removed = []
+        while files and ((self.backupCount > 0 and len(files) > self.backupCount) or
+                         (self.max_total_bytes > 0 and total > self.max_total_bytes)):
+            filename = files.pop(0)
+            total -= sizes[filename]
+            for name in [filename] + self.companions(filename):
+                if os.path.exists(name):
+                    os.remove(name)
+            removed.append(filename)
+        return removed
+
+
+    def compress_loop(self):
+        """ Background thread: compresses each rotated file, then applies retention """
+        while True:
+            filename = self.work.get()
+            if filename is None:
+                self.work.task_done()
+                break
+            try:
+                # Retention may already have removed a file that was still waiting its turn
+                if os.path.exists(filename):
+                    compress(filename)
+                # Prune once the backlog is compressed so sizes are counted after compression
+                if self.work.empty():
+                    self.prune()
+            except Exception:
+                self.logger.exception("Could not compress rotated log [%s]", filename)
+            self.work.task_done()
+
+
+    def close(self):
+        """ Waits for any queued compression before closing """
+        if self.worker.is_alive():
+            self.work.put(None)
+            self.worker.join()
+        logging.handlers.TimedRotatingFileHandler.close(self)
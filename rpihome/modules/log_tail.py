@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+""" log_tail.py: Incremental reader for a log file written by a rotating handler.  Keeps the
+    byte offset and inode of the file it is reading so each call only reads the bytes added
+    since the last one, and starts again from the top when the file is rotated or truncated
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import logging
+import os
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Most bytes read per call, so a large backlog is spread over several ticks
+MAX_READ = 65536
+
+
+# Log Tailer Class ********************************************************************************
+class LogTailer(object):
+    """ Returns the complete lines appended to a file since the last call.  backlog lines from
+    the end of the existing file are returned by the first call """
+    def __init__(self, filename, backlog=0, max_read=MAX_READ, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.filename = filename
+        self.max_read = max_read
+        self.file = None
+        self.inode = None
+        self.offset = 0
+        self.partial = b""
+        self.rotations = 0
+        self.start(backlog)
+
+
+    def start(self, backlog):
+        """ Opens the file and positions the offset backlog lines before its end """
+        if self.open() is False:
+            return
+        size = os.fstat(self.file.fileno()).st_size
+        self.offset = size
+        if backlog > 0 and size > 0:
+            start = max(0, size - self.max_read)
+            self.file.seek(start)
+            data = self.file.read(size - start)
+            # Skip the trailing newline then count back backlog line breaks
+            pos = len(data) - 1
+            for i in range(backlog):
+                pos = data.rfind(b"\n", 0, pos)
+                if pos == -1:
+                    break
+            self.offset = start + pos + 1 if pos != -1 else start
+
+
+    def open(self):
+        """ Opens the file currently at filename.  Returns False if there isn't one yet """
+        try:
+            self.file = open(self.filename, "rb")
+        except OSError:
+            self.file = None
+            return False
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.offset = 0
+        self.partial = b""
+        return True
+
+
+    def close(self):
+        """ Closes the file being read """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+    def read_lines(self):
+        """ Returns the list of complete lines (without line endings) written since the last
+        call.  A line still being written is held back until its newline arrives """
+        lines = []
+        try:
+            inode = os.stat(self.filename).st_ino
+        except OSError:
+            inode = None
+        # A new inode means the handler rotated the file: finish the old one, then switch over
+        if self.file is None or (inode is not None and inode != self.inode):
+            if self.file is not None:
+                lines = self.split(self.read(self.max_read), final=True)
+                self.close()
+                self.rotations += 1
+                self.logger.debug("Log file [%s] rotated, reading from the start", self.filename)
+            if self.open() is False:
+                return lines
+        # A size smaller than the offset means the file was truncated in place
+        elif os.fstat(self.file.fileno()).st_size < self.offset:
+            self.offset = 0
+            self.partial = b""
+        return lines + self.split(self.read(self.max_read))
+
+
+    def read(self, count):
+        """ Reads up to count bytes from the offset """
+        self.file.seek(self.offset)
+        data = self.file.read(count)
+        self.offset += len(data)
+        return data
+
+
+    def split(self, data, final=False):
+        """ Splits data into complete lines, holding back any partial last line unless final is
+        set (the file has been rotated so nothing more will be added to it) """
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        if final is True and len(self.partial) > 0:
+            lines.append(self.partial)
+            self.partial = b""
+        return [line.decode("utf-8", errors="replace").rstrip("\r") for line in lines]
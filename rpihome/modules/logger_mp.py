@@ -1,12 +1,30 @@
 import logging
+import logging.handlers
+from .log_json import JsonLinesHandler
+from .log_rotate import CompressingRotatingHandler
+from .log_ring import LogRingHandler
 
 
-def listener_configurer(debug_logfile, info_logfile):
+# Seconds over which repeats of the same debug event are collapsed into one record
+DEDUP_WINDOW = 1.0
+# Per-logger windows (0 turns collapsing off).  The router's forwarding trace is kept complete
+# so every message can still be found in the structured log, as is the traffic in and out of
+# the logic solver (including the peer channels that bypass the router) so it can be replayed
+DEDUP_WINDOWS = {"modules.router": 0.0, "p11_logic_solver": 0.0, "p15_rpi_screen": 0.0,
+                 "p16_wemo_gateway": 0.0}
+
+
+def listener_configurer(debug_logfile, info_logfile, capacity=200, ring=None, json_logfile=None):
+    """ Configures the root logger of the log listener process.  Each output handler sits behind
+    a MemoryHandler so records are written in batches of up to capacity (or sooner on an error
+    or when flush_handlers() is called).  If a LogRing is given every record is also written to
+    it straight away for the gui.  If json_logfile is given a structured JSON-lines copy of every
+    record is also written, with a time index alongside.  Returns the list of buffering handlers """
     root = logging.getLogger()
     root.handlers = []
     # Create desired handlers
-    debug_handler = logging.handlers.TimedRotatingFileHandler(debug_logfile, when="h", interval=1, backupCount=24, encoding=None, delay=False, utc=False, atTime=None)
-    info_handler = logging.handlers.TimedRotatingFileHandler(info_logfile, when="h", interval=1, backupCount=24, encoding=None, delay=False, utc=False, atTime=None)
+    debug_handler = CompressingRotatingHandler(debug_logfile, backupCount=24)
+    info_handler = CompressingRotatingHandler(info_logfile, backupCount=24)
     console_handler = logging.StreamHandler()
     # Create individual formats for each handler
     debug_formatter = logging.Formatter('%(processName)-16s,  %(asctime)-24s,  %(levelname)-8s, %(message)s')
@@ -20,16 +38,116 @@ def listener_configurer(debug_logfile, info_logfile):
     debug_handler.setLevel(logging.DEBUG)
     info_handler.setLevel(logging.INFO)
     console_handler.setLevel(logging.INFO)
-    # Add handlers to root logger
-    root.addHandler(debug_handler)
-    root.addHandler(info_handler)
-    root.addHandler(console_handler)
+    handlers = [debug_handler, info_handler, console_handler]
+    # Optional structured copy for querying by message fields and time
+    if json_logfile is not None:
+        json_handler = JsonLinesHandler(json_logfile)
+        json_handler.setLevel(logging.DEBUG)
+        handlers.append(json_handler)
+    # Buffer each handler and add them to root logger
+    buffers = []
+    for handler in handlers:
+        buffer = logging.handlers.MemoryHandler(capacity, flushLevel=logging.ERROR, target=handler)
+        # The target's level isn't checked again when the buffer flushes, so filter on the way in
+        buffer.setLevel(handler.level)
+        root.addHandler(buffer)
+        buffers.append(buffer)
+    # Recent lines for the gui alarm window go to shared memory unbuffered
+    if ring is not None:
+        ring_handler = LogRingHandler(ring, logging.DEBUG)
+        ring_handler.setFormatter(logging.Formatter('%(processName)-16s,  %(asctime)-24s,  %(levelname)-8s, %(message)s'))
+        root.addHandler(ring_handler)
+    return buffers
+
+
+def handle_record(record):
+    """ Passes a log record received from a worker process to the handlers of its logger """
+    if isinstance(record, logging.LogRecord) is True:
+        logging.getLogger(record.name).handle(record)
+
+
+def flush_handlers(handlers):
+    """ Writes out any records held by the buffering handlers.  Returns the number of buffered
+    entries written, summed over the handlers """
+    count = 0
+    for handler in handlers:
+        count += len(handler.buffer)
+        handler.flush()
+    return count
+
+
+def close_handlers(handlers):
+    """ Flushes the buffering handlers and closes their targets, waiting for any rotated file
+    still being compressed """
+    flush_handlers(handlers)
+    for handler in handlers:
+        handler.target.close()
+        handler.close()
 
 
 
-def worker_configurer(queue):
+def worker_configurer(queue, dedup_window=DEDUP_WINDOW, dedup_windows=DEDUP_WINDOWS):
+    """ Sends every record logged in the calling process to the log listener through queue.
+    Repeated debug events are collapsed by a DedupFilter before they are queued """
     handler = logging.handlers.QueueHandler(queue)
+    if dedup_window > 0:
+        handler.addFilter(DedupFilter(dedup_window, dedup_windows))
     root = logging.getLogger()
     root.handlers = []
     root.addHandler(handler)
     root.setLevel(logging.DEBUG)
+
+
+
+# Dedup Filter Class ******************************************************************************
+class DedupFilter(logging.Filter):
+    """ Collapses repeats of the same event, identified by logger name and message template
+    (the format string before its arguments are filled in), within a window of seconds.  The
+    first event passes and opens the window; repeats inside it are dropped and counted, and the
+    count is added to the next occurrence after the window closes.  Only records at or below
+    level are considered.  windows maps logger names to their own window, with child loggers
+    using the nearest parent's entry """
+    def __init__(self, window=DEDUP_WINDOW, windows=None, level=logging.DEBUG):
+        logging.Filter.__init__(self)
+        self.window = window
+        self.windows = dict(windows or {})
+        self.level = level
+        self.seen = {}
+        self.cache = {}
+        self.last_prune = 0.0
+        self.suppressed = 0
+
+
+    def window_for(self, name):
+        """ Returns the window that applies to a logger """
+        window = self.cache.get(name)
+        if window is None:
+            part = name
+            while part not in self.windows and "." in part:
+                part = part.rpartition(".")[0]
+            window = self.windows.get(part, self.window)
+            self.cache[name] = window
+        return window
+
+
+    def filter(self, record):
+        if record.levelno > self.level or isinstance(record.msg, str) is False:
+            return True
+        window = self.window_for(record.name)
+        if window <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = record.created
+        entry = self.seen.get(key)
+        if entry is not None and now - entry[0] < window:
+            entry[1] += 1
+            self.suppressed += 1
+            return False
+        if entry is not None and entry[1] > 0:
+            record.msg = record.msg + " [+%d similar in the previous %.1fs]" % (entry[1], window)
+        self.seen[key] = [now, 0]
+        # Forget events that haven't been seen for a while
+        if now - self.last_prune > 60.0:
+            self.seen = {key: entry for key, entry in self.seen.items() if now - entry[0] < 60.0}
+            self.last_prune = now
+        return True
@@ -3,8 +3,7 @@
 """
 
 # Import Required Libraries (Standard, Third Party, Local) ************************************************************
-import copy
-import logging
+import struct
 
 
 # Authorship Info *********************************************************************************
@@ -18,97 +17,129 @@ __email__ = "csmaue@gmail.com"
 __status__ = "Development"
 
 
+# Wire Format *************************************************************************************
+# Packed messages are a fixed 8 byte header followed by the variable length fields:
+#   source (1 byte), dest (1 byte), type index (1 byte), name length (1 byte), payload length (2 bytes),
+#   correlation id (2 bytes, 0 when the message isn't part of a request/reply exchange)
+#   [type length (1 byte) + type]  only present when the type code is not in TYPE_CODES
+#   name (utf-8), payload (utf-8)
+# Source and dest are the two digit process codes stored as integers.  Because the payload
+# length is carried in the header, payloads may contain commas (or any other character).  The
+# correlation id only exists in the packed form; the csv form has no field for it.
+# Packed messages (and logged ones) carry the index, so new codes go on the end.
+TYPE_CODES = ("", "001", "002", "003", "020", "020A", "021", "021A", "022", "022A", "100",
+              "130", "150", "160", "160A", "161", "162", "162A", "168", "900", "999", "004", "005")
+TYPE_INDEX = {code: index for index, code in enumerate(TYPE_CODES)}
+ESCAPE = 255
+PROCESS_CODES = tuple("" if i == ESCAPE else "%02d" % i for i in range(256))
+PROCESS_INDEX = {code: index for index, code in enumerate(PROCESS_CODES)}
+HEADER = struct.Struct("!BBBBHH")
+
+
+def peek_dest(data):
+    """ Returns the destination code of a message in either wire form (packed bytes or legacy
+    csv string) without building a Message """
+    if isinstance(data, str):
+        return data.split(",", 2)[1]
+    return PROCESS_CODES[data[1]]
+
+
+def peek_type(data):
+    """ Returns the type code of a message in either wire form (packed bytes or legacy csv
+    string) without building a Message """
+    if isinstance(data, str):
+        return data.split(",", 3)[2]
+    if data[2] != ESCAPE:
+        return TYPE_CODES[data[2]]
+    return data[HEADER.size + 1:HEADER.size + 1 + data[HEADER.size]].decode("utf-8")
+
+
 # Message Helper Class *****************************************************************************
 class Message(object):
-    def __init__(self, logger=None, **kwargs):
-        # Configure logger
-        self.logger = logger or logging.getLogger(__name__)      
-        # Init tags        
-        self.source = str()
-        self.dest = str()
-        self.type = str()
-        self.name = str()
-        self.payload = str()
-        self.part = []
-        # Process input variables if present    
-        if kwargs is not None:
-            for key, value in kwargs.items():
-                if key == "source":
-                    self.source = value
-                if key == "dest":
-                    self.dest = value 
-                if key == "type":
-                    self.type = value                    
-                if key == "name":
-                    self.name = value 
-                if key == "payload":
-                    self.payload = value
-                if key == "raw":
-                    self.raw = value
+    __slots__ = ("source", "dest", "type", "name", "payload", "corr_id")
+
+    def __init__(self, source="", dest="", type="", name="", payload="", corr_id=0, raw=None, logger=None):
+        # Init tags
+        self.source = source
+        self.dest = dest
+        self.type = type
+        self.name = name
+        self.payload = payload
+        self.corr_id = corr_id
+        # Process raw input if present (either wire form)
+        if raw is not None:
+            if isinstance(raw, bytes):
+                self.unpack(raw)
+            else:
+                self.raw = raw
 
 
     @property
     def raw(self):
+        """ Comma separated form of the message, used for logging and by older senders """
         return (self.source + "," + self.dest + "," + self.type + "," +
                 self.name + "," + self.payload)
 
     @raw.setter
     def raw(self, value):
         if isinstance(value, str) is True:
-            self.part = value.split(sep=",", maxsplit=4)
-            if len(self.part) >= 1:
-                self.source = self.part[0]
-            if len(self.part) >= 2:                
-                self.dest = self.part[1]
-            if len(self.part) >= 3:                
-                self.type = self.part[2]
-            if len(self.part) >= 4:                
-                self.name = self.part[3]
-            if len(self.part) >= 5:                
-                self.payload = self.part[4]
-
-    @property
-    def source(self):
-        return self.__source
-
-    @source.setter
-    def source(self, value):
-        if isinstance(value, str) is True:
-            self.__source = value
+            part = value.split(sep=",", maxsplit=4)
+            if len(part) >= 1:
+                self.source = part[0]
+            if len(part) >= 2:
+                self.dest = part[1]
+            if len(part) >= 3:
+                self.type = part[2]
+            if len(part) >= 4:
+                self.name = part[3]
+            if len(part) >= 5:
+                self.payload = part[4]
+        elif isinstance(value, (bytes, bytearray)) is True:
+            self.unpack(value)
 
-    @property
-    def dest(self):
-        return self.__dest
-
-    @dest.setter
-    def dest(self, value):
-        if isinstance(value, str) is True:
-            self.__dest = value
 
     @property
-    def type(self):
-        return self.__type
-
-    @type.setter
-    def type(self, value):
-        if isinstance(value, str) is True:
-            self.__type = value
-
-    @property
-    def name(self):
-        return self.__name
-
-    @name.setter
-    def name(self, value):
-        if isinstance(value, str) is True:
-            self.__name = value
-
-    @property
-    def payload(self):
-        return self.__payload
-
-    @payload.setter
-    def payload(self, value):
-        if isinstance(value, str) is True:
-            self.__payload = value
-                         
\ No newline at end of file
+    def packed(self):
+        """ Compact binary form of the message sent between processes.  Raises ValueError if a
+        field doesn't fit the wire format: source and dest must be two digit process codes, the
+        type and name at most 255 bytes, the payload at most 65535 bytes and the correlation id
+        0 - 65535 """
+        name = self.name.encode("utf-8")
+        payload = self.payload.encode("utf-8")
+        type_index = TYPE_INDEX.get(self.type, ESCAPE)
+        try:
+            header = HEADER.pack(PROCESS_INDEX[self.source], PROCESS_INDEX[self.dest], type_index,
+                                 len(name), len(payload), self.corr_id)
+        except (KeyError, struct.error):
+            raise ValueError("Message [%s] (corr_id %r) does not fit the packed form" %
+                             (self.raw, self.corr_id)) from None
+        if type_index != ESCAPE:
+            return header + name + payload
+        type_code = self.type.encode("utf-8")
+        if len(type_code) > 255:
+            raise ValueError("Message [%s] type is too long for the packed form" % self.raw)
+        return header + bytes((len(type_code),)) + type_code + name + payload
+
+
+    def unpack(self, data):
+        """ Loads the message fields from the compact binary form """
+        source, dest, type_index, name_len, payload_len, self.corr_id = HEADER.unpack_from(data)
+        self.source = PROCESS_CODES[source]
+        self.dest = PROCESS_CODES[dest]
+        pos = HEADER.size
+        if type_index != ESCAPE:
+            self.type = TYPE_CODES[type_index]
+        else:
+            type_len = data[pos]
+            self.type = data[pos + 1:pos + 1 + type_len].decode("utf-8")
+            pos += 1 + type_len
+        self.name = data[pos:pos + name_len].decode("utf-8") if name_len else ""
+        pos += name_len
+        self.payload = data[pos:pos + payload_len].decode("utf-8") if payload_len else ""
+        return self
+
+
+    def __repr__(self):
+        if self.corr_id != 0:
+            return "Message(%s, corr_id=%d)" % (self.raw, self.corr_id)
+        return "Message(%s)" % self.raw
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+""" pending.py: Client-side table of gateway requests waiting for their reply.  Requests are
+    tagged with a correlation id so each reply can be matched to the request that caused it,
+    overdue requests can be expired and round-trip latency can be reported per operation
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import logging
+import time
+from .message import Message, peek_type
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Request type -> reply type for the gateway operations tracked
+REPLY_TYPES = {"020": "020A", "021": "021A", "022": "022A", "160": "160A", "162": "162A"}
+# Correlation ids are 16 bit, 0 means "not a tracked request"
+MAX_CORR_ID = 65535
+
+
+# Pending Request Class ***************************************************************************
+class PendingRequest(object):
+    """ A request in flight.  Works like a minimal future: once the reply arrives (or the
+    deadline passes) it is marked done and its callback, if any, is called with it """
+    def __init__(self, msg, deadline, callback=None, sent=None):
+        self.msg = msg
+        self.deadline = deadline
+        self.callback = callback
+        self.sent = time.monotonic() if sent is None else sent
+        self.reply = None
+        self.latency = None
+        self.done = False
+        self.timed_out = False
+
+
+    def finish(self, reply=None, now=None):
+        """ Marks the request done with the reply given (None on a timeout) """
+        if now is None:
+            now = time.monotonic()
+        self.done = True
+        self.reply = reply
+        self.timed_out = reply is None
+        if reply is not None:
+            self.latency = now - self.sent
+        if self.callback is not None:
+            self.callback(self)
+
+
+
+# Pending Requests Class **************************************************************************
+class PendingRequests(object):
+    """ Wraps a process' outgoing queue.  Gateway requests put through it are given a
+    correlation id and remembered until the matching reply is passed to resolve() or their
+    deadline passes.  Everything else is passed straight through """
+    def __init__(self, out_queue, timeout=10.0, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.out_queue = out_queue
+        self.timeout = timeout
+        self.next_id = 1
+        self.requests = {}
+        self.stats = {}
+
+
+    def put_nowait(self, data):
+        """ Sends a message (in either wire form).  Gateway requests are tracked with the default
+        timeout so existing callers (devices, gui buttons) are covered without changes """
+        if peek_type(data) in REPLY_TYPES:
+            self.send(Message(raw=data))
+        else:
+            self.out_queue.put_nowait(data)
+
+
+    def send(self, msg, callback=None, timeout=None, now=None):
+        """ Tags a request with a fresh correlation id, sends it and returns the PendingRequest
+        that will be resolved by its reply, or None if the request can't be packed (it is logged
+        and dropped) """
+        if now is None:
+            now = time.monotonic()
+        msg.corr_id = self.new_id()
+        try:
+            data = msg.packed
+        except ValueError:
+            self.logger.warning("Dropped request [%s]: it can't be packed", msg.raw)
+            return None
+        request = PendingRequest(msg, now + (timeout or self.timeout), callback, sent=now)
+        self.requests[msg.corr_id] = request
+        self.out_queue.put_nowait(data)
+        return request
+
+
+    def new_id(self):
+        """ Returns the next unused correlation id """
+        while True:
+            corr_id = self.next_id
+            self.next_id = self.next_id % MAX_CORR_ID + 1
+            if corr_id not in self.requests:
+                return corr_id
+
+
+    def resolve(self, msg, now=None):
+        """ Matches a reply to its request.  Returns the PendingRequest it completed, or None
+        if the message isn't a reply to a request still in flight """
+        if msg.corr_id == 0:
+            return None
+        request = self.requests.get(msg.corr_id)
+        if request is None or REPLY_TYPES.get(request.msg.type) != msg.type:
+            return None
+        del self.requests[msg.corr_id]
+        request.finish(msg, now)
+        stats = self.stats.setdefault(request.msg.type, [0, 0.0, 0.0, 0])
+        stats[0] += 1
+        stats[1] += request.latency
+        stats[2] = max(stats[2], request.latency)
+        return request
+
+
+    def expire(self, now=None):
+        """ Drops every request whose deadline has passed and returns them """
+        if now is None:
+            now = time.monotonic()
+        expired = [request for request in self.requests.values() if request.deadline <= now]
+        for request in expired:
+            del self.requests[request.msg.corr_id]
+            self.stats.setdefault(request.msg.type, [0, 0.0, 0.0, 0])[3] += 1
+            self.logger.warning("No reply to request [%s] within %.1fs", request.msg.raw,
+                                request.deadline - request.sent)
+            request.finish(None, now)
+        return expired
+
+
+    def seconds_to_deadline(self, default=None, now=None):
+        """ Returns the number of seconds (never negative) until the next request expires, or
+        default if nothing is in flight """
+        if len(self.requests) == 0:
+            return default
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, min(request.deadline for request in self.requests.values()) - now)
+
+
+    def latency(self):
+        """ Returns a dictionary of request type -> (replies, average round trip, max round trip,
+        timeouts), times in seconds """
+        return {type: (count, total / count if count else 0.0, peak, timeouts)
+                for type, (count, total, peak, timeouts) in self.stats.items()}
+
+
+    def report(self):
+        """ Returns a one line summary of the round trip latency per operation for logging """
+        return ", ".join("%s: %d replies avg %.1f ms max %.1f ms %d timeouts" %
+                         (type, count, average * 1e3, peak * 1e3, timeouts)
+                         for type, (count, average, peak, timeouts) in sorted(self.latency().items()))
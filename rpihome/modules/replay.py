@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+""" replay.py: Deterministic replay of the logic solver.  A recorded stream of the messages the
+    solver received (home/away updates, gateway replies) is fed into a LogicProcess that is never
+    started, interleaved with clock ticks at its automation interval, as fast as the rules can be
+    run.  The commands the solver sends in response are captured along with the simulated time
+    they were sent, so the result of a rule change can be diffed against what production sent
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import collections
+import datetime
+import difflib
+import logging
+import time
+from .clock import SimulatedClock
+from .message import Message
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+SOLVER = "11"
+# Message types fed to the solver
+REPLAY_TYPES = ("020A", "021A", "022A", "100", "160A", "162A")
+# Message types captured as the solver's output (rpi screen and wemo commands)
+COMMAND_TYPES = ("150", "161")
+# Every process logs this when a message arrives, including messages sent straight to a peer
+# that never pass through the router, so log_events(filename, where=RECEIVED) gives both the
+# solver's inputs and the commands it sent
+RECEIVED = "from incoming message queue"
+# A message sent (or received) at a time in seconds since the epoch
+Command = collections.namedtuple("Command", "time msg")
+
+
+def solver_inputs(events, types=REPLAY_TYPES):
+    """ Yields the logged events carrying a message of one of types to the solver """
+    for event in events:
+        if event.msg.dest == SOLVER and event.msg.type in types:
+            yield event
+
+
+def solver_commands(events, types=COMMAND_TYPES):
+    """ Yields a Command for each logged event carrying a command of one of types from the
+    solver, i.e. what production sent """
+    for event in events:
+        if event.msg.source == SOLVER and event.msg.type in types:
+            yield Command(event.time, event.msg)
+
+
+def format_commands(commands, resolution=60):
+    """ Returns one line of text per command, with its time rounded down to resolution seconds
+    so small differences in timing between production and a replay don't show up in a diff """
+    lines = []
+    for command in commands:
+        when = datetime.datetime.fromtimestamp(command.time - command.time % resolution)
+        lines.append("%s %s,%s,%s" % (when.strftime("%Y-%m-%d %H:%M:%S"), command.msg.dest,
+                                      command.msg.type, command.msg.name + "=" + command.msg.payload))
+    return lines
+
+
+def diff_commands(expected, actual, resolution=60):
+    """ Returns the unified diff (a list of lines) between two command streams """
+    return list(difflib.unified_diff(format_commands(expected, resolution), format_commands(actual, resolution),
+                                     "expected", "actual", lineterm=""))
+
+
+
+# Capture Queue Class *****************************************************************************
+class CaptureQueue(object):
+    """ Stands in for the solver's outgoing queue.  Keeps every message put on it along with
+    the simulated time it was sent """
+    def __init__(self):
+        self.now = 0.0
+        self.sent = []
+
+
+    def put_nowait(self, data):
+        self.sent.append(Command(self.now, Message(raw=data)))
+
+
+
+# Replay Class ************************************************************************************
+class Replay(object):
+    """ Drives a LogicProcess (constructed but not started) from a recorded message stream.
+    The simulated clock starts at the first message (or the time given to start()) and ticks
+    every interval seconds; each tick runs the same automation and command steps as the
+    solver's main loop, and is timed """
+    def __init__(self, solver, interval=None, types=COMMAND_TYPES, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.solver = solver
+        self.interval = interval or solver.automation_interval.total_seconds()
+        self.types = types
+        self.next_tick = None
+        self.ticks = 0
+        self.messages = 0
+        self.tick_time = 0.0
+        self.max_tick_time = 0.0
+        self.elapsed = 0.0
+        # Run the solver on a simulated clock
+        self.clock = SimulatedClock()
+        self.solver.clock = self.clock
+        # Send everything the solver (and the devices it creates) sends to the capture queue
+        self.out_queue = CaptureQueue()
+        self.solver.msg_out_queue = self.out_queue
+        self.solver.requests.out_queue = self.out_queue
+
+
+    def start(self, start):
+        """ Sets the simulated clock and creates the solver's devices """
+        self.next_tick = start
+        self.set_time(start)
+        # Nobody is home, as when the solver starts
+        self.solver.create_home_flags()
+        self.solver.create_devices()
+
+
+    def set_time(self, when):
+        """ Moves the simulated clock to a time in seconds since the epoch """
+        self.out_queue.now = when
+        self.clock.set(datetime.datetime.fromtimestamp(when))
+
+
+    def tick(self):
+        """ Runs the solver's automation rules and commands at the next tick time """
+        self.set_time(self.next_tick)
+        started = time.perf_counter()
+        self.solver.check_dst()
+        self.solver.run_automation()
+        self.solver.run_commands()
+        elapsed = time.perf_counter() - started
+        self.ticks += 1
+        self.tick_time += elapsed
+        self.max_tick_time = max(self.max_tick_time, elapsed)
+        self.next_tick += self.interval
+
+
+    def advance(self, until):
+        """ Runs every tick due at or before time until """
+        while self.next_tick <= until:
+            self.tick()
+
+
+    def feed(self, event):
+        """ Delivers one recorded message to the solver at its recorded time """
+        if self.next_tick is None:
+            self.start(event.time)
+        self.advance(event.time)
+        self.set_time(event.time)
+        self.solver.process_work_msg(event.msg)
+        self.messages += 1
+
+
+    def run(self, events, end=None):
+        """ Feeds every event (anything with time and msg fields, e.g. from solver_inputs), then
+        keeps ticking until time end if given.  Returns the commands the solver sent """
+        started = time.perf_counter()
+        for event in events:
+            self.feed(event)
+        if end is not None and self.next_tick is not None:
+            self.advance(end)
+        self.elapsed += time.perf_counter() - started
+        return self.commands()
+
+
+    def commands(self):
+        """ Returns the commands (of the types being captured) the solver has sent so far """
+        return [command for command in self.out_queue.sent if command.msg.type in self.types]
+
+
+    def report(self):
+        """ Summarizes the replay: ticks run, the solver's cost per tick and the speed-up over
+        real time """
+        return "%d ticks, %d messages, %.1f us/tick (max %.1f us), %.0fx real time" % (
+            self.ticks, self.messages, self.tick_time / max(self.ticks, 1) * 1e6,
+            self.max_tick_time * 1e6, self.ticks * self.interval / self.elapsed if self.elapsed > 0 else 0.0)
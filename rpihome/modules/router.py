@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+""" router.py: Table-driven message router used by the main process to forward messages to the
+    queue of the child process they are addressed to
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import logging
+import time
+from .channel import CONTROL_TYPES
+from .message import Message, peek_dest, peek_type
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Router Class ************************************************************************************
+class Router(object):
+    """ Routing table mapping destination codes to child process queues, plus a table of
+    side-effect handlers keyed by message type.  Dispatch is a single dictionary lookup so the
+    cost stays flat as services are added """
+    def __init__(self, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.routes = {}
+        self.side_effects = {}
+        self.peers = {}
+        self.counts = {}
+        self.rate_start = time.monotonic()
+
+
+    def add_route(self, dest, queue):
+        """ Adds (or replaces) the queue messages for a destination code are forwarded to """
+        self.routes[dest] = queue
+        self.counts.setdefault(dest, 0)
+
+
+    def remove_route(self, dest):
+        """ Removes a destination from the routing table """
+        self.routes.pop(dest, None)
+
+
+    def add_peers(self, dest1, dest2):
+        """ Marks two destinations as direct peers so each is handed a channel straight to the
+        other's queue instead of bouncing messages through the main process """
+        self.peers.setdefault(dest1, set()).add(dest2)
+        self.peers.setdefault(dest2, set()).add(dest1)
+
+
+    def peer_queues(self, dest):
+        """ Returns a dictionary of destination code -> queue for every direct peer of dest """
+        return {peer: self.routes[peer] for peer in self.peers.get(dest, ()) if peer in self.routes}
+
+
+    def add_side_effect(self, type, handler):
+        """ Registers a handler that is called with every forwarded message of a given type """
+        self.side_effects.setdefault(type, []).append(handler)
+
+
+    def route(self, msg):
+        """ Forwards a message to the queue registered for its destination and runs any side
+        effects registered for its type.  Returns True if the message was forwarded """
+        queue = self.routes.get(msg.dest)
+        if queue is None:
+            self.logger.debug("No route for message [%s]", msg.raw)
+            return False
+        try:
+            data = msg.packed
+        except ValueError:
+            self.logger.warning("Dropped message [%s]: it can't be packed", msg.raw)
+            return False
+        queue.put_nowait(data)
+        self.counts[msg.dest] += 1
+        self.logger.debug("Transfered message [%s] to p%s queue", msg.raw, msg.dest)
+        for handler in self.side_effects.get(msg.type, ()):
+            handler(msg)
+        return True
+
+
+    def rates(self):
+        """ Returns the number of messages per second forwarded to each destination since the
+        last call, then resets the counters """
+        now = time.monotonic()
+        elapsed = max(now - self.rate_start, 1e-6)
+        result = {dest: count / elapsed for dest, count in self.counts.items()}
+        for dest in self.counts:
+            self.counts[dest] = 0
+        self.rate_start = now
+        return result
+
+
+
+# Peer Channel Class ******************************************************************************
+class PeerChannels(object):
+    """ Outbound channel used by a child process in place of the main process queue.  Messages
+    addressed to a direct peer are put straight onto that peer's queue; everything else is sent
+    to the main process for routing as before.  Control messages (restart, kill, log levels)
+    always go through the main process so its side effects for them (restarting or joining the
+    process, recording log levels) still run """
+    def __init__(self, main_queue, peers=None, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.main_queue = main_queue
+        self.peers = peers or {}
+        self.direct_count = 0
+        self.relay_count = 0
+
+
+    def put_nowait(self, data):
+        """ Sends a message (in wire form, or a Message to be packed) to its destination using
+        the shortest available path.  A Message that can't be packed is logged and dropped """
+        if isinstance(data, Message):
+            try:
+                data = data.packed
+            except ValueError:
+                self.logger.warning("Dropped message [%s]: it can't be packed", data.raw)
+                return
+        queue = None
+        if self.peers and peek_type(data) not in CONTROL_TYPES:
+            queue = self.peers.get(peek_dest(data))
+        if queue is not None:
+            queue.put_nowait(data)
+            self.direct_count += 1
+        else:
+            self.main_queue.put_nowait(data)
+            self.relay_count += 1
+
+
+    def close(self):
+        """ Closes the channel to the main process """
+        self.main_queue.close()
+
+
+    def hops(self):
+        """ Returns the average number of queue hops per message sent (1 when sent direct to a
+        peer, 2 when relayed by the main process) """
+        total = self.direct_count + self.relay_count
+        if total == 0:
+            return 0.0
+        return (self.direct_count + 2 * self.relay_count) / total
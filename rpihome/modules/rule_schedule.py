@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+""" rule_schedule.py: Timer heap deciding which devices' automation rules need checking.  After
+    each check a device reports the next time its rules could give a different answer with the
+    same inputs; it isn't checked again until that time passes or the inputs (home/away flags,
+    the times users got home, the UTC offset) change, so a quiet house costs almost nothing
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import heapq
+import itertools
+import logging
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Rule Schedule Class *****************************************************************************
+class RuleSchedule(object):
+    """ Heap of (deadline, order, device) with one entry per device.  With enabled False every
+    device is due on every call, as before the heap existed """
+    def __init__(self, devices, enabled=True, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.devices = list(devices)
+        self.enabled = enabled
+        self.heap = []
+        self.order = itertools.count()
+        self.inputs = None
+        self.last = None
+        self.calls = 0
+        self.checks = 0
+
+
+    def due(self, now, inputs):
+        """ Removes and returns the devices to check at time now: all of them if the inputs
+        changed (or the clock went backwards) since the last call, otherwise those whose deadline
+        has been reached.  Each one must be put back with reschedule() once checked """
+        self.calls += 1
+        if (self.enabled is False or inputs != self.inputs or
+                self.last is None or now < self.last):
+            self.heap = []
+            devices = list(self.devices)
+        else:
+            devices = []
+            while self.heap and self.heap[0][0] <= now:
+                devices.append(heapq.heappop(self.heap)[2])
+        self.inputs = inputs
+        self.last = now
+        self.checks += len(devices)
+        return devices
+
+
+    def reschedule(self, device, when, now):
+        """ Puts a checked device back on the heap, due at time when.  None means the device
+        can't say, so it is due again on the next call (at or after now) """
+        if self.enabled is True:
+            heapq.heappush(self.heap, (now if when is None else when, next(self.order), device))
+
+
+    def next_deadline(self):
+        """ Returns the earliest deadline on the heap, or None if it is empty """
+        return self.heap[0][0] if self.heap else None
+
+
+    def report(self):
+        """ Summarizes how many device checks were run per call """
+        return "%d calls, %d device checks (%.2f per call)" % (
+            self.calls, self.checks, self.checks / max(self.calls, 1))
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+""" rules.py: Device automation rules defined as data.  Each device's rules are an ordered list
+    of cases; a case is a set of conditions (day of week, who is home, time of day, sunrise /
+    sunset) plus the state to set when they all hold, and the first case that holds wins.  If
+    none does the state is left as it was.  Rules are compiled once, when loaded, into one
+    closure per case.  Rules that only read the day, who is home and the time of day also keep
+    the answer for each combination of those in a table, so their closures run once per
+    combination.  Example case:
+        {"weekdays": [0, 1, 2, 3, 4], "all_home": [0], "between": ["05:30", "22:00"], "state": true}
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import bisect
+import datetime
+import json
+import logging
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+def time_of_day(text):
+    """ Returns the datetime.time for a "HH:MM" string """
+    hours, minutes = text.split(":")
+    return datetime.time(int(hours), int(minutes))
+
+
+def load_definitions(filename):
+    """ Returns the device definitions (a list of dicts) from a JSON rules file """
+    with open(filename, "r") as f:
+        return json.load(f)["devices"]
+
+
+def all_of(tests):
+    """ Returns one test that holds when every test in the list does, checked in order """
+    if len(tests) == 0:
+        return lambda device: True
+    if len(tests) == 1:
+        return tests[0]
+    first, rest = tests[0], all_of(tests[1:])
+    return lambda device: first(device) and rest(device)
+
+
+
+# Rule Set Class **********************************************************************************
+class RuleSet(object):
+    """ One device's compiled rules.  The conditions read the device the rules are evaluated
+    against: dt, weekday and time_of_day (all from the same datetime), homeArray, homeTime, and
+    sunrise, sunset and their offsets """
+    def __init__(self, name, cases, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.name = name
+        self.times = set()
+        self.sun = False
+        self.arrival = None
+        self.table = {}
+        self.cases = [self.compile_case(case) for case in cases]
+        self.times = tuple(sorted(self.times))
+
+
+    def compile_case(self, case):
+        """ Returns (test, state) for one case, noting the times of day and other inputs its
+        conditions use """
+        if isinstance(case.get("state"), bool) is False:
+            raise ValueError("Rule case %r for [%s] needs a true / false state" % (case, self.name))
+        tests = [self.compile_condition(key, value) for key, value in case.items() if key != "state"]
+        return (all_of(tests), case["state"])
+
+
+    def compile_condition(self, key, value):
+        """ Returns a test (a function of the device) for one condition """
+        if key == "weekdays":
+            days = frozenset(value)
+            return lambda device: device.weekday in days
+        if key == "all_home":
+            if len(value) == 1:
+                user = value[0]
+                return lambda device: device.homeArray[user] is True
+            users = tuple(value)
+            return lambda device: all(device.homeArray[i] is True for i in users)
+        if key == "any_home":
+            users = tuple(value)
+            return lambda device: any(device.homeArray[i] is True for i in users)
+        if key == "arrived_within":
+            self.arrival = datetime.timedelta(minutes=value)
+            return self.arrived
+        if key == "between":
+            start, end = time_of_day(value[0]), time_of_day(value[1])
+            self.times.update((start, end))
+            return lambda device: start <= device.time_of_day <= end
+        if key == "from":
+            start = time_of_day(value)
+            self.times.add(start)
+            return lambda device: device.time_of_day >= start
+        if key == "until":
+            end = time_of_day(value)
+            self.times.add(end)
+            return lambda device: device.time_of_day <= end
+        if key == "before_sunrise":
+            self.sun = True
+            return lambda device: (device.dt <= device.sunrise + device.sunriseOffset) is value
+        if key == "after_sunset":
+            self.sun = True
+            return lambda device: (device.dt >= device.sunset + device.sunsetOffset) is value
+        raise ValueError("Unknown rule condition [%s] for [%s]" % (key, self.name))
+
+
+    def arrived(self, device):
+        """ Returns True if a user who is home got there within the arrival window """
+        return any(home is True and device.dt < device.homeTime[i] + self.arrival
+                   for i, home in enumerate(device.homeArray))
+
+
+    def key(self, device):
+        """ Returns everything table-driven conditions read from the device: the day, who is
+        home, and where the time of day falls among (or on) the times compared against """
+        i = bisect.bisect_left(self.times, device.time_of_day)
+        return (device.weekday, tuple(device.homeArray), i, i < len(self.times) and self.times[i] == device.time_of_day)
+
+
+    def evaluate(self, device):
+        """ Returns the state set by the first case that holds for the device, or None """
+        # Sun times and arrivals change every day, so those rules aren't worth a table
+        if self.sun is True or self.arrival is not None:
+            return self.decide(device)
+        key = self.key(device)
+        if key in self.table:
+            return self.table[key]
+        state = self.table[key] = self.decide(device)
+        return state
+
+
+    def decide(self, device):
+        """ Runs the cases' closures: the state of the first that holds, or None """
+        for test, state in self.cases:
+            if test(device):
+                return state
+        return None
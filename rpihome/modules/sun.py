@@ -3,6 +3,8 @@
 """
 
 # Import Required Libraries (Standard, Third Party, Local) ************************************************************
+import collections
+import functools
 import logging
 from math import cos,sin,acos,asin,tan  
 from math import degrees as deg, radians as rad  
@@ -11,6 +13,19 @@ if __name__ == "__main__":
     from dst import USdst  
 
 
+# Constants ***********************************************************************************************************
+# Default location (St. Louis, MO)
+LAT = 38.566
+LONG = -90.410
+# Number of (date, offset, location) results kept by ephemeris()
+EPHEMERIS_CACHE_SIZE = 16
+# Sun times for one day as local datetimes
+Ephemeris = collections.namedtuple("Ephemeris", "sunrise sunset solarnoon")
+# Precomputed tables (see sun_table.py) registered by location, used by ephemeris() instead of
+# calculating
+TABLES = {}
+
+
 class Sun:  
     """  
     Calculate sunrise and sunset based on equations from NOAA 
@@ -77,6 +92,17 @@ class Sun:
             self.solarnoon_adj = datetime.combine((date.today()+ timedelta(days=1)), self.solarnoon_UTC) + offset
         return self.solarnoon_adj.time()
 
+    def ephemeris(self, day, offset=timedelta(hours=0)):
+        """
+        returns the Ephemeris (sunrise, sunset and solar noon as datetime.datetime objects on day, a
+        datetime.date, shifted by offset from UTC) from a single pass of the calculations, made for noon
+        """
+        self.__preptime(datetime.combine(day, time(12)))
+        self.__calc()
+        midnight = datetime.combine(day, time(0)) + offset
+        return Ephemeris(*(midnight + timedelta(seconds=int(t * 86400))
+                           for t in (self.sunrise_t, self.sunset_t, self.solarnoon_t)))
+
     @staticmethod  
     def __timefromdecimalday(day):  
         """ 
@@ -148,6 +174,17 @@ class Sun:
         self.sunrise_t  =self.solarnoon_t-hourangle*4/1440  
         self.sunset_t   =self.solarnoon_t+hourangle*4/1440  
   
+@functools.lru_cache(maxsize=EPHEMERIS_CACHE_SIZE)
+def ephemeris(day, offset=timedelta(hours=0), lat=LAT, long=LONG):
+    """ Returns the Ephemeris for a date, UTC offset and location.  The answer only changes once a
+    day, so it is calculated once (or read from the location's table) and kept in a small LRU
+    cache shared by every caller """
+    table = TABLES.get((lat, long))
+    if table is not None:
+        return table.ephemeris(day, offset)
+    return Sun(lat=lat, long=long).ephemeris(day, offset)
+
+
 if __name__ == "__main__":  
     s = Sun(lat=38.566, long=-90.410) 
     dst = USdst() 
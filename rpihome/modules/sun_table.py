@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+""" sun_table.py: A year of sunrise, sunset, solar noon and civil / nautical twilight for one
+    location, computed in a single pass over the NOAA equations (vectorized with numpy when it
+    is installed, a day at a time otherwise).  Each year is saved to a small binary file named
+    after the location and memory-mapped, so looking up a day is a read at a fixed offset
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import collections
+import datetime
+import logging
+import math
+import mmap
+import os
+import struct
+from .sun import LAT, LONG, Ephemeris, TABLES
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Constants ***************************************************************************************
+# Sun's zenith angle (degrees) at sunrise / sunset, civil and nautical twilight
+ZENITHS = (90.833, 96.0, 102.0)
+# Sun times for one day as local datetimes
+SunDay = collections.namedtuple("SunDay", "sunrise sunset solarnoon civil_dawn civil_dusk nautical_dawn nautical_dusk")
+# File layout: header, then one row per day of the year holding each SunDay field as a
+# fraction of the day (UTC, may be below 0 or above 1)
+MAGIC = b"SUNT"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHHdd")
+ROW = struct.Struct("<" + "d" * len(SunDay._fields))
+TABLE_SUFFIX = ".tbl"
+# Offset between date ordinals and the day numbers the NOAA equations use (1 = 1/1/1900),
+# plus the Julian day of that day number 0
+NOAA_DAY = 734124 - 40529
+NOAA_JDAY = 2415018.5
+# Math functions for a single value
+SCALAR = (math.sin, math.cos, math.tan, math.asin, math.acos, math.degrees, math.radians,
+          lambda x: min(1.0, max(-1.0, x)))
+
+
+def table_filename(directory, year, lat=LAT, long=LONG):
+    """ Returns the name of the file holding a year's table for a location """
+    return os.path.join(directory, "sun_%+.3f_%+.3f_%d%s" % (lat, long, year, TABLE_SUFFIX))
+
+
+def solar_day(jday, lat, long, functions=SCALAR):
+    """ Runs the NOAA equations for a Julian day (or a numpy array of them) at noon UTC and
+    returns the SunDay fields as fractions of the day.  functions supplies sin, cos, tan, asin,
+    acos, degrees, radians and clip, either for single values or for numpy arrays """
+    sin, cos, tan, asin, acos, deg, rad, clip = functions
+    Jcent = (jday - 2451545) / 36525
+    Manom = 357.52911 + Jcent * (35999.05029 - 0.0001537 * Jcent)
+    Mlong = 280.46646 + Jcent * (36000.76983 + Jcent * 0.0003032) % 360
+    Eccent = 0.016708634 - Jcent * (0.000042037 + 0.0001537 * Jcent)
+    Mobliq = 23 + (26 + ((21.448 - Jcent * (46.815 + Jcent * (0.00059 - Jcent * 0.001813)))) / 60) / 60
+    obliq = Mobliq + 0.00256 * cos(rad(125.04 - 1934.136 * Jcent))
+    vary = tan(rad(obliq / 2)) * tan(rad(obliq / 2))
+    Seqcent = (sin(rad(Manom)) * (1.914602 - Jcent * (0.004817 + 0.000014 * Jcent)) +
+               sin(rad(2 * Manom)) * (0.019993 - 0.000101 * Jcent) + sin(rad(3 * Manom)) * 0.000289)
+    Struelong = Mlong + Seqcent
+    Sapplong = Struelong - 0.00569 - 0.00478 * sin(rad(125.04 - 1934.136 * Jcent))
+    declination = deg(asin(sin(rad(obliq)) * sin(rad(Sapplong))))
+    eqtime = 4 * deg(vary * sin(2 * rad(Mlong)) - 2 * Eccent * sin(rad(Manom)) +
+                     4 * Eccent * vary * sin(rad(Manom)) * cos(2 * rad(Mlong)) -
+                     0.5 * vary * vary * sin(4 * rad(Mlong)) - 1.25 * Eccent * Eccent * sin(2 * rad(Manom)))
+    solarnoon = (720 - 4 * long - eqtime) / 1440
+    fields = []
+    for zenith in ZENITHS:
+        # Clipped so a sun that never gets that low (or high) gives an event at noon / midnight
+        hourangle = deg(acos(clip(cos(rad(zenith)) / (cos(rad(lat)) * cos(rad(declination))) -
+                                  tan(rad(lat)) * tan(rad(declination)))))
+        fields.append((solarnoon - hourangle * 4 / 1440, solarnoon + hourangle * 4 / 1440))
+    return (fields[0][0], fields[0][1], solarnoon, fields[1][0], fields[1][1], fields[2][0], fields[2][1])
+
+
+def compute_year(year, lat=LAT, long=LONG):
+    """ Returns a year's table (header and rows) as bytes """
+    first = datetime.date(year, 1, 1).toordinal()
+    days = datetime.date(year + 1, 1, 1).toordinal() - first
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, year, days, lat, long)
+    if numpy is not None:
+        jday = numpy.arange(first, first + days, dtype=numpy.float64) - NOAA_DAY + NOAA_JDAY + 0.5
+        columns = solar_day(jday, lat, long, (numpy.sin, numpy.cos, numpy.tan, numpy.arcsin, numpy.arccos,
+                                              numpy.degrees, numpy.radians, lambda x: numpy.clip(x, -1.0, 1.0)))
+        return header + numpy.stack(columns, axis=1).astype("<f8").tobytes()
+    return header + b"".join(ROW.pack(*solar_day(ordinal - NOAA_DAY + NOAA_JDAY + 0.5, lat, long))
+                             for ordinal in range(first, first + days))
+
+
+def write_year(filename, year, lat=LAT, long=LONG):
+    """ Computes a year's table and saves it """
+    with open(filename + ".tmp", "wb") as f:
+        f.write(compute_year(year, lat, long))
+    os.replace(filename + ".tmp", filename)
+
+
+
+# Sun Table Class *********************************************************************************
+class SunTable(object):
+    """ Memory-mapped yearly tables for one location, kept in directory.  A year is loaded (and
+    computed and saved first if its file doesn't exist yet) the first time a day in it is looked
+    up """
+    def __init__(self, directory, lat=LAT, long=LONG, logger=None):
+        # Configure logger
+        self.logger = logger or logging.getLogger(__name__)
+        # Init tags
+        self.directory = directory
+        self.lat = lat
+        self.long = long
+        self.years = {}
+
+
+    def year(self, year):
+        """ Returns the memory-mapped table for a year """
+        data = self.years.get(year)
+        if data is None:
+            filename = table_filename(self.directory, year, self.lat, self.long)
+            if self.valid(filename, year) is False:
+                os.makedirs(self.directory, exist_ok=True)
+                write_year(filename, year, self.lat, self.long)
+                self.logger.info("Saved sun table for %d to [%s]", year, filename)
+            with open(filename, "rb") as f:
+                data = self.years[year] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return data
+
+
+    def valid(self, filename, year):
+        """ Returns True if filename holds a complete table for the year at this location """
+        try:
+            with open(filename, "rb") as f:
+                magic, version, found_year, days, lat, long = HEADER.unpack(f.read(HEADER.size))
+                size = os.fstat(f.fileno()).st_size
+        except (OSError, struct.error):
+            return False
+        return (magic == MAGIC and version == FORMAT_VERSION and found_year == year and
+                (lat, long) == (self.lat, self.long) and size == HEADER.size + days * ROW.size)
+
+
+    def fractions(self, day):
+        """ Returns a day's row: each SunDay field as a fraction of the day (UTC) """
+        return ROW.unpack_from(self.year(day.year), HEADER.size + (day.timetuple().tm_yday - 1) * ROW.size)
+
+
+    def lookup(self, day, offset=datetime.timedelta(hours=0)):
+        """ Returns the SunDay for a date, as datetimes shifted by offset from UTC """
+        midnight = datetime.datetime.combine(day, datetime.time(0)) + offset
+        return SunDay(*(midnight + datetime.timedelta(seconds=int(t * 86400)) for t in self.fractions(day)))
+
+
+    def ephemeris(self, day, offset=datetime.timedelta(hours=0)):
+        """ Returns the Ephemeris (sunrise, sunset and solar noon) for a date """
+        return Ephemeris(*self.lookup(day, offset)[:len(Ephemeris._fields)])
+
+
+    def register(self):
+        """ Makes sun.ephemeris() read this location's times from the table.  Returns self """
+        TABLES[(self.lat, self.long)] = self
+        return self
+
+
+    def close(self):
+        """ Unmaps every loaded year and stops sun.ephemeris() using the table """
+        if TABLES.get((self.lat, self.long)) is self:
+            del TABLES[(self.lat, self.long)]
+        for data in self.years.values():
+            data.close()
+        self.years = {}
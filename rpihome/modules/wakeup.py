@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+""" wakeup.py: Shared "wait for input or the next timer deadline" primitive used by the process
+    loops in place of fixed-length sleeps
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import datetime
+import multiprocessing.connection
+from .work_queue import WorkQueue
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Helper Functions ********************************************************************************
+def waitable(queue):
+    """ Returns the object that can be blocked on to detect data arriving on a queue.  For a
+    multiprocessing.Queue this is the read end of its underlying pipe """
+    return getattr(queue, "_reader", queue)
+
+
+def waitables(queue):
+    """ Returns the list of objects that can be blocked on to detect data arriving on a queue.
+    A PriorityChannel has one per lane """
+    lanes = getattr(queue, "lanes", None)
+    if lanes is not None:
+        return [waitable(lane) for lane in lanes]
+    return [waitable(queue)]
+
+
+def seconds_until(*deadlines, now=None):
+    """ Returns the number of seconds (never negative) until the earliest of the datetime
+    deadlines given """
+    if now is None:
+        now = datetime.datetime.now()
+    return max(0.0, min((deadline - now).total_seconds() for deadline in deadlines))
+
+
+def wait_for_input(queues, timeout=None):
+    """ Blocks until at least one of the queues has data waiting to be read or the timeout (in
+    seconds) expires, whichever comes first.  Returns the list of queues that are ready.  An
+    in-process WorkQueue can't be blocked on, so one with items waiting returns immediately, as
+    does a PriorityChannel with messages already moved into its backlog """
+    readers = {}
+    pending = []
+    for queue in queues:
+        if isinstance(queue, WorkQueue):
+            if queue.empty() is False:
+                pending.append(queue)
+        else:
+            if len(getattr(queue, "backlog", ())) > 0:
+                pending.append(queue)
+            for reader in waitables(queue):
+                readers[reader] = queue
+    if len(pending) > 0:
+        timeout = 0
+    ready = multiprocessing.connection.wait(list(readers), timeout)
+    for reader in ready:
+        if readers[reader] not in pending:
+            pending.append(readers[reader])
+    return pending
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+""" work_queue.py: In-process queue used for each service's internal work stage.  Only the
+    owning process ever reads or writes it, so it holds Message objects directly instead of
+    pickling them through a pipe like a multiprocessing.Queue would
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import collections
+import queue
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Work Queue Class ********************************************************************************
+class WorkQueue(object):
+    """ FIFO backed by a deque that offers the subset of the multiprocessing.Queue interface the
+    process loops use (put_nowait, get_nowait, empty, qsize) """
+    def __init__(self):
+        self.items = collections.deque()
+
+
+    def put_nowait(self, item):
+        """ Adds an item to the back of the queue """
+        self.items.append(item)
+
+
+    def get_nowait(self):
+        """ Removes and returns the item at the front of the queue.  Raises queue.Empty if there
+        is nothing waiting """
+        try:
+            return self.items.popleft()
+        except IndexError:
+            raise queue.Empty
+
+
+    def empty(self):
+        """ Returns True if there is nothing waiting in the queue """
+        return not self.items
+
+
+    def qsize(self):
+        """ Returns the number of items waiting in the queue """
+        return len(self.items)
+
+
+    def __len__(self):
+        return len(self.items)
@@ -18,9 +18,18 @@ import sys
 import time
 
 if __name__ == "__main__": sys.path.append("..")
+from modules.liveness import BEAT_INTERVAL, LivenessTable
+from modules.log_levels import LogLevelMap, apply_levels, parse_levels
 from modules.log_path import LogFilePath
+from modules.log_ring import LogRing
 from modules.logger_mp import worker_configurer
 from modules.message import Message
+from modules.batch import WorkDrain
+from modules.channel import PriorityChannel
+from modules.clock import Clock
+from modules.router import Router
+from modules.work_queue import WorkQueue
+from modules.wakeup import seconds_until, wait_for_input
 from p01_log_handler import listener_process
 from p02_gui import MainWindow
 from p11_logic_solver import LogicProcess
@@ -52,20 +61,48 @@ class MainProcess(object):
         self.msg_in = Message()
         self.msg_to_process = Message()
         self.msg_to_send = Message()
-        self.last_hb = datetime.datetime.now()
+        self.clock = Clock()
+        self.last_hb = self.clock.now
         self.in_msg_loop = True
         self.main_loop = True
-        self.p00_queue = multiprocessing.Queue(-1)
-        self.work_queue = multiprocessing.Queue(-1)
+        self.queue_size = 200
+        self.p00_queue = PriorityChannel(maxsize=self.queue_size)
+        self.work_queue = WorkQueue()
+        self.work_drain = WorkDrain(budget=0.05)
         self.log_queue = multiprocessing.Queue(-1)
         self.close_pending = False
         self.process_path = os.path.dirname(os.path.abspath(__file__))
         self.enable = [True, True, True, False, False, False, False, False, False, False, False, True, False, True, False, True, True, True]
         self.nest_username = str()
         self.nest_password = str()
+        self.last_rate_report = self.clock.now
+        self.rates = {}
+        self.alive_mem = {}
+        self.queue_counts_mem = {}
+        # Shared liveness table each process writes its own slot in
+        self.liveness = LivenessTable()
+        self.liveness.beat("00")
+        # Shared ring of recent log lines written by p01 and shown in the gui alarm window
+        self.log_ring = LogRing()
+        # Build routing table.  Child process queues are added as each process is spawned
+        self.router = Router()
+        self.router.add_side_effect("900", self.queue_for_work)
+        self.router.add_side_effect("999", self.queue_for_work)
         # Initialize logging
         worker_configurer(self.log_queue)
         self.logger = logging.getLogger(__name__)
+        # Log levels handed to each child process, kept up to date with the 005 messages routed
+        self.log_levels = LogLevelMap(logger=self.logger)
+        self.router.add_side_effect("005", self.log_levels.record)
+        # Service table used to restart child processes by their destination code
+        self.services = {"01": self.create_log_process,
+                         "11": self.create_logic_process,
+                         "13": self.create_home_process,
+                         "15": self.create_screen_process,
+                         "16": self.create_wemo_process,
+                         "17": self.create_nest_process}
+        # Create child process queues and the direct channels between them
+        self.create_queues()
         # Spawn individual processes
         self.create_log_process()
         self.create_gui_process()
@@ -74,26 +111,49 @@ class MainProcess(object):
         self.create_screen_process()
         self.create_wemo_process()
         self.create_nest_process()
-        self.update_gui()
         self.init_complete = True
 
 
+    def create_queues(self):
+        """ Creates the incoming message queue for each child process and adds it to the routing
+        table.  Each is a PriorityChannel so kill and restart requests overtake queued data.
+        Queues are kept across process restarts so the direct peer channels handed out to other
+        processes stay valid """
+        self.p01_queue = PriorityChannel(maxsize=self.queue_size)
+        self.p02_queue = PriorityChannel(maxsize=self.queue_size)
+        self.p11_queue = PriorityChannel(maxsize=self.queue_size)
+        self.p13_queue = PriorityChannel(maxsize=self.queue_size)
+        self.p15_queue = PriorityChannel(maxsize=self.queue_size)
+        self.p16_queue = PriorityChannel(maxsize=self.queue_size)
+        self.p17_queue = PriorityChannel(maxsize=self.queue_size)
+        self.router.add_route("01", self.p01_queue)
+        self.router.add_route("02", self.p02_queue)
+        self.router.add_route("11", self.p11_queue)
+        self.router.add_route("13", self.p13_queue)
+        self.router.add_route("15", self.p15_queue)
+        self.router.add_route("16", self.p16_queue)
+        self.router.add_route("17", self.p17_queue)
+        # Service pairs that exchange most of the traffic talk directly instead of through p00
+        self.router.add_peers("11", "16")
+        self.router.add_peers("11", "17")
+        self.router.add_peers("11", "02")
+
+
     def create_log_process(self):
-        self.p01_alive_mem = None
-        self.p01_queue = multiprocessing.Queue(-1)
         print(self.process_path)
         self.debug_logfile = (self.process_path + "/logs/debug.log")
         self.info_logfile = (self.process_path + "/logs/info.log")
-        self.p01 = multiprocessing.Process(target=listener_process, args=(self.p01_queue, self.p00_queue, self.log_queue, self.debug_logfile, self.info_logfile))
+        self.json_logfile = (self.process_path + "/logs/messages.jsonl")
+        self.p01 = multiprocessing.Process(target=listener_process, args=(self.p01_queue, self.p00_queue, self.log_queue, self.debug_logfile, self.info_logfile, self.liveness),
+                                      kwargs={"log_levels": self.log_levels.levels("01"), "log_ring": self.log_ring,
+                                              "json_logfile": self.json_logfile})
         self.p01.start()
         self.p01_modtime = os.path.getmtime(os.path.join(self.process_path, "p01_log_handler.py"))
    
 
     def create_gui_process(self):
         """ Spawns a process specific to the user interface """
-        self.p02_alive_mem = None
-        self.p02_queue = multiprocessing.Queue(-1)
-        self.p02 = MainWindow(self.p02_queue, self.p00_queue, self.log_queue, name="p02_gui",
+        self.p02 = MainWindow(self.p02_queue, self.p00_queue, self.log_queue, liveness=self.liveness, log_levels=self.log_levels.levels("02"), log_ring=self.log_ring, peers=self.router.peer_queues("02"), name="p02_gui",
                               debug_logfile=self.debug_logfile,
                               info_logfile=self.info_logfile,
                               enable=self.enable)
@@ -103,45 +163,35 @@ class MainProcess(object):
 
     def create_logic_process(self):
         """ Spawns a process for the logic solver """
-        self.p11_alive_mem = None
-        self.p11_queue = multiprocessing.Queue(-1)
-        self.p11 = LogicProcess(self.p11_queue, self.p00_queue, self.log_queue, name="p11_logic_solver")
+        self.p11 = LogicProcess(self.p11_queue, self.p00_queue, self.log_queue, liveness=self.liveness, log_levels=self.log_levels.levels("11"), peers=self.router.peer_queues("11"), name="p11_logic_solver")
         self.p11.start()
         self.p11_modtime = os.path.getmtime(os.path.join(self.process_path, "p11_logic_solver.py"))
 
 
     def create_home_process(self):
         """ Spawns a process for the home/away monitor """
-        self.p13_alive_mem = None
-        self.p13_queue = multiprocessing.Queue(-1)
-        self.p13 = HomeProcess(self.p13_queue, self.p00_queue, self.log_queue, name="p13_home_away")
+        self.p13 = HomeProcess(self.p13_queue, self.p00_queue, self.log_queue, liveness=self.liveness, log_levels=self.log_levels.levels("13"), name="p13_home_away")
         self.p13.start()        
         self.p13_modtime = os.path.getmtime(os.path.join(self.process_path, "p13_home_away.py"))
 
 
     def create_screen_process(self):
         """ Spawns a process for the home/away monitor """
-        self.p15_alive_mem = None
-        self.p15_queue = multiprocessing.Queue(-1)
-        self.p15 = RpiProcess(self.p15_queue, self.p00_queue, self.log_queue, name="p15_rpi_screen")
+        self.p15 = RpiProcess(self.p15_queue, self.p00_queue, self.log_queue, liveness=self.liveness, log_levels=self.log_levels.levels("15"), name="p15_rpi_screen")
         self.p15.start()         
         self.p15_modtime = os.path.getmtime(os.path.join(self.process_path, "p15_rpi_screen.py"))
 
 
     def create_wemo_process(self):
         """ Spawns a process for the wemo communication gateway """
-        self.p16_alive_mem = None
-        self.p16_queue = multiprocessing.Queue(-1)
-        self.p16 = WemoProcess(self.p16_queue, self.p00_queue, self.log_queue, name="p16_wemo_gateway")
+        self.p16 = WemoProcess(self.p16_queue, self.p00_queue, self.log_queue, liveness=self.liveness, log_levels=self.log_levels.levels("16"), peers=self.router.peer_queues("16"), name="p16_wemo_gateway")
         self.p16.start()          
         self.p16_modtime = os.path.getmtime(os.path.join(self.process_path, "p16_wemo_gateway.py"))
 
 
     def create_nest_process(self):
         """ Spawns a process for the NEST communication gateway """
-        self.p17_alive_mem = None
-        self.p17_queue = multiprocessing.Queue(-1)
-        self.p17 = NestProcess(self.p17_queue, self.p00_queue, self.log_queue, name="p17_nest_gateway")
+        self.p17 = NestProcess(self.p17_queue, self.p00_queue, self.log_queue, liveness=self.liveness, log_levels=self.log_levels.levels("17"), peers=self.router.peer_queues("17"), name="p17_nest_gateway")
         self.p17.start()
         self.p17_modtime = os.path.getmtime(os.path.join(self.process_path, "p17_nest_gateway.py"))
 
@@ -149,7 +199,7 @@ class MainProcess(object):
     def process_in_msg_queue(self):
         """ Method to cycle through incoming message queue, filtering out heartbeats and
         mis-directed messages.  Messages corrected destined for this process are loaded
-        into the work queue """
+        into the work queue.  All other messages are forwarded using the routing table """
         self.in_msg_loop = True
         while self.in_msg_loop is True:
             try:
@@ -158,190 +208,106 @@ class MainProcess(object):
                 self.in_msg_loop = False
             if len(self.msg_in.raw) > 4:
                 if self.msg_in.dest == "00":
-                    if self.msg_in.type == "001":
-                        self.last_hb = datetime.datetime.now()
-                        self.logger.debug("heartbeat received")
-                    elif self.msg_in.type == "999":
+                    if self.msg_in.type == "999":
                         self.logger.info("Kill code received - Shutting down")
                         self.close_pending = True
                         self.in_msg_loop = False
+                    elif self.msg_in.type == "005":
+                        apply_levels(parse_levels(self.msg_in.payload))
+                        self.logger.info("Log levels set to [%s]", self.msg_in.payload)
                     else:
-                        self.work_queue.put_nowait(self.msg_in.raw)
-                        self.logger.debug("Transfered message [%s] to internal work queue", self.msg_in.raw)
-               
-                # Message forwarding to p01
-                if self.msg_in.dest == "01":
-                    self.p01_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Transfered message [%s] to p01 queue", self.msg_in.raw)
-                    if self.msg_in.type == "900" or self.msg_in.type == "999":
-                        self.work_queue.put_nowait(self.msg_in.raw)
-                        self.logger.debug("Transfered message [%s] to internal work queue", self.msg_in.raw)
-                # Message forwarding to p02
-                if self.msg_in.dest == "02":
-                    self.p02_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Transfered message [%s] to p02 queue", self.msg_in.raw)
-                    if self.msg_in.type == "900" or self.msg_in.type == "999":
-                        self.work_queue.put_nowait(self.msg_in.raw)
-                        self.logger.debug("Transfered message [%s] to internal work queue", self.msg_in.raw)
-                # Message forwarding to p11
-                elif self.msg_in.dest == "11":
-                    self.p11_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Transfered message [%s] to p11 queue", self.msg_in.raw)
-                    if self.msg_in.type == "900" or self.msg_in.type == "999":
-                        self.work_queue.put_nowait(self.msg_in.raw)
-                        self.logger.debug("Transfered message [%s] to internal work queue", self.msg_in.raw)
-                # Message forwarding to p13
-                elif self.msg_in.dest == "13":
-                    self.p13_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Transfered message [%s] to p13 queue", self.msg_in.raw)
-                    if self.msg_in.type == "900" or self.msg_in.type == "999":
-                        self.work_queue.put_nowait(self.msg_in.raw)
-                        self.logger.debug("Transfered message [%s] to internal work queue", self.msg_in.raw)
-                # Message forwarding to p15
-                elif self.msg_in.dest == "15":
-                    self.p15_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Transfered message [%s] to p15 queue", self.msg_in.raw)
-                    if self.msg_in.type == "900" or self.msg_in.type == "999":
-                        self.work_queue.put_nowait(self.msg_in.raw)
-                        self.logger.debug("Transfered message [%s] to internal work queue", self.msg_in.raw)
-                # Message forwarding to p16
-                elif self.msg_in.dest == "16":
-                    self.p16_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Transfered message [%s] to p16 queue", self.msg_in.raw)
-                    if self.msg_in.type == "900" or self.msg_in.type == "999":
-                        self.work_queue.put_nowait(self.msg_in.raw)
-                        self.logger.debug("Transfered message [%s] to internal work queue", self.msg_in.raw)
-                # Message forwarding to p17
-                elif self.msg_in.dest == "17":
-                    self.p17_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Transfered message [%s] to p17 queue", self.msg_in.raw)
-                    if self.msg_in.type == "900" or self.msg_in.type == "999":
-                        self.work_queue.put_nowait(self.msg_in.raw)
-                        self.logger.debug("Transfered message [%s] to internal work queue", self.msg_in.raw)
+                        self.queue_for_work(self.msg_in)
+                else:
+                    self.router.route(self.msg_in)
                 self.msg_in = Message()
             else:
                 self.msg_in = Message()
                 self.in_msg_loop = False
 
 
+    def queue_for_work(self, msg):
+        """ Loads a message into the internal work queue.  Also registered as the routing side
+        effect for start (900) and stop (999) requests so p00 can act on them """
+        self.work_queue.put_nowait(msg)
+        self.logger.debug("Transfered message [%s] to internal work queue", msg.raw)
+
+
     def process_work_queue(self):
-        """ Method to perform work from the work queue """
-        try:
-            self.msg_to_process = Message(raw=self.work_queue.get_nowait())
-        except:
-            pass
+        """ Method to drain the internal work queue, up to the per-tick time budget """
+        self.work_drain.drain(self.work_queue, self.process_work_msg)
+
+
+    def process_work_msg(self, msg):
+        """ Method to perform the work requested by a single message from the work queue """
+        self.msg_to_process = msg
         # If there is a message to process, do so
         if len(self.msg_to_process.raw) > 4:
-
-            # Start / Stop p01 process
-            if self.msg_to_process.dest == "01":
+            # Start / Stop child process based on the service table
+            create_process = self.services.get(self.msg_to_process.dest)
+            if create_process is not None:
+                process = getattr(self, "p" + self.msg_to_process.dest)
                 if self.msg_to_process.type == "900":
-                    if self.p01.is_alive() is False:                    
-                        self.create_log_process()
+                    if process.is_alive() is False:
+                        create_process()
                 elif self.msg_to_process.type == "999":
-                    if self.p01.is_alive():                    
-                        self.p01.join()
-            # Start / Stop p11 process
-            if self.msg_to_process.dest == "11":
-                if self.msg_to_process.type == "900":
-                    if self.p11.is_alive() is False:                    
-                        self.create_logic_process()
-                elif self.msg_to_process.type == "999":
-                    if self.p11.is_alive():                    
-                        self.p11.join()
-            # Start / Stop p13 process
-            elif self.msg_to_process.dest == "13":
-                if self.msg_to_process.type == "900":
-                    if self.p13.is_alive() is False:                    
-                        self.create_home_process()
-                elif self.msg_to_process.type == "999":
-                    if self.p13.is_alive():
-                        self.p13.join()
-            # Start / Stop p15 process
-            elif self.msg_to_process.dest == "15":
-                if self.msg_to_process.type == "900":
-                    if self.p15.is_alive() is False:                    
-                        self.create_screen_process()
-                elif self.msg_to_process.type == "999":
-                    if self.p15.is_alive():                    
-                        self.p15.join()   
-            # Start / Stop p16 process
-            elif self.msg_to_process.dest == "16":
-                if self.msg_to_process.type == "900":
-                    if self.p16.is_alive() is False:                    
-                        self.create_wemo_process()
-                elif self.msg_to_process.type == "999":
-                    if self.p16.is_alive():                    
-                        self.p16.join()
-            # Start / Stop p17 process
-            elif self.msg_to_process.dest == "17":
-                if self.msg_to_process.type == "900":
-                    if self.p17.is_alive() is False:             
-                        self.create_nest_process()
-                elif self.msg_to_process.type == "999":
-                    if self.p17.is_alive():
-                        self.p17.join()                             
+                    if process.is_alive():
+                        process.join()
             # Clear msg-to-process string
             self.msg_to_process = Message()
         else:
-            pass           
+            pass
+
+
+    def report_routing_rates(self):
+        """ Logs the number of messages per second forwarded to each child process along with the
+        work queue drain counters """
+        self.rates = self.router.rates()
+        self.logger.info("Messages forwarded per second: %s",
+                         ", ".join("p%s=%.2f" % (dest, rate) for dest, rate in sorted(self.rates.items())))
+        self.logger.info("Work queue: %s", self.work_drain.report())
+        self.last_rate_report = self.clock.now
 
 
     def send_heartbeats(self):
-        """ Send periodic heartbeats to child processes so they don't time-out and shutdown """
-        self.p01_queue.put_nowait(Message(source="00", dest="01", type="001").raw)
-        self.p02_queue.put_nowait(Message(source="00", dest="02", type="001").raw)
-        self.p11_queue.put_nowait(Message(source="00", dest="11", type="001").raw)
-        self.p13_queue.put_nowait(Message(source="00", dest="13", type="001").raw)
-        self.p15_queue.put_nowait(Message(source="00", dest="15", type="001").raw)
-        self.p16_queue.put_nowait(Message(source="00", dest="16", type="001").raw)
-        self.p17_queue.put_nowait(Message(source="00", dest="17", type="001").raw)
-        self.last_hb = datetime.datetime.now()
-
-
-    def update_gui(self):
-        if self.p01.is_alive() != self.p01_alive_mem:
-            if self.p01.is_alive() is True:
-                self.p02_queue.put_nowait(Message(source="01", dest="02", type="002").raw)
-                self.p01_alive_mem = True
-            elif self.p01.is_alive() is False:
-                self.p02_queue.put_nowait(Message(source="01", dest="02", type="003").raw)
-                self.p01_alive_mem = False
-        if self.p11.is_alive() != self.p11_alive_mem:
-            if self.p11.is_alive() is True:
-                self.p02_queue.put_nowait(Message(source="11", dest="02", type="002").raw)
-                self.p11_alive_mem = True
-            elif self.p11.is_alive() is False:
-                self.p02_queue.put_nowait(Message(source="11", dest="02", type="003").raw)
-                self.p11_alive_mem = False                
-        if self.p13.is_alive() != self.p13_alive_mem:
-            if self.p13.is_alive() is True:
-                self.p02_queue.put_nowait(Message(source="13", dest="02", type="002").raw)
-                self.p13_alive_mem = True
-            elif self.p13.is_alive() is False:
-                self.p02_queue.put_nowait(Message(source="13", dest="02", type="003").raw)
-                self.p13_alive_mem = False
-        if self.p15.is_alive() != self.p15_alive_mem:
-            if self.p15.is_alive() is True:
-                self.p02_queue.put_nowait(Message(source="15", dest="02", type="002").raw)
-                self.p15_alive_mem = True
-            elif self.p15.is_alive() is False:
-                self.p02_queue.put_nowait(Message(source="15", dest="02", type="003").raw)
-                self.p15_alive_mem = False
-        if self.p16.is_alive() != self.p16_alive_mem:
-            if self.p16.is_alive() is True:
-                self.p02_queue.put_nowait(Message(source="16", dest="02", type="002").raw)
-                self.p16_alive_mem = True
-            elif self.p16.is_alive() is False:
-                self.p02_queue.put_nowait(Message(source="16", dest="02", type="003").raw)
-                self.p16_alive_mem = False
-        if self.p17.is_alive() != self.p17_alive_mem:
-            if self.p17.is_alive() is True:
-                self.p02_queue.put_nowait(Message(source="17", dest="02", type="002").raw)
-                self.p17_alive_mem = True
-            elif self.p17.is_alive() is False:
-                self.p02_queue.put_nowait(Message(source="17", dest="02", type="003").raw)
-                self.p17_alive_mem = False
+        """ Updates p00's slot in the liveness table so child processes don't time-out and
+        shutdown """
+        self.liveness.beat("00", self.clock.monotonic)
+        self.last_hb = self.clock.now
+
+
+    def check_liveness(self):
+        """ Reads the liveness table in one go and logs any child process that has started or
+        stopped since the last check """
+        alive = self.liveness.alive(now=self.clock.monotonic)
+        for code, state in sorted(alive.items()):
+            if code != "00" and state != self.alive_mem.get(code):
+                if state is True:
+                    self.logger.info("Process p%s is running", code)
+                else:
+                    self.logger.warning("Process p%s is not running", code)
+        self.alive_mem = alive
+
+
+    def report_queue_counters(self):
+        """ Reads the overflow counters of every process queue, logs any that have changed and
+        sends the table to the gui for its services panel """
+        counts = {"00": self.p00_queue.counts()}
+        for dest, channel in self.router.routes.items():
+            counts[dest] = channel.counts()
+        changed = False
+        for dest, count in sorted(counts.items()):
+            totals = (count["overflows"], count["dropped"], count["coalesced"])
+            if totals != self.queue_counts_mem.get(dest, (0, 0, 0)):
+                self.logger.warning("Queue for p%s overflowed %d times (%d dropped, %d coalesced, depth %d)",
+                                    dest, count["overflows"], count["dropped"], count["coalesced"], count["depth"])
+                self.queue_counts_mem[dest] = totals
+                changed = True
+        if changed is True:
+            self.msg_to_send = Message(source="00", dest="02", type="004",
+                                       payload=";".join("%s:%d:%d:%d:%d" % (dest, count["overflows"], count["dropped"],
+                                                                           count["coalesced"], count["depth"])
+                                                        for dest, count in sorted(counts.items())))
+            self.p02_queue.put_nowait(self.msg_to_send.packed)
 
 
     def run(self):
@@ -350,26 +316,34 @@ class MainProcess(object):
         # Main process loop        
         self.main_loop = True
         while self.main_loop is True:
+            # Read the clock once for the whole pass
+            self.clock.tick()
             # Process incoming messages
             self.process_in_msg_queue()
 
             # Process tasks in internal work queue
             if self.close_pending is False:
                 self.process_work_queue()
-                # Send periodic heartbeats to child processes
-                if datetime.datetime.now() > (self.last_hb + datetime.timedelta(seconds=5)):
+                # Send periodic heartbeats to child processes and check theirs
+                if self.clock.now > (self.last_hb + datetime.timedelta(seconds=BEAT_INTERVAL)):
                     self.send_heartbeats()
-                # Update gui based on process status
-                self.update_gui()   
+                    self.check_liveness()
+                    self.report_queue_counters()
+                # Periodically report routing throughput
+                if self.clock.now > (self.last_rate_report + datetime.timedelta(seconds=60)):
+                    self.report_routing_rates()
 
             # Close process
             if self.close_pending is True:
                 self.main_loop = False
-            elif datetime.datetime.now() > self.last_hb + datetime.timedelta(seconds=30):
+            elif self.clock.now > self.last_hb + datetime.timedelta(seconds=30):
                 self.main_loop = False
 
-            # Pause before next process run
-            time.sleep(0.011)
+            # Sleep until a message arrives or the next timer deadline is reached
+            if self.main_loop is True:
+                wait_for_input([self.p00_queue, self.work_queue],
+                               seconds_until(self.last_hb + datetime.timedelta(seconds=BEAT_INTERVAL),
+                                             self.last_rate_report + datetime.timedelta(seconds=60)))
 
         # Send final log message when process exits
         self.logger.info("Shutdown complete")
@@ -1,20 +1,29 @@
 import datetime
 import logging
 import time
-from modules.logger_mp import listener_configurer, worker_configurer
+from modules.batch import WorkDrain
+from modules.liveness import BEAT_INTERVAL, COMM_TIMEOUT, LivenessTable
+from modules.log_levels import apply_levels, parse_levels
+from modules.logger_mp import close_handlers, flush_handlers, handle_record, listener_configurer, worker_configurer
 from modules.message import Message
+from modules.wakeup import seconds_until, wait_for_input
 
 
 # Log Handler Process ******************************************************************************
-def listener_process(in_queue, out_queue, log_queue, debug_logfile, info_logfile):
-    listener_configurer(debug_logfile, info_logfile)
+def listener_process(in_queue, out_queue, log_queue, debug_logfile, info_logfile, liveness=None,
+                     flush_interval=1.0, batch_budget=0.05, report_interval=60.0, log_levels=None,
+                     log_ring=None, json_logfile=None):
+    handlers = listener_configurer(debug_logfile, info_logfile, ring=log_ring, json_logfile=json_logfile)
+    apply_levels(log_levels or {})
     logger = logging.getLogger(__name__)
 
     close_pending = False
     msg_in = Message()
-    log_record = None
-    last_log_record = None
-    last_hb = datetime.datetime.now()
+    log_drain = WorkDrain(budget=batch_budget, logger=logger)
+    last_flush = time.monotonic()
+    last_report = time.monotonic()
+    last_report_count = 0
+    liveness = liveness or LivenessTable()
     shutdown_time = None
     in_msg_loop = bool()
 
@@ -22,6 +31,8 @@ def listener_process(in_queue, out_queue, log_queue, debug_logfile, info_logfile
     logger.info("Main loop started")
     in_msg_loop = True
     while in_msg_loop is True:
+        # Update this process' slot in the liveness table
+        liveness.beat("01")
         # Check incoming process message queue and pull next message from the stack if present
         try:
             msg_in = Message(raw=in_queue.get_nowait())
@@ -32,35 +43,38 @@ def listener_process(in_queue, out_queue, log_queue, debug_logfile, info_logfile
             logger.debug("Processing message [%s] from incoming message queue", msg_in.raw)
             # Check if message is destined for this process based on pseudo-process-id
             if msg_in.dest == "01":
-                # If message is a heartbeat, update heartbeat snapshot
-                if msg_in.type == "001":
-                    last_hb = datetime.datetime.now()
-                    logger.debug("")
                 # If message is a kill-code, set the close_pending flag so the process can close out gracefully 
-                elif msg_in.type == "999":
+                if msg_in.type == "999":
                     logger.info("Kill code received - Shutting down")
                     shutdown_time = datetime.datetime.now()
                     close_pending = True
+                elif msg_in.type == "005":
+                    apply_levels(parse_levels(msg_in.payload))
+                    logger.info("Log levels set to [%s]", msg_in.payload)
             else:
                 # If message isn't destined for this process, drop it into the queue for the main process so it can re-forward it to the proper recipient.
-                out_queue.put_nowait(msg_in.raw)
+                out_queue.put_nowait(msg_in.packed)
                 logger.debug("Redirecting message [%s] back to main", msg_in.raw)  
             pass
             msg_in = Message()
 
 
-        # Check incoming process message queue and pull next message from the stack if present
-        try:
-            log_record = log_queue.get_nowait()
-        except:
-            pass     
+        # Pull log records from the queue in a batch and pass each to its logger's handlers
+        log_drain.drain(log_queue, handle_record)
+
+        # Write out buffered records once they are flush_interval old (full buffers flush themselves)
+        if time.monotonic() - last_flush >= flush_interval:
+            flush_handlers(handlers)
+            last_flush = time.monotonic()
+
+        # Periodically report listener throughput and backlog
+        if time.monotonic() - last_report >= report_interval:
+            logger.info("Log listener: %.1f records/s, backlog %d records, %s",
+                        (log_drain.total_count - last_report_count) / (time.monotonic() - last_report),
+                        log_drain.last_depth, log_drain.report())
+            last_report = time.monotonic()
+            last_report_count = log_drain.total_count
 
-        # Get log handler, then pass it the log message from the queue
-        if isinstance(log_record, logging.LogRecord) is True:
-            master_logger = logging.getLogger(log_record.name)
-            master_logger.handle(log_record)
-            log_record = None
-        
 
         # Only close down process once incoming message queue is empty
         if close_pending is True:
@@ -68,12 +82,21 @@ def listener_process(in_queue, out_queue, log_queue, debug_logfile, info_logfile
                 if datetime.datetime.now() > shutdown_time + datetime.timedelta(seconds=5):
                     if in_queue.empty() is True:
                         in_msg_loop = False
-        elif datetime.datetime.now() > last_hb + datetime.timedelta(seconds=30):
+        elif liveness.age("00") > COMM_TIMEOUT:
             in_msg_loop = False
         
-        # Delay before re-running loop
-        time.sleep(0.013)
+        # Sleep until a message or log record arrives or the next timer deadline is reached
+        if in_msg_loop is True:
+            timeout = BEAT_INTERVAL
+            if any(len(handler.buffer) > 0 for handler in handlers):
+                timeout = min(timeout, max(0.0, last_flush + flush_interval - time.monotonic()))
+            if shutdown_time is not None:
+                timeout = min(timeout, seconds_until(shutdown_time + datetime.timedelta(seconds=5)))
+            wait_for_input([in_queue, log_queue], timeout)
     pass
+    liveness.stop("01")
+    logger.info("Log listener: %s", log_drain.report())
     logger.info("Shutdown complete")
+    close_handlers(handlers)
 
 
@@ -5,7 +5,6 @@
 # Import Required Libraries (Standard, Third Party, Local) ****************************************
 import copy
 import datetime
-import linecache
 import logging
 import multiprocessing
 import os
@@ -14,8 +13,15 @@ import time
 import tkinter as tk
 from tkinter import font
 from tkinter import messagebox
+from modules.clock import Clock
+from modules.liveness import COMM_TIMEOUT, LivenessTable
+from modules.log_levels import apply_levels, parse_levels
+from modules.log_tail import LogTailer
 from modules.logger_mp import worker_configurer
 import modules.message as message
+from modules.pending import PendingRequests
+from modules.router import PeerChannels
+from modules.wakeup import waitables
 from gui_objects.on_off_ind_button import OnIndOffButtonFrame
 
 
@@ -35,26 +41,44 @@ class MainWindow(multiprocessing.Process):
     """ GUI process class and methods """
     def __init__(self, in_queue, out_queue, log_queue, **kwargs):
         self.msg_in_queue = in_queue
-        self.msg_out_queue = out_queue        
         # Initialize logging
         worker_configurer(log_queue)
         self.logger = logging.getLogger(__name__)
         # Set default input parameter values
         self.name = "undefined"
+        self.peers = {}
         self.enable = [True]*18
         self.debug_logfile = None
         self.info_logfile = None
+        self.liveness = None
+        self.log_levels = {}
+        self.log_ring = None
+        self.clock = None
         # Update default elements based on any parameters passed in
         if kwargs is not None:
             for key, value in kwargs.items():
                 if key == "name":
                     self.name = value                    
+                if key == "peers":
+                    self.peers = value
                 if key == "enable":
                     self.enable = value
                 if key == "debug_logfile":
                     self.debug_logfile = value
                 if key == "info_logfile":
                     self.info_logfile = value
+                if key == "liveness":
+                    self.liveness = value
+                if key == "log_levels":
+                    self.log_levels = value
+                if key == "log_ring":
+                    self.log_ring = value
+                if key == "clock":
+                    self.clock = value
+        # Send messages for direct peers straight to their queues, all others through main
+        self.msg_out_queue = PeerChannels(out_queue, self.peers)
+        # Track gateway requests (device status queries) so replies can be matched and timed
+        self.requests = PendingRequests(self.msg_out_queue, logger=self.logger)
         # Initialize parent class
         multiprocessing.Process.__init__(self, name=self.name)
         # Create remaining class elements
@@ -62,23 +86,29 @@ class MainWindow(multiprocessing.Process):
         self.msg_in = message.Message()
         self.msg_to_send = message.Message()
         self.close_pending = False
-        self.last_hb = datetime.datetime.now()
+        self.liveness = self.liveness or LivenessTable()
+        self.clock = self.clock or Clock()
+        self.last_liveness_check = self.clock.now
+        self.liveness_check_interval = datetime.timedelta(seconds=0.5)
+        self.process_alive_mem = {}
+        # Row of each service in the services panel
+        self.service_rows = {"01": 1, "11": 2, "13": 4, "15": 6, "16": 7, "17": 8}
+        self.queue_labels = {}
         self.index = 0
         self.time_to_go = datetime.time(6,30)
-        self.last_update = datetime.datetime.now() + datetime.timedelta(seconds=30)
+        self.last_update = self.clock.now + datetime.timedelta(seconds=30)
         self.datetime_to_go = str()
         self.time_remaining = str()
         self.scanWemo = False
         self.current_conditions = ["??"] * 4
         self.current_forecast = ["??"] * 4
         self.tomorrow_forecast = ["??"] * 4
-        # Initialize pointer for alarm display window
-        if os.path.isfile(self.debug_logfile):
-            self.line = sum(1 for line in open(self.debug_logfile)) - 50
-            if self.line < 1:
-                self.line = 1
+        # Initialize pointer for alarm display window to show the last 50 lines logged.  Lines
+        # come from the shared log ring, or straight from the debug log when there isn't one
+        if self.log_ring is not None:
+            self.log_seq = max(0, self.log_ring.last_seq() - 50)
         else:
-            self.line = 1
+            self.log_tailer = LogTailer(self.debug_logfile, backlog=50, logger=self.logger)
         # Set location of resource directory
         self.basepath = os.path.dirname(sys.argv[0])
         self.resourceDir = os.path.join(self.basepath, "resources/")
@@ -86,6 +116,8 @@ class MainWindow(multiprocessing.Process):
 
     def run(self):
         """ Generate window and schedule after and close handlers """
+        # Apply this process' log levels (in the child, so p00's own loggers are untouched)
+        apply_levels(self.log_levels)
         # Create all parts of application window
         self.logger.debug("Begining generation of application window")
         self.draw_window()
@@ -93,12 +125,21 @@ class MainWindow(multiprocessing.Process):
         # Schedule "after" process to run once main loop has started
         self.window.after(500, self.after_tasks)
         self.logger.debug("Scheduled initial \"after\" task")
+        # Wake the event loop as soon as a message arrives (not available on Windows builds of tk)
+        if hasattr(self.window.tk, "createfilehandler"):
+            for reader in waitables(self.msg_in_queue):
+                self.window.tk.createfilehandler(reader, tk.READABLE, self.process_in_msg_queue)
+            self.logger.debug("Added incoming message queue file handlers")
         # Start handler for window exit button
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.logger.debug("Added \"on-close\" handler")
         # Run mainloop() to activate gui and begin monitoring its inputs
         self.logger.info("Main loop started")
         self.window.mainloop()  
+        # Mark process as stopped in the liveness table
+        self.liveness.stop("02")
+        # Report gateway round trip times
+        self.logger.info("Request latency: %s", self.requests.report())
         # Send final log message when process exits
         self.logger.info("Shutdown complete")        
 
@@ -586,7 +627,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_fylt1.frame.grid(row=8, column=0, padx=2, pady=2)
 
         # Back patio on-off control panel
@@ -600,7 +641,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_bylt1.frame.grid(row=8, column=1, padx=2, pady=2)       
         
 
@@ -615,7 +656,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_ewlt1.frame.grid(row=1, column=0, padx=2, pady=2)            
 
         # coat corner on-off control panel
@@ -629,7 +670,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_cclt1.frame.grid(row=2, column=0, padx=2, pady=2)
 
         # living room lamp on-off control panel
@@ -643,7 +684,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_lrlt1.frame.grid(row=3, column=0, padx=2, pady=2)             
 
         # living room lamp on-off control panel
@@ -657,7 +698,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_lrlt2.frame.grid(row=4, column=0, padx=2, pady=2)      
 
         # Dining room overhead light on-off control panel
@@ -671,7 +712,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_drlt1.frame.grid(row=5, column=0, padx=2, pady=2) 
 
         # Bedroom 1 overhead light on-off control panel
@@ -685,7 +726,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_br1lt1.frame.grid(row=1, column=1, padx=2, pady=2)
 
         # Bedroom 1 desk lamp on-off control panel
@@ -699,7 +740,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_br1lt2.frame.grid(row=2, column=1, padx=2, pady=2)
 
         # Bedroom 2 overhead light on-off control panel
@@ -713,7 +754,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_br2lt1.frame.grid(row=3, column=1, padx=2, pady=2)
 
         # Bedroom 2 desk lamp on-off control panel
@@ -727,7 +768,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_br2lt2.frame.grid(row=4, column=1, padx=2, pady=2)
 
         # Bedroom 3 overhead light on-off control panel
@@ -741,7 +782,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_br3lt1.frame.grid(row=5, column=1, padx=2, pady=2)
 
         # Bedroom 3 desk lamp on-off control panel
@@ -755,7 +796,7 @@ class MainWindow(multiprocessing.Process):
             ind_off_button_img=self.button_square_red_img,
             off_button_text="OFF",
             off_button_img=self.button_151_195_225_round_right_img,
-            msg_out_queue=self.msg_out_queue)
+            msg_out_queue=self.requests)
         self.control_br3lt2.frame.grid(row=6, column=1, padx=2, pady=2)             
 
 
@@ -791,34 +832,49 @@ class MainWindow(multiprocessing.Process):
         self.label050301d02.grid(row=0, column=3, columnspan=3, padx=4, pady=2, sticky="n")
 
     def update_alarm_window(self):
-        # Determine size of logfile (number of lines)
-        self.num_lines = sum(1 for line in open(self.debug_logfile))
-        # If line index is larger than logfile (meaning log file was reset), reset index to match log-file size
-        if self.line > (self.num_lines + 1):
-            self.line = self.num_lines
-            # Correct for line pointers less than 1
-            if self.line < 1:
-                self.line = 1
-        # Read line from file
-        try:
-            self.text = linecache.getline(self.debug_logfile, self.line)
-        except:
-            print("could not access file")
-            self.text = str()
-        # Processing logfile
-        self.iter = 1
-        while len(self.text) != 0 and self.iter < 1000:
-            if self.text.find("heartbeat") == -1 and self.text.find("[00,11,001,,]") == -1:
-                self.text0203b01.insert(tk.END, self.text)
-                self.text0203b01.yview_pickplace("end")
-            self.line += 1
-            self.text = linecache.getline(self.debug_logfile, self.line)
-            self.iter += 1
-        linecache.clearcache()
+        """ Adds the lines logged since the last update """
+        if self.log_ring is not None:
+            self.log_seq, lines = self.log_ring.read_since(self.log_seq)
+        else:
+            lines = self.log_tailer.read_lines()
+        for line in lines:
+            if line.find("heartbeat") == -1 and line.find("[00,11,001,,]") == -1:
+                self.text0203b01.insert(tk.END, line + "\n")
+        if len(lines) > 0:
+            self.text0203b01.yview_pickplace("end")
+
+    def update_process_indicators(self):
+        """ Reads the liveness table in one go and turns each service's status indicator green
+        or red when its state changes """
+        self.last_liveness_check = self.clock.now
+        self.alive = self.liveness.alive(now=self.clock.monotonic)
+        for code, row in self.service_rows.items():
+            button = getattr(self, "button050301a%02db" % row, None)
+            if button is not None and self.alive[code] != self.process_alive_mem.get(code):
+                if self.alive[code] is True:
+                    button.config(image=self.button_square_green_img)
+                else:
+                    button.config(image=self.button_square_red_img)
+        self.process_alive_mem = self.alive
+
+    def update_queue_counters(self, payload):
+        """ Shows the queue overflow and drop counters reported by p00 next to each service in
+        the services panel """
+        for entry in payload.split(";"):
+            dest, overflows, dropped, coalesced, depth = entry.split(":")
+            row = self.service_rows.get(dest)
+            if row is None:
+                continue
+            label = self.queue_labels.get(dest)
+            if label is None:
+                label = tk.Label(self.frame050301a, anchor="w", background="black", font=self.helv08bold, foreground="orange", justify="left")
+                label.grid(row=row, column=3, padx=2, pady=0, sticky="w")
+                self.queue_labels[dest] = label
+            label.config(text="ovf %s\ndrop %s" % (overflows, dropped))
 
     def update_status_window(self):
         self.text0203a01.delete(1.0, tk.END)
-        self.dt = datetime.datetime.now()
+        self.dt = self.clock.now
         self.datetime_to_go = datetime.datetime.combine(self.dt.date(), self.time_to_go)
         self.start_time = self.datetime_to_go + datetime.timedelta(minutes=-60)
         self.end_time = self.datetime_to_go + datetime.timedelta(minutes=30)
@@ -987,19 +1043,19 @@ class MainWindow(multiprocessing.Process):
     def action050301a01a(self):
         self.logger.debug("Button 050301a01a was pressed")
         self.msg_to_send = message.Message(source="02", dest="01", type="900")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a01b(self):
         self.logger.debug("Button 050301a01b was pressed")
         self.msg_to_send = message.Message(source="02", dest="01", type="???")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
    
     def action050301a01c(self):
         self.logger.debug("Button 050301a01c was pressed")
         self.msg_to_send = message.Message(source="02", dest="01", type="999")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)            
 
 
@@ -1007,19 +1063,19 @@ class MainWindow(multiprocessing.Process):
     def action050301a02a(self):
         self.logger.debug("Button 050301a02a was pressed")
         self.msg_to_send = message.Message(source="02", dest="11", type="900")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a02b(self):
         self.logger.debug("Button 050301a02b was pressed")
         self.msg_to_send = message.Message(source="02", dest="11", type="???")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)    
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)    
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)                
 
     def action050301a02c(self):
         self.logger.debug("Button 050301a02c was pressed")
         self.msg_to_send = message.Message(source="02", dest="11", type="999")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)            
 
 
@@ -1027,19 +1083,19 @@ class MainWindow(multiprocessing.Process):
     def action050301a03a(self):
         self.logger.debug("Button 050301a03a was pressed")
         self.msg_to_send = message.Message(source="02", dest="12", type="900")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a03b(self):
         self.logger.debug("Button 050301a03b was pressed")
         self.msg_to_send = message.Message(source="02", dest="12", type="???")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
      
     def action050301a03c(self):
         self.logger.debug("Button 050301a03c was pressed")
         self.msg_to_send = message.Message(source="02", dest="12", type="999")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Button 050301a03c was pressed - Sending message [%s]", self.msg_to_send.raw)
 
 
@@ -1047,19 +1103,19 @@ class MainWindow(multiprocessing.Process):
     def action050301a04a(self):
         self.logger.debug("Button 050301a04a was pressed")
         self.msg_to_send = message.Message(source="02", dest="13", type="900")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a04b(self):
         self.logger.debug("Button 050301a04b was pressed")
         self.msg_to_send = message.Message(source="02", dest="13", type="???")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw) 
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed) 
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw) 
 
     def action050301a04c(self):
         self.logger.debug("Button 050301a04c was pressed")
         self.msg_to_send = message.Message(source="02", dest="13", type="999")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
 
@@ -1067,19 +1123,19 @@ class MainWindow(multiprocessing.Process):
     def action050301a05a(self):
         self.logger.debug("Button 050301a05a was pressed")
         self.msg_to_send = message.Message(source="02", dest="14", type="900")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a05b(self):
         self.logger.debug("Button 050301a05b was pressed")
         self.msg_to_send = message.Message(source="02", dest="14", type="???")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw) 
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed) 
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw) 
 
     def action050301a05c(self):
         self.logger.debug("Button 050301a05c was pressed")
         self.msg_to_send = message.Message(source="02", dest="14", type="999")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
 
@@ -1087,19 +1143,19 @@ class MainWindow(multiprocessing.Process):
     def action050301a06a(self):
         self.logger.debug("Button 050301a06a was pressed")
         self.msg_to_send = message.Message(source="02", dest="15", type="900")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a06b(self):
         self.logger.debug("Button 050301a06b was pressed")
         self.msg_to_send = message.Message(source="02", dest="15", type="???")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw) 
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed) 
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)        
 
     def action050301a06c(self):
         self.logger.debug("Button 050301a06c was pressed")
         self.msg_to_send = message.Message(source="02", dest="15", type="999")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw) 
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed) 
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
 
@@ -1107,22 +1163,22 @@ class MainWindow(multiprocessing.Process):
     def action050301a07a(self):
         self.logger.debug("Button 050301a07a was pressed")
         self.msg_to_send = message.Message(source="02", dest="16", type="900")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw) 
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed) 
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
         self.msg_to_send = message.Message(source="02", dest="11", type="168")           
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a07b(self):
         self.logger.debug("Button 050301a07b was pressed")
         self.msg_to_send = message.Message(source="02", dest="16", type="???")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw) 
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed) 
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a07c(self):
         self.logger.debug("Button 050301a07c was pressed")
         self.msg_to_send = message.Message(source="02", dest="16", type="999")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
 
@@ -1130,19 +1186,19 @@ class MainWindow(multiprocessing.Process):
     def action050301a08a(self):
         self.logger.debug("Button 050301a08a was pressed")
         self.msg_to_send = message.Message(source="02", dest="17", type="900")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw) 
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed) 
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a08b(self):
         self.logger.debug("Button 050301a08b was pressed")        
         self.msg_to_send = message.Message(source="02", dest="17", type="???")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw)
 
     def action050301a08c(self):
         self.logger.debug("Button 050301a08c was pressed")
         self.msg_to_send = message.Message(source="02", dest="17", type="999")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending message [%s]", self.msg_to_send.raw) 
 
 
@@ -1162,144 +1218,130 @@ class MainWindow(multiprocessing.Process):
         self.logger.debug("Button 060101 was pressed")
         pass        
 
-    def after_tasks(self):
-        #self.logger.debug("Running \"after\" task")
-        # Process incoming message queue
-        try:
-            self.msg_in = message.Message(raw=self.msg_in_queue.get_nowait())    
-            #self.logger.debug("Checked in msg queue and found msg: %s" % self.msg_in.raw)   
-        except:
-            pass
-        # Process incoming message
-        if len(self.msg_in.raw) > 4:
-            self.logger.debug("Processing message [%s] from incoming message queue" % self.msg_in.raw)
-            if self.msg_in.dest == "02":
-                
-                if self.msg_in.type == "001":
-                    self.last_hb = datetime.datetime.now()
-                
-                elif self.msg_in.type == "002":
-                    if self.msg_in.source == "01":
-                        self.button050301a01b.config(image=self.button_square_green_img)
-                    elif self.msg_in.source == "11":
-                        self.button050301a02b.config(image=self.button_square_green_img)
-                    elif self.msg_in.source == "12":
-                        self.button050301a03b.config(image=self.button_square_green_img)
-                    elif self.msg_in.source == "13":
-                        self.button050301a04b.config(image=self.button_square_green_img)
-                    elif self.msg_in.source == "14":
-                        self.button050301a05b.config(image=self.button_square_green_img)
-                    elif self.msg_in.source == "15":
-                        self.button050301a06b.config(image=self.button_square_green_img)
-                    elif self.msg_in.source == "16":
-                        self.button050301a07b.config(image=self.button_square_green_img)
-                    elif self.msg_in.source == "17":
-                        self.button050301a08b.config(image=self.button_square_green_img)
-        
-                elif self.msg_in.type == "003":
-                    if self.msg_in.source == "01":
-                        self.button050301a01b.config(image=self.button_square_red_img)
-                    elif self.msg_in.source == "11":
-                        self.button050301a02b.config(image=self.button_square_red_img)
-                    elif self.msg_in.source == "12":
-                        self.button050301a03b.config(image=self.button_square_red_img)
-                    elif self.msg_in.source == "13":
-                        self.button050301a04b.config(image=self.button_square_red_img)
-                    elif self.msg_in.source == "14":
-                        self.button050301a05b.config(image=self.button_square_red_img)
-                    elif self.msg_in.source == "15":
-                        self.button050301a06b.config(image=self.button_square_red_img)
-                    elif self.msg_in.source == "16":
-                        self.button050301a07b.config(image=self.button_square_red_img)
-                    elif self.msg_in.source == "17":
-                        self.button050301a08b.config(image=self.button_square_red_img)
-
-                elif self.msg_in.type == "020A":
-                    self.current_conditions = (self.msg_in.payload).split(sep=",")
-                    self.logger.debug("Current condition response [%s] received from nest gateway", self.msg_in.raw)
-
-                elif self.msg_in.type == "021A":
-                    self.current_forecast = (self.msg_in.payload).split(sep=",")
-                    self.logger.debug("Today's forecast response [%s] received from nest gateway", self.msg_in.raw)                    
-
-                elif self.msg_in.type == "022A":
-                    self.tomorrow_forecast = (self.msg_in.payload).split(sep=",")      
-                    self.logger.debug("Tomorrow's forecast response [%s] received from nest gateway", self.msg_in.raw)                                                 
+    def process_in_msg_queue(self, *args):
+        """ Drains the incoming message queue.  Registered with the tk event loop so it runs as
+        soon as a message arrives, and also called from the "after" task as a fallback """
+        self.in_msg_loop = True
+        while self.in_msg_loop is True:
+            try:
+                self.msg_in = message.Message(raw=self.msg_in_queue.get_nowait())
+            except:
+                self.in_msg_loop = False
+            # Process incoming message
+            if len(self.msg_in.raw) > 4:
+                self.logger.debug("Processing message [%s] from incoming message queue", self.msg_in.raw)
+                if self.msg_in.dest == "02":
+                    # Match replies to the request that caused them
+                    self.requests.resolve(self.msg_in)
+
+                    if self.msg_in.type == "004":
+                        self.update_queue_counters(self.msg_in.payload)
+                        self.logger.debug("Queue counters [%s] received from main", self.msg_in.raw)
+                    elif self.msg_in.type == "005":
+                        apply_levels(parse_levels(self.msg_in.payload))
+                        self.logger.info("Log levels set to [%s]", self.msg_in.payload)
+
+                    elif self.msg_in.type == "020A":
+                        self.current_conditions = (self.msg_in.payload).split(sep=",")
+                        self.logger.debug("Current condition response [%s] received from nest gateway", self.msg_in.raw)
+
+                    elif self.msg_in.type == "021A":
+                        self.current_forecast = (self.msg_in.payload).split(sep=",")
+                        self.logger.debug("Today's forecast response [%s] received from nest gateway", self.msg_in.raw)                    
+
+                    elif self.msg_in.type == "022A":
+                        self.tomorrow_forecast = (self.msg_in.payload).split(sep=",")      
+                        self.logger.debug("Tomorrow's forecast response [%s] received from nest gateway", self.msg_in.raw)                                                 
                 
-                elif self.msg_in.type == "162A":
-                    if self.msg_in.payload == "0":
-                        if self.msg_in.name == "fylt1":
-                            self.control_fylt1.set_indicator_red()
-                        elif self.msg_in.name == "bylt1":
-                            self.control_bylt1.set_indicator_red()
-                        elif self.msg_in.name == "ewlt1":
-                            self.control_ewlt1.set_indicator_red()
-                        elif self.msg_in.name == "cclt1":
-                            self.control_cclt1.set_indicator_red()
-                        elif self.msg_in.name == "lrlt1":
-                            self.control_lrlt1.set_indicator_red()
-                        elif self.msg_in.name == "lrlt2":
-                            self.control_lrlt2.set_indicator_red()                            
-                        elif self.msg_in.name == "drlt1":
-                            self.control_drlt1.set_indicator_red()
-                        elif self.msg_in.name == "br1lt1":
-                            self.control_br1lt1.set_indicator_red()
-                        elif self.msg_in.name == "br1lt2":
-                            self.control_br1lt2.set_indicator_red()
-                        elif self.msg_in.name == "br2lt1":
-                            self.control_br2lt1.set_indicator_red()
-                        elif self.msg_in.name == "br2lt2":
-                            self.control_br2lt2.set_indicator_red()
-                        elif self.msg_in.name == "br3lt1":
-                            self.control_br3lt1.set_indicator_red()
-                        elif self.msg_in.name == "br3lt2":
-                            self.control_br3lt2.set_indicator_red() 
-                    elif self.msg_in.payload == "1":
-                        if self.msg_in.name == "fylt1":
-                            self.control_fylt1.set_indicator_green()
-                        elif self.msg_in.name == "bylt1":
-                            self.control_bylt1.set_indicator_green()
-                        elif self.msg_in.name == "ewlt1":
-                            self.control_ewlt1.set_indicator_green()
-                        elif self.msg_in.name == "cclt1":
-                            self.control_cclt1.set_indicator_green()
-                        elif self.msg_in.name == "lrlt1":
-                            self.control_lrlt1.set_indicator_green()
-                        elif self.msg_in.name == "lrlt2":
-                            self.control_lrlt2.set_indicator_green()                            
-                        elif self.msg_in.name == "drlt1":
-                            self.control_drlt1.set_indicator_green()
-                        elif self.msg_in.name == "br1lt1":
-                            self.control_br1lt1.set_indicator_green()
-                        elif self.msg_in.name == "br1lt2":
-                            self.control_br1lt2.set_indicator_green()
-                        elif self.msg_in.name == "br2lt1":
-                            self.control_br2lt1.set_indicator_green()
-                        elif self.msg_in.name == "br2lt2":
-                            self.control_br2lt2.set_indicator_green()
-                        elif self.msg_in.name == "br3lt1":
-                            self.control_br3lt1.set_indicator_green()
-                        elif self.msg_in.name == "br3lt2":
-                            self.control_br3lt2.set_indicator_green()                                                                       
+                    elif self.msg_in.type == "162A":
+                        if self.msg_in.payload == "0":
+                            if self.msg_in.name == "fylt1":
+                                self.control_fylt1.set_indicator_red()
+                            elif self.msg_in.name == "bylt1":
+                                self.control_bylt1.set_indicator_red()
+                            elif self.msg_in.name == "ewlt1":
+                                self.control_ewlt1.set_indicator_red()
+                            elif self.msg_in.name == "cclt1":
+                                self.control_cclt1.set_indicator_red()
+                            elif self.msg_in.name == "lrlt1":
+                                self.control_lrlt1.set_indicator_red()
+                            elif self.msg_in.name == "lrlt2":
+                                self.control_lrlt2.set_indicator_red()                            
+                            elif self.msg_in.name == "drlt1":
+                                self.control_drlt1.set_indicator_red()
+                            elif self.msg_in.name == "br1lt1":
+                                self.control_br1lt1.set_indicator_red()
+                            elif self.msg_in.name == "br1lt2":
+                                self.control_br1lt2.set_indicator_red()
+                            elif self.msg_in.name == "br2lt1":
+                                self.control_br2lt1.set_indicator_red()
+                            elif self.msg_in.name == "br2lt2":
+                                self.control_br2lt2.set_indicator_red()
+                            elif self.msg_in.name == "br3lt1":
+                                self.control_br3lt1.set_indicator_red()
+                            elif self.msg_in.name == "br3lt2":
+                                self.control_br3lt2.set_indicator_red() 
+                        elif self.msg_in.payload == "1":
+                            if self.msg_in.name == "fylt1":
+                                self.control_fylt1.set_indicator_green()
+                            elif self.msg_in.name == "bylt1":
+                                self.control_bylt1.set_indicator_green()
+                            elif self.msg_in.name == "ewlt1":
+                                self.control_ewlt1.set_indicator_green()
+                            elif self.msg_in.name == "cclt1":
+                                self.control_cclt1.set_indicator_green()
+                            elif self.msg_in.name == "lrlt1":
+                                self.control_lrlt1.set_indicator_green()
+                            elif self.msg_in.name == "lrlt2":
+                                self.control_lrlt2.set_indicator_green()                            
+                            elif self.msg_in.name == "drlt1":
+                                self.control_drlt1.set_indicator_green()
+                            elif self.msg_in.name == "br1lt1":
+                                self.control_br1lt1.set_indicator_green()
+                            elif self.msg_in.name == "br1lt2":
+                                self.control_br1lt2.set_indicator_green()
+                            elif self.msg_in.name == "br2lt1":
+                                self.control_br2lt1.set_indicator_green()
+                            elif self.msg_in.name == "br2lt2":
+                                self.control_br2lt2.set_indicator_green()
+                            elif self.msg_in.name == "br3lt1":
+                                self.control_br3lt1.set_indicator_green()
+                            elif self.msg_in.name == "br3lt2":
+                                self.control_br3lt2.set_indicator_green()                                                                       
                                        
-                elif self.msg_in.type == "999":
-                    self.logger.info("Kill code received - Shutting down")
-                    self.close_pending = True
+                    elif self.msg_in.type == "999":
+                        self.logger.info("Kill code received - Shutting down")
+                        self.close_pending = True
+                else:
+                    self.msg_out_queue.put_nowait(self.msg_in.packed)
+                    self.logger.debug("Redirecting message [%s] back to main", self.msg_in.raw)                
+                pass  
+                self.msg_in = message.Message()
             else:
-                self.msg_out_queue.put_nowait(self.msg_in.raw)
-                self.logger.debug("Redirecting message [%s] back to main" % self.msg_in.raw)                
-            pass  
-            self.msg_in = message.Message()
-                  
+                self.in_msg_loop = False
+
+
+    def after_tasks(self):
+        #self.logger.debug("Running \"after\" task")
+        # Read the clock once for the whole pass
+        self.clock.tick()
+        # Process incoming message queue
+        self.process_in_msg_queue()
 
         # If a close is pending, wait until all messages have been processed before closing down the window
         # Otherwise schedule another run of the "after" process 
         if ((self.close_pending is True) and (len(self.msg_in.raw) == 0) and (self.msg_in_queue.empty() is True)):
             self.window.destroy()
-        elif datetime.datetime.now() > (self.last_hb + datetime.timedelta(seconds=30)):
+        elif self.liveness.age("00", self.clock.monotonic) > COMM_TIMEOUT:
             self.logger.critical("Comm timeout - shutting down")
             self.window.destroy()
         else:
+            # Update this process' slot in the liveness table and refresh the process indicators
+            self.liveness.beat("02", self.clock.monotonic)
+            if self.clock.now >= (self.last_liveness_check + self.liveness_check_interval):
+                self.update_process_indicators()
+            # Drop requests that were never answered
+            self.requests.expire(now=self.clock.monotonic)
             # Update visual aspects of main window (text, etc)
             if self.frame0203a_packed is True:
                 self.update_status_window()
@@ -1316,61 +1358,61 @@ class MainWindow(multiprocessing.Process):
             self.close_pending = True
             # Kill p167(nest gateway)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="17", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="17", type="999").packed)
                 self.logger.debug("Kill code sent to p17_nest_gateway process")
             except:
                 self.logger.warning("Could not send kill-code to p17_nest_gateway process.  Queue already closed")
             # Kill p16 (wemo gateway)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="16", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="16", type="999").packed)
                 self.logger.debug("Kill code sent to p16_wemo_gateway process") 
             except:
                 self.logger.warning("Could not send kill-code to p16_wemo_gateway process.  Queue already closed")           
             # Kill p15 (rpi screen)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="15", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="15", type="999").packed)
                 self.logger.debug("Kill code sent to p15_rpi_screen process")  
             except:
                 self.logger.warning("Could not send kill-code to p15_rpi_screen process.  Queue already closed")                
             # Kill p14 (motion detector)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="14", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="14", type="999").packed)
                 self.logger.debug("Kill code sent to p14_motion process") 
             except:
                 self.logger.warning("Could not send kill-code to p14_motion process.  Queue already closed")                
             # Kill p13 (home / away)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="13", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="13", type="999").packed)
                 self.logger.debug("Kill code sent to p13_home_away process")   
             except:
                 self.logger.warning("Could not send kill-code to p13_home_away process.  Queue already closed")                
             # Kill p12 (db interface)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="12", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="12", type="999").packed)
                 self.logger.debug("Kill code sent to p12_db_interface process") 
             except:
                 self.logger.warning("Could not send kill-code to p12_db_interface process.  Queue already closed")                                                         
             # Kill p11 (logic solver)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="11", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="11", type="999").packed)
                 self.logger.debug("Kill code sent to p11_logic_solver process")
             except:
                 self.logger.warning("Could not send kill-code to p11_logic_solver process.  Queue already closed")                
             # Kill p02 (gui)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="02", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="02", type="999").packed)
                 self.logger.debug("Kill code sent to p02_gui process")  
             except:
                 self.logger.warning("Could not send kill-code to p02_gui process.  Queue already closed")
             # Kill p01 (log handler)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="01", type="999").raw)
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="01", type="999").packed)
                 self.logger.debug("Kill code sent to p01_log_handler process")  
             except:
                 self.logger.warning("Could not send kill-code to p01_log_handler process.  Queue already closed")
             # Kill p00 (main)
             try:
-                self.msg_out_queue.put_nowait(message.Message(source="02", dest="00", type="999").raw)   
+                self.msg_out_queue.put_nowait(message.Message(source="02", dest="00", type="999").packed)   
                 self.logger.debug("Kill code sent to p00_main process")
             except:
                 self.logger.warning("Could not send kill-code to p00_main process.  Queue already closed")                
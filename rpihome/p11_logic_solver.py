@@ -10,9 +10,21 @@ import multiprocessing
 import os, sys
 import time
 import modules.dst as dst
+from modules.log_levels import apply_levels, parse_levels
 from modules.logger_mp import worker_configurer
 import modules.message as message
-
+from modules.pending import PendingRequests
+from modules.router import PeerChannels
+from modules.rules import load_definitions
+from modules.batch import WorkDrain
+from modules.clock import Clock
+from modules.liveness import BEAT_INTERVAL, COMM_TIMEOUT, LivenessTable
+from modules.rule_schedule import RuleSchedule
+from modules.work_queue import WorkQueue
+from modules.wakeup import seconds_until, wait_for_input
+from modules.sun_table import SunTable
+
+import devices.device_rules as device_rules
 import devices.device_rpi_lr1 as device_rpi_lr1
 import devices.device_wemo_fylt1 as device_wemo_fylt1
 import devices.device_wemo_bylt1 as device_wemo_bylt1
@@ -46,73 +58,150 @@ class LogicProcess(multiprocessing.Process):
     """ WEMO gateway process class and methods """
     def __init__(self, in_queue, out_queue, log_queue, **kwargs):
         self.msg_in_queue = in_queue
-        self.msg_out_queue = out_queue
         # Initialize logging
         worker_configurer(log_queue)
         self.logger = logging.getLogger(__name__)
         # Set default input parameter values
         self.name = "undefined"
+        self.work_budget = 0.05
+        self.liveness = None
+        self.log_levels = {}
+        self.request_timeout = 10.0
+        self.peers = {}
+        self.clock = None
+        self.timezone = dst.TIMEZONE
+        self.sun_table_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+        self.schedule_rules = True
+        self.rules_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "devices", "rules.json")
         # Update default elements based on any parameters passed in
         if kwargs is not None:
             for key, value in kwargs.items():
                 if key == "name":
                     self.name = value             
+                if key == "work_budget":
+                    self.work_budget = value
+                if key == "liveness":
+                    self.liveness = value
+                if key == "log_levels":
+                    self.log_levels = value
+                if key == "request_timeout":
+                    self.request_timeout = value
+                if key == "peers":
+                    self.peers = value
+                if key == "clock":
+                    self.clock = value
+                if key == "timezone":
+                    self.timezone = value
+                if key == "sun_table_dir":
+                    self.sun_table_dir = value
+                if key == "schedule_rules":
+                    self.schedule_rules = value
+                if key == "rules_file":
+                    self.rules_file = value
+        # Send messages for direct peers straight to their queues, all others through main
+        self.msg_out_queue = PeerChannels(out_queue, self.peers)
+        # Track gateway requests (discovery, forecasts) so replies can be matched and timed
+        self.requests = PendingRequests(self.msg_out_queue, timeout=self.request_timeout, logger=self.logger)
         # Initialize parent class    
         multiprocessing.Process.__init__(self, name=self.name)
         # Create remaining class elements
-        self.work_queue = multiprocessing.Queue(-1)
+        self.liveness = self.liveness or LivenessTable()
+        self.clock = self.clock or Clock()
+        self.work_queue = WorkQueue()
+        self.work_drain = WorkDrain(budget=self.work_budget, logger=self.logger)
         self.msg_in = message.Message()
         self.msg_to_process = message.Message()
         self.msg_to_send = message.Message()
-        self.last_hb = datetime.datetime.now()
-        self.last_forecast_update = datetime.datetime.now() + datetime.timedelta(minutes=-15)
+        self.last_forecast_update = self.clock.now + datetime.timedelta(minutes=-15)
+        self.last_automation = self.clock.now + datetime.timedelta(seconds=-1)
+        self.automation_interval = datetime.timedelta(seconds=1)
         self.dst = dst.USdst()
+        self.zone = self.load_timezone()
         self.utc_offset = datetime.timedelta(hours=0)
         self.in_msg_loop = bool()
         self.main_loop = bool()
         self.close_pending = False
+        self.sun_table = None
+        self.rule_schedule = RuleSchedule([], enabled=self.schedule_rules, logger=self.logger)
+        self.devices = []
         self.create_home_flags()
 
 
     def create_devices(self):
-        """ Create devices in home """
-        self.rpi_screen = device_rpi_lr1.RPImain("rpi", self.msg_out_queue)
-        self.wemo_fylt1 = device_wemo_fylt1.Wemo_fylt1("fylt1", "192.168.86.21", self.msg_out_queue)
-        self.wemo_bylt1 = device_wemo_bylt1.Wemo_bylt1("bylt1", "192.168.86.22", self.msg_out_queue)
-        self.wemo_ewlt1 = device_wemo_ewlt1.Wemo_ewlt1("ewlt1", "192.168.86.23", self.msg_out_queue)
-        self.wemo_cclt1 = device_wemo_cclt1.Wemo_cclt1("cclt1", "192.168.86.24", self.msg_out_queue)
-        self.wemo_lrlt1 = device_wemo_lrlt1.Wemo_lrlt1("lrlt1", "192.168.86.25", self.msg_out_queue)
-        self.wemo_lrlt2 = device_wemo_lrlt2.Wemo_lrlt2("lrlt2", "192.168.86.33", self.msg_out_queue)
-        self.wemo_drlt1 = device_wemo_drlt1.Wemo_drlt1("drlt1", "192.168.86.26", self.msg_out_queue)
-        #self.wemo_br1lt1 = device_wemo_br1lt1.Wemo_br1lt1("br1lt1", "192.168.86.27", self.msg_out_queue)
-        self.wemo_br1lt2 = device_wemo_br1lt2.Wemo_br1lt2("br1lt2", "192.168.86.28", self.msg_out_queue)
-        #self.wemo_br2lt1 = device_wemo_br2lt1.Wemo_br2lt1("br2lt1", "192.168.86.29", self.msg_out_queue)
-        self.wemo_br2lt2 = device_wemo_br2lt2.Wemo_br2lt2("br2lt2", "192.168.86.30", self.msg_out_queue)
-        self.wemo_br3lt1 = device_wemo_br3lt1.Wemo_br3lt1("br3lt1", "192.168.86.31", self.msg_out_queue)
-        self.wemo_br3lt2 = device_wemo_br3lt2.Wemo_br3lt2("br3lt2", "192.168.86.32", self.msg_out_queue)
+        """ Create devices in home, from the rules file if one is set """
+        if self.rules_file is not None:
+            self.devices, automated = device_rules.create_devices(load_definitions(self.rules_file),
+                                                                  self.requests, self.logger)
+            self.rule_schedule = RuleSchedule(automated, enabled=self.schedule_rules, logger=self.logger)
+            return
+        self.rpi_screen = device_rpi_lr1.RPImain("rpi", self.requests)
+        self.wemo_fylt1 = device_wemo_fylt1.Wemo_fylt1("fylt1", "192.168.86.21", self.requests)
+        self.wemo_bylt1 = device_wemo_bylt1.Wemo_bylt1("bylt1", "192.168.86.22", self.requests)
+        self.wemo_ewlt1 = device_wemo_ewlt1.Wemo_ewlt1("ewlt1", "192.168.86.23", self.requests)
+        self.wemo_cclt1 = device_wemo_cclt1.Wemo_cclt1("cclt1", "192.168.86.24", self.requests)
+        self.wemo_lrlt1 = device_wemo_lrlt1.Wemo_lrlt1("lrlt1", "192.168.86.25", self.requests)
+        self.wemo_lrlt2 = device_wemo_lrlt2.Wemo_lrlt2("lrlt2", "192.168.86.33", self.requests)
+        self.wemo_drlt1 = device_wemo_drlt1.Wemo_drlt1("drlt1", "192.168.86.26", self.requests)
+        #self.wemo_br1lt1 = device_wemo_br1lt1.Wemo_br1lt1("br1lt1", "192.168.86.27", self.requests)
+        self.wemo_br1lt2 = device_wemo_br1lt2.Wemo_br1lt2("br1lt2", "192.168.86.28", self.requests)
+        #self.wemo_br2lt1 = device_wemo_br2lt1.Wemo_br2lt1("br2lt1", "192.168.86.29", self.requests)
+        self.wemo_br2lt2 = device_wemo_br2lt2.Wemo_br2lt2("br2lt2", "192.168.86.30", self.requests)
+        self.wemo_br3lt1 = device_wemo_br3lt1.Wemo_br3lt1("br3lt1", "192.168.86.31", self.requests)
+        self.wemo_br3lt2 = device_wemo_br3lt2.Wemo_br3lt2("br3lt2", "192.168.86.32", self.requests)
+        self.devices = [self.rpi_screen, self.wemo_fylt1, self.wemo_bylt1, self.wemo_ewlt1, self.wemo_cclt1,
+                        self.wemo_lrlt1, self.wemo_lrlt2, self.wemo_drlt1, self.wemo_br1lt2, self.wemo_br2lt2,
+                        self.wemo_br3lt1, self.wemo_br3lt2]
+        # Devices whose rules are checked by run_automation, each only when it is due
+        self.rule_schedule = RuleSchedule([self.rpi_screen, self.wemo_fylt1, self.wemo_bylt1, self.wemo_ewlt1,
+                                           self.wemo_cclt1, self.wemo_br1lt2, self.wemo_br2lt2, self.wemo_br3lt1,
+                                           self.wemo_br3lt2],
+                                          enabled=self.schedule_rules, logger=self.logger)
+
+
+    def load_timezone(self):
+        """ Returns the UTC offsets for the configured timezone, or None (falling back to US
+        Central rules) if the zoneinfo database can't provide it """
+        try:
+            return dst.ZoneOffsets(self.timezone, logger=self.logger)
+        except (KeyError, ValueError, OSError):
+            self.logger.exception("Timezone [%s] not available.  Using US Central DST rules", self.timezone)
+            return None
+
+
+    def load_sun_table(self):
+        """ Memory-maps this year's sun table (creating it if needed) so device rules look sun
+        times up instead of calculating them """
+        try:
+            self.sun_table = SunTable(self.sun_table_dir, logger=self.logger).register()
+            self.sun_table.year(self.clock.now.year)
+        except (OSError, ValueError):
+            self.logger.exception("Could not load sun table from [%s].  Sun times will be calculated", self.sun_table_dir)
+            if self.sun_table is not None:
+                self.sun_table.close()
+            self.sun_table = None
 
 
     def create_home_flags(self):
         """ Create an array of home/away values and an array of datetimes indicating when users
         got home """
         self.homeArray = [False, False, False]
-        self.homeTime = [datetime.datetime.now() + datetime.timedelta(minutes=-15),
-                         datetime.datetime.now() + datetime.timedelta(minutes=-15),
-                         datetime.datetime.now() + datetime.timedelta(minutes=-15)]
+        self.homeTime = [self.clock.now + datetime.timedelta(minutes=-15),
+                         self.clock.now + datetime.timedelta(minutes=-15),
+                         self.clock.now + datetime.timedelta(minutes=-15)]
 
 
     def update_forecast(self):
         """ Requests a forecast update from the nest module """
         self.msg_to_send = message.Message(source="11", dest="17", type="020")
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.requests.send(self.msg_to_send)
         self.logger.debug("Requesting current weather status update from NEST [%s]", self.msg_to_send.raw)
         self.msg_to_send = message.Message(source="11", dest="17", type="021")        
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.requests.send(self.msg_to_send)
         self.logger.debug("Requesting current weather status update from NEST [%s]", self.msg_to_send.raw)
         self.msg_to_send = message.Message(source="11", dest="17", type="022")        
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.requests.send(self.msg_to_send)
         self.logger.debug("Requesting current weather status update from NEST [%s]", self.msg_to_send.raw)       
-        self.last_forecast_update = datetime.datetime.now()
+        self.last_forecast_update = self.clock.now
 
 
     def process_in_msg_queue(self):
@@ -126,43 +215,47 @@ class LogicProcess(multiprocessing.Process):
             except:
                 self.in_msg_loop = False
             if len(self.msg_in.raw) > 4:
-                self.logger.debug("Processing message [%s] from incoming message queue" % self.msg_in.raw)                
+                self.logger.debug("Processing message [%s] from incoming message queue", self.msg_in.raw)                
                 if self.msg_in.dest == "11":
-                    if self.msg_in.type == "001":
-                        self.last_hb = datetime.datetime.now()
-                    elif self.msg_in.type == "999":
+                    if self.msg_in.type == "999":
                         self.logger.info("Kill code received - Shutting down")
                         self.close_pending = True
                         self.in_msg_loop = False
+                    elif self.msg_in.type == "005":
+                        apply_levels(parse_levels(self.msg_in.payload))
+                        self.logger.info("Log levels set to [%s]", self.msg_in.payload)
                     else:
-                        self.work_queue.put_nowait(self.msg_in.raw)
+                        self.work_queue.put_nowait(self.msg_in)
                         self.logger.debug("Moving message [%s] over to internal work queue", self.msg_in.raw)                        
                     self.msg_in = str()
                 else:
-                    self.msg_out_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Redirecting message [%s] back to main" % self.msg_in.raw)                    
+                    self.msg_out_queue.put_nowait(self.msg_in.packed)
+                    self.logger.debug("Redirecting message [%s] back to main", self.msg_in.raw)                    
                 self.msg_in = message.Message()
             else:
                 self.in_msg_loop = False
 
 
     def process_work_queue(self):
-        """ Method to perform work from the work queue """
-        # Get next message from internal queue or timeout trying to do so
-        try:
-            self.msg_to_process = message.Message(raw=self.work_queue.get_nowait())
-        except:
-            pass
+        """ Method to drain the internal work queue, up to the per-tick time budget """
+        self.work_drain.drain(self.work_queue, self.process_work_msg)
+
+
+    def process_work_msg(self, msg):
+        """ Method to perform the work requested by a single message from the work queue """
+        self.msg_to_process = msg
         # If there is a message to process, do so
         if len(self.msg_to_process.raw) > 4:
-            self.logger.debug("Processing message [%s] from internal work queue" % self.msg_to_process.raw)
+            self.logger.debug("Processing message [%s] from internal work queue", self.msg_to_process.raw)
+            # Match replies to the request that caused them
+            self.requests.resolve(self.msg_to_process)
 
             # Process current condition request ack
             if self.msg_to_process.type == "020A":
                 self.logger.debug("ACK received for 020 message: [%s]", self.msg_to_process.raw)
                 if self.msg_to_process.payload != "":
                     self.msg_to_send = message.Message(source="11", dest="02", type="020A", payload=self.msg_to_process.payload)
-                    self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                    self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                     self.logger.debug("Forwarding ACK message [%s] to gui to update display", self.msg_to_process.raw)
                 else:
                     self.logger.warning("Message 020 ACK from NEST service contained no info to display")
@@ -172,7 +265,7 @@ class LogicProcess(multiprocessing.Process):
                 self.logger.debug("ACK received for 021 message: [%s]", self.msg_to_process.raw)
                 if self.msg_to_process.payload != "":
                     self.msg_to_send = message.Message(source="11", dest="02", type="021A", payload=self.msg_to_process.payload)
-                    self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                    self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                     self.logger.debug("Forwarding ACK message [%s] to gui to update display", self.msg_to_process.raw)
                 else:
                     self.logger.warning("Message 021 ACK from NEST service contained no info to display")                    
@@ -182,7 +275,7 @@ class LogicProcess(multiprocessing.Process):
                 self.logger.debug("ACK received for 022 message: [%s]", self.msg_to_process.raw)
                 if self.msg_to_process.payload != "":                
                     self.msg_to_send = message.Message(source="11", dest="02", type="022A", payload=self.msg_to_process.payload)
-                    self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                    self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                     self.logger.debug("Forwarding ACK message [%s] to gui to update display", self.msg_to_process.raw)                
                 else:
                     self.logger.warning("Message 022 ACK from NEST service contained no info to display")
@@ -216,7 +309,7 @@ class LogicProcess(multiprocessing.Process):
                 self.logger.debug("ACK received for 160 message: [%s]", self.msg_to_process.raw)
                 if self.msg_to_process.payload == "found":
                     self.msg_to_send = message.Message(source="11", dest="02", type="160A", name=self.msg_to_process.name)
-                    self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                    self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                     self.logger.debug("Sending message [%s] to gui app to add control widget for device: [%s]", self.msg_to_send.raw, self.msg_to_process.name)
                 else:
                     self.logger.debug("ACK reports device was not found.  No further action being taken")
@@ -232,134 +325,110 @@ class LogicProcess(multiprocessing.Process):
             pass
 
 
-    def check_dst(self):
-        """ Determine DST offset based on current time/date """
-        if self.dst.is_active(datetime=datetime.datetime.now()) is True:
+    def check_dst(self, now=None):
+        """ Determine UTC offset based on the clock's time/date (or the time given) """
+        if now is None:
+            now = self.clock.now
+        if self.zone is not None:
+            self.utc_offset = self.zone.utc_offset(now)
+        elif self.dst.is_active(datetime=now) is True:
             self.utc_offset = datetime.timedelta(hours=-5)
         else:
             self.utc_offset = datetime.timedelta(hours=-6)
         return self.utc_offset
 
 
-    def run_automation(self):
-        """ Run automation rule checks for automatic device output state control """
-        self.rpi_screen.check_rules(datetime=datetime.datetime.now(),
-                                    homeArray=self.homeArray)
-        self.wemo_fylt1.check_rules(datetime=datetime.datetime.now(),
-                                    homeArray=self.homeArray,
-                                    utcOffset=self.utc_offset,
-                                    sunriseOffset=datetime.timedelta(minutes=0),
-                                    sunsetOffset=datetime.timedelta(minutes=0))
-        self.wemo_bylt1.check_rules(datetime=datetime.datetime.now(),
-                                    homeArray=self.homeArray,
-                                    utcOffset=self.utc_offset,
-                                    sunriseOffset=datetime.timedelta(minutes=0),
-                                    sunsetOffset=datetime.timedelta(minutes=0))
-        self.wemo_ewlt1.check_rules(datetime=datetime.datetime.now(),
-                                    homeArray=self.homeArray,
-                                    utcOffset=self.utc_offset,
-                                    sunriseOffset=datetime.timedelta(minutes=0),
-                                    sunsetOffset=datetime.timedelta(minutes=0),
-                                    homeTime=self.homeTime)
-        self.wemo_cclt1.check_rules(datetime=datetime.datetime.now(),
-                                    homeArray=self.homeArray,
-                                    utcOffset=self.utc_offset,
-                                    sunriseOffset=datetime.timedelta(minutes=0),
-                                    sunsetOffset=datetime.timedelta(minutes=0))
-        ##self.wemo_lrlt1.check_rules(datetime=datetime.datetime.now(),
-        #                            homeArray=self.homeArray,
-        #                            utcOffset=self.utc_offset,
-        #                            sunriseOffset=datetime.timedelta(minutes=0),
-        #                            sunsetOffset=datetime.timedelta(minutes=0))
-        #self.wemo_lrlt2.check_rules(datetime=datetime.datetime.now(),
-        #                            homeArray=self.homeArray,
-        #                            utcOffset=self.utc_offset,
-        #                            sunriseOffset=datetime.timedelta(minutes=0),
-        #                            sunsetOffset=datetime.timedelta(minutes=0))                                    
-        #self.wemo_drlt1.check_rules(datetime=datetime.datetime.now(),
-        #                            homeArray=self.homeArray,
-        #                            utcOffset=self.utc_offset,
-        #                            sunriseOffset=datetime.timedelta(minutes=0),
-        #                            sunsetOffset=datetime.timedelta(minutes=0))
-        #self.wemo_br1lt1.check_rules(datetime=datetime.datetime.now(),
-        #                            homeArray=self.homeArray,
-        #                            utcOffset=self.utc_offset,
-        #                            sunriseOffset=datetime.timedelta(minutes=0),
-        #                            sunsetOffset=datetime.timedelta(minutes=0))
-        self.wemo_br1lt2.check_rules(datetime=datetime.datetime.now(),
-                                     homeArray=self.homeArray,
-                                     utcOffset=self.utc_offset,
-                                     sunriseOffset=datetime.timedelta(minutes=0),
-                                     sunsetOffset=datetime.timedelta(minutes=0))
-        #self.wemo_br2lt1.check_rules(datetime=datetime.datetime.now(),
-        #                            homeArray=self.homeArray,
-        #                            utcOffset=self.utc_offset,
-        #                            sunriseOffset=datetime.timedelta(minutes=0),
-        #                            sunsetOffset=datetime.timedelta(minutes=0))
-        self.wemo_br2lt2.check_rules(datetime=datetime.datetime.now(),
-                                     homeArray=self.homeArray,
-                                     utcOffset=self.utc_offset,
-                                     sunriseOffset=datetime.timedelta(minutes=0),
-                                     sunsetOffset=datetime.timedelta(minutes=0))
-        self.wemo_br3lt1.check_rules(datetime=datetime.datetime.now(),
-                                     homeArray=self.homeArray,
-                                     utcOffset=self.utc_offset,
-                                     sunriseOffset=datetime.timedelta(minutes=0),
-                                     sunsetOffset=datetime.timedelta(minutes=0))
-        self.wemo_br3lt2.check_rules(datetime=datetime.datetime.now(),
-                                     homeArray=self.homeArray,
-                                     utcOffset=self.utc_offset,
-                                     sunriseOffset=datetime.timedelta(minutes=0),
-                                     sunsetOffset=datetime.timedelta(minutes=0))
+    def run_automation(self, now=None):
+        """ Run automation rule checks for automatic device output state control as of the
+        clock's time (or the time given).  Every device sees the same time, but only devices
+        whose next possible state change has been reached, or whose inputs changed, are checked """
+        if now is None:
+            now = self.clock.now
+        inputs = (tuple(self.homeArray), tuple(self.homeTime), self.utc_offset)
+        for device in self.rule_schedule.due(now, inputs):
+            device.check_rules(datetime=now,
+                               homeArray=self.homeArray,
+                               utcOffset=self.utc_offset,
+                               sunriseOffset=datetime.timedelta(minutes=0),
+                               sunsetOffset=datetime.timedelta(minutes=0),
+                               homeTime=self.homeTime)
+            self.rule_schedule.reschedule(device, device.next_transition(), now)
+
+
+    def next_automation(self):
+        """ Returns the time the rules next need checking if nothing else changes: the earliest
+        device deadline, but no sooner than one interval after the last check """
+        if self.schedule_rules is True and self.rule_schedule.next_deadline() is not None:
+            return max(self.rule_schedule.next_deadline(), self.last_automation + self.automation_interval)
+        return self.last_automation + self.automation_interval
 
 
     def run_commands(self):                                    
         """ Monitor desired command state and send commands to target device when COS occurs """
-        self.rpi_screen.command()
-        self.wemo_fylt1.command()
-        self.wemo_bylt1.command()
-        self.wemo_ewlt1.command()
-        self.wemo_cclt1.command()
-        self.wemo_lrlt1.command()
-        self.wemo_lrlt2.command()
-        self.wemo_drlt1.command()
-        #self.wemo_br1lt1.command()
-        self.wemo_br1lt2.command()
-        #self.wemo_br2lt1.command()
-        self.wemo_br2lt2.command()
-        self.wemo_br3lt1.command()
-        self.wemo_br3lt2.command()
+        for device in self.devices:
+            device.command()
 
 
     def run(self):
         """ Actual process loop.  Runs whenever start() method is called """
+        # Apply this process' log levels (in the child, so p00's own loggers are untouched)
+        apply_levels(self.log_levels)
         self.logger.info("Main loop started")
-        # Create devices
+        # Load sun times and create devices
+        self.load_sun_table()
         self.create_devices()
         # Main process loop        
         self.main_loop = True
         while self.main_loop is True:
+            # Read the clock once for the whole pass
+            self.clock.tick()
+            # Update this process' slot in the liveness table
+            self.liveness.beat("11", self.clock.monotonic)
             # Process incoming messages
             self.process_in_msg_queue()
 
             # Process tasks in internal work queue
             if self.close_pending is False:
                 self.process_work_queue()
-                self.check_dst()
-                self.run_automation()
+                if self.schedule_rules is True or self.clock.now >= self.next_automation():
+                    self.check_dst()
+                    self.run_automation()
+                    self.last_automation = self.clock.now
                 self.run_commands()
-                if datetime.datetime.now() > self.last_forecast_update + datetime.timedelta(minutes=15):
+                if self.clock.now > self.last_forecast_update + datetime.timedelta(minutes=15):
                     self.update_forecast()
+                # Drop requests that were never answered
+                self.requests.expire(now=self.clock.monotonic)
 
             # Close process           
             if self.close_pending is True:
                 self.main_loop = False
-            elif datetime.datetime.now() > self.last_hb + datetime.timedelta(seconds=30):
+            elif self.liveness.age("00", self.clock.monotonic) > COMM_TIMEOUT:
                 self.logger.critical("Comm timeout - shutting down")
                 self.main_loop = False
 
-            # Pause before next process run
-            time.sleep(0.097)
-
+            # Sleep until a message arrives or the next timer deadline is reached
+            if self.main_loop is True:
+                wait_for_input([self.msg_in_queue, self.work_queue],
+                               min(BEAT_INTERVAL,
+                                   self.requests.seconds_to_deadline(BEAT_INTERVAL),
+                                   seconds_until(self.next_automation(),
+                                                 self.last_forecast_update + datetime.timedelta(minutes=15))))
+
+        # Report how many messages took the direct path to a peer
+        self.logger.info("Sent %d messages direct to peers and %d through main (%.2f hops/message)",
+                         self.msg_out_queue.direct_count, self.msg_out_queue.relay_count,
+                         self.msg_out_queue.hops())
+        # Report gateway round trip times
+        self.logger.info("Request latency: %s", self.requests.report())
+        # Report work queue drain counters
+        self.logger.info("Work queue: %s", self.work_drain.report())
+        # Report how often device rules were checked
+        self.logger.info("Rule checks: %s", self.rule_schedule.report())
+        # Release the sun table
+        if self.sun_table is not None:
+            self.sun_table.close()
+        # Mark process as stopped in the liveness table
+        self.liveness.stop("11")
         # Send final log message when process exits
         self.logger.info("Shutdown complete")
@@ -9,8 +9,14 @@ import multiprocessing
 import platform
 import os, sys
 import time
+from modules.log_levels import apply_levels, parse_levels
 from modules.logger_mp import worker_configurer
 import modules.message as message
+from modules.batch import WorkDrain
+from modules.clock import Clock
+from modules.liveness import BEAT_INTERVAL, COMM_TIMEOUT, LivenessTable
+from modules.work_queue import WorkQueue
+from modules.wakeup import seconds_until, wait_for_input
 import home.home_user1 as home_user1
 import home.home_user2 as home_user2
 import home.home_user3 as home_user3
@@ -38,22 +44,38 @@ class HomeProcess(multiprocessing.Process):
         self.logger = logging.getLogger(__name__)
         # Set default input parameter values
         self.name = "undefined"
+        self.work_budget = 0.05
+        self.liveness = None
+        self.log_levels = {}
+        self.clock = None
         # Update default elements based on any parameters passed in
         if kwargs is not None:
             for key, value in kwargs.items():
                 if key == "name":
                     self.name = value              
+                if key == "work_budget":
+                    self.work_budget = value
+                if key == "liveness":
+                    self.liveness = value
+                if key == "log_levels":
+                    self.log_levels = value
+                if key == "clock":
+                    self.clock = value
         # Initialize parent class 
         multiprocessing.Process.__init__(self, name=self.name)
         # Create remaining class elements
-        self.work_queue = multiprocessing.Queue(-1)
+        self.liveness = self.liveness or LivenessTable()
+        self.clock = self.clock or Clock()
+        self.work_queue = WorkQueue()
+        self.work_drain = WorkDrain(budget=self.work_budget, logger=self.logger)
         self.msg_in = message.Message()
         self.msg_to_process = message.Message()
         self.msg_to_send = message.Message()
         self.user1 = home_user1.HomeUser1(self.msg_out_queue)
         self.user2 = home_user2.HomeUser2(self.msg_out_queue)
         self.user3 = home_user3.HomeUser3(self.msg_out_queue)
-        self.last_hb = datetime.datetime.now()
+        self.last_automation = self.clock.now + datetime.timedelta(seconds=-1)
+        self.automation_interval = datetime.timedelta(seconds=1)
         self.in_msg_loop = bool()
         self.main_loop = bool()
         self.close_pending = False
@@ -70,20 +92,21 @@ class HomeProcess(multiprocessing.Process):
             except:
                 self.in_msg_loop = False
             if len(self.msg_in.raw) > 4:
-                self.logger.debug("Processing message [%s] from incoming message queue" % self.msg_in.raw)                
+                self.logger.debug("Processing message [%s] from incoming message queue", self.msg_in.raw)                
                 if self.msg_in.dest == "13":
-                    if self.msg_in.type == "001":
-                        self.last_hb = datetime.datetime.now()
-                    elif self.msg_in.type == "999":
+                    if self.msg_in.type == "999":
                         self.logger.info("Kill code received - Shutting down")
                         self.close_pending = True
                         self.in_msg_loop = False
+                    elif self.msg_in.type == "005":
+                        apply_levels(parse_levels(self.msg_in.payload))
+                        self.logger.info("Log levels set to [%s]", self.msg_in.payload)
                     else:
-                        self.work_queue.put_nowait(self.msg_in.raw)
+                        self.work_queue.put_nowait(self.msg_in)
                         self.logger.debug("Moving message [%s] over to internal work queue", self.msg_in.raw)                        
                 else:
-                    self.msg_out_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Redirecting message [%s] back to main" % self.msg_in.raw)
+                    self.msg_out_queue.put_nowait(self.msg_in.packed)
+                    self.logger.debug("Redirecting message [%s] back to main", self.msg_in.raw)
                 # Resetting message for next check of queue                
                 self.msg_in = message.Message()
             else:
@@ -91,15 +114,16 @@ class HomeProcess(multiprocessing.Process):
 
 
     def process_work_queue(self):
-        """ Method to perform work from the work queue """
-        # Get next message from internal queue or timeout trying to do so
-        try:
-            self.msg_to_process = message.Message(raw=self.work_queue.get_nowait())
-        except:
-            pass
+        """ Method to drain the internal work queue, up to the per-tick time budget """
+        self.work_drain.drain(self.work_queue, self.process_work_msg)
+
+
+    def process_work_msg(self, msg):
+        """ Method to perform the work requested by a single message from the work queue """
+        self.msg_to_process = msg
         # If there is a message to process, do so
         if len(self.msg_to_process.raw) > 4:
-            self.logger.debug("Processing message [%s] from internal work queue" % self.msg_to_process.raw)
+            self.logger.debug("Processing message [%s] from internal work queue", self.msg_to_process.raw)
             # 130 = Set Home-Away mode set to away (override)
             if self.msg_to_process.type == "130":
                 # Mode 0 == away override
@@ -157,13 +181,14 @@ class HomeProcess(multiprocessing.Process):
 
 
     def run_automation(self):
-        """ Run automation rule determines if user is home or away """
+        """ Run automation rule determines if user is home or away.  Every user is checked
+        against the same time """
         self.user1.by_mode(
-            mode=2, datetime=datetime.datetime.now(), ip="192.168.86.40")
+            mode=2, datetime=self.clock.now, ip="192.168.86.40")
         self.user2.by_mode(
-            mode=2, datetime=datetime.datetime.now(), ip="192.168.86.42")
+            mode=2, datetime=self.clock.now, ip="192.168.86.42")
         self.user3.by_mode(
-            mode=2, datetime=datetime.datetime.now(), ip="192.168.86.42")
+            mode=2, datetime=self.clock.now, ip="192.168.86.42")
 
 
     def run_commands(self):
@@ -175,28 +200,43 @@ class HomeProcess(multiprocessing.Process):
 
     def run(self):
         """ Actual process loop.  Runs whenever start() method is called """
+        # Apply this process' log levels (in the child, so p00's own loggers are untouched)
+        apply_levels(self.log_levels)
         self.logger.info("Main loop started")
         # Main process loop        
         self.main_loop = True
         while self.main_loop is True:
+            # Read the clock once for the whole pass
+            self.clock.tick()
+            # Update this process' slot in the liveness table
+            self.liveness.beat("13", self.clock.monotonic)
             # Process incoming messages
             self.process_in_msg_queue()
 
             # Process tasks in internal work queue
             if self.close_pending is False:
                 self.process_work_queue()
-                self.run_automation()
+                if self.clock.now >= self.last_automation + self.automation_interval:
+                    self.run_automation()
+                    self.last_automation = self.clock.now
                 self.run_commands()
 
             # Close process
             if self.close_pending is True:
                 self.main_loop = False
-            elif datetime.datetime.now() > self.last_hb + datetime.timedelta(seconds=30):
+            elif self.liveness.age("00", self.clock.monotonic) > COMM_TIMEOUT:
                 self.logger.critical("Comm timeout - shutting down")
                 self.main_loop = False
 
-            # Pause before next process run
-            time.sleep(0.097)
+            # Sleep until a message arrives or the next timer deadline is reached
+            if self.main_loop is True:
+                wait_for_input([self.msg_in_queue, self.work_queue],
+                               min(BEAT_INTERVAL,
+                                   seconds_until(self.last_automation + self.automation_interval)))
 
+        # Report work queue drain counters
+        self.logger.info("Work queue: %s", self.work_drain.report())
+        # Mark process as stopped in the liveness table
+        self.liveness.stop("13")
         # Send final log message when process exits
         self.logger.info("Shutdown complete")
\ No newline at end of file
@@ -10,8 +10,14 @@ import platform
 import os, sys
 import subprocess
 import time
+from modules.log_levels import apply_levels, parse_levels
 from modules.logger_mp import worker_configurer
 import modules.message as message
+from modules.batch import WorkDrain
+from modules.clock import Clock
+from modules.liveness import BEAT_INTERVAL, COMM_TIMEOUT, LivenessTable
+from modules.work_queue import WorkQueue
+from modules.wakeup import wait_for_input
 
 
 # Authorship Info *********************************************************************************
@@ -36,22 +42,36 @@ class RpiProcess(multiprocessing.Process):
         self.logger = logging.getLogger(__name__)    
         # Set default input parameter values
         self.name = "undefined"
+        self.work_budget = 0.05
+        self.liveness = None
+        self.log_levels = {}
+        self.clock = None
         #self.log_queue = multiprocessing.Queue(-1)
         # Update default elements based on any parameters passed in
         if kwargs is not None:
             for key, value in kwargs.items():
                 if key == "name":
                     self.name = value
+                if key == "work_budget":
+                    self.work_budget = value
+                if key == "liveness":
+                    self.liveness = value
+                if key == "log_levels":
+                    self.log_levels = value
+                if key == "clock":
+                    self.clock = value
         # Initialize parent class    
         multiprocessing.Process.__init__(self, name=self.name)
         # Create remaining class elements
-        self.work_queue = multiprocessing.Queue(-1)
+        self.liveness = self.liveness or LivenessTable()
+        self.clock = self.clock or Clock()
+        self.work_queue = WorkQueue()
+        self.work_drain = WorkDrain(budget=self.work_budget, logger=self.logger)
         self.msg_in = message.Message()
         self.msg_to_process = message.Message()
         self.msg_to_send = message.Message()
         self.command = str()
         self.output = str()
-        self.last_hb = datetime.datetime.now()
         self.in_msg_loop = bool()
         self.main_loop = bool()
         self.close_pending = False
@@ -68,34 +88,36 @@ class RpiProcess(multiprocessing.Process):
             except:
                 self.in_msg_loop = False
             if len(self.msg_in.raw) > 4:
-                self.logger.debug("Processing message [%s] from incoming message queue" % self.msg_in.raw)                
+                self.logger.debug("Processing message [%s] from incoming message queue", self.msg_in.raw)                
                 if self.msg_in.dest == "15":
-                    if self.msg_in.type == "001":
-                        self.last_hb = datetime.datetime.now()
-                    elif self.msg_in.type == "999":
+                    if self.msg_in.type == "999":
                         self.logger.info("Kill code received - Shutting down")
                         self.close_pending = True
                         self.in_msg_loop = False
+                    elif self.msg_in.type == "005":
+                        apply_levels(parse_levels(self.msg_in.payload))
+                        self.logger.info("Log levels set to [%s]", self.msg_in.payload)
                     else:
-                        self.work_queue.put_nowait(self.msg_in.raw)
+                        self.work_queue.put_nowait(self.msg_in)
                         self.logger.debug("Moving message [%s] over to internal work queue", self.msg_in.raw)                        
                 else:
-                    self.msg_out_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Redirecting message [%s] back to main" % self.msg_in.raw)                    
+                    self.msg_out_queue.put_nowait(self.msg_in.packed)
+                    self.logger.debug("Redirecting message [%s] back to main", self.msg_in.raw)                    
                 self.msg_in = message.Message()
             else:
                 self.in_msg_loop = False
 
     def process_work_queue(self):
-        """ Method to perform work from the work queue """
-        # Get next message from internal queue or timeout trying to do so
-        try:
-            self.msg_to_process = message.Message(raw=self.work_queue.get_nowait())
-        except:
-            pass
+        """ Method to drain the internal work queue, up to the per-tick time budget """
+        self.work_drain.drain(self.work_queue, self.process_work_msg)
+
+
+    def process_work_msg(self, msg):
+        """ Method to perform the work requested by a single message from the work queue """
+        self.msg_to_process = msg
         # If there is a message to process, do so
         if len(self.msg_to_process.raw) > 4:
-            self.logger.debug("Processing message [%s] from internal work queue" % self.msg_to_process)
+            self.logger.debug("Processing message [%s] from internal work queue", self.msg_to_process)
             if self.msg_to_process.type == "150":
                 self.run_commands(self.msg_to_process.payload)
             # Clear msg-to-process string
@@ -122,10 +144,16 @@ class RpiProcess(multiprocessing.Process):
 
     def run(self):
         """ Actual process loop.  Runs whenever start() method is called """
+        # Apply this process' log levels (in the child, so p00's own loggers are untouched)
+        apply_levels(self.log_levels)
         self.logger.info("Main loop started")
         # Main process loop        
         self.main_loop = True
         while self.main_loop is True:
+            # Read the clock once for the whole pass
+            self.clock.tick()
+            # Update this process' slot in the liveness table
+            self.liveness.beat("15", self.clock.monotonic)
             # Process incoming messages
             self.process_in_msg_queue()
 
@@ -136,12 +164,17 @@ class RpiProcess(multiprocessing.Process):
             # Close process
             if self.close_pending is True:
                 self.main_loop = False
-            elif datetime.datetime.now() > self.last_hb + datetime.timedelta(seconds=30):
+            elif self.liveness.age("00", self.clock.monotonic) > COMM_TIMEOUT:
                 self.logger.critical("Comm timeout - shutting down")
                 self.main_loop = False
 
-            # Pause before next process run
-            time.sleep(0.021)
+            # Sleep until a message arrives or it is time to update the liveness table
+            if self.main_loop is True:
+                wait_for_input([self.msg_in_queue, self.work_queue], BEAT_INTERVAL)
 
+        # Report work queue drain counters
+        self.logger.info("Work queue: %s", self.work_drain.report())
+        # Mark process as stopped in the liveness table
+        self.liveness.stop("15")
         # Send final log message when process exits
         self.logger.info("Shutdown complete")
@@ -11,8 +11,15 @@ import os
 import sys
 import time
 import pywemo
+from modules.log_levels import apply_levels, parse_levels
 from modules.logger_mp import worker_configurer
 import modules.message as message
+from modules.router import PeerChannels
+from modules.batch import WorkDrain
+from modules.clock import Clock
+from modules.liveness import BEAT_INTERVAL, COMM_TIMEOUT, LivenessTable
+from modules.work_queue import WorkQueue
+from modules.wakeup import wait_for_input
 
 
 # Authorship Info *********************************************************************************
@@ -31,33 +38,51 @@ class WemoProcess(multiprocessing.Process):
     """ WEMO gateway process class and methods """
     def __init__(self, in_queue, out_queue, log_queue, **kwargs):
         self.msg_in_queue = in_queue
-        self.msg_out_queue = out_queue        
         # Initialize logging
         worker_configurer(log_queue)
         self.logger = logging.getLogger(__name__)      
         # Set default input parameter values
         self.name = "undefined"
+        self.work_budget = 0.05
+        self.liveness = None
+        self.log_levels = {}
+        self.clock = None
+        self.peers = {}
         # Update default elements based on any parameters passed in
         if kwargs is not None:
             for key, value in kwargs.items():
                 if key == "name":
                     self.name = value
+                if key == "work_budget":
+                    self.work_budget = value
+                if key == "liveness":
+                    self.liveness = value
+                if key == "log_levels":
+                    self.log_levels = value
+                if key == "clock":
+                    self.clock = value
+                if key == "peers":
+                    self.peers = value
+        # Send messages for direct peers straight to their queues, all others through main
+        self.msg_out_queue = PeerChannels(out_queue, self.peers)
         # Initialize parent class 
         multiprocessing.Process.__init__(self, name=self.name)
         # Create remaining class elements
         self.work_queue_empty = True
-        self.work_queue = multiprocessing.Queue(-1)
+        self.liveness = self.liveness or LivenessTable()
+        self.clock = self.clock or Clock()
+        self.work_queue = WorkQueue()
+        self.work_drain = WorkDrain(budget=self.work_budget, logger=self.logger)
         self.msg_in = message.Message()
         self.msg_in_empty = True
         self.msg_to_process = message.Message()
         self.msg_to_send = message.Message()
-        self.last_hb = datetime.datetime.now()
         self.in_msg_loop = bool()
         self.main_loop = bool()
         self.device = None
         self.device_list = []
         self.index = 0
-        self.last_update = datetime.datetime.now()
+        self.last_update = self.clock.now
         self.close_pending = False    
 
 
@@ -76,18 +101,19 @@ class WemoProcess(multiprocessing.Process):
                 self.logger.debug("Processing message [%s] from incoming message queue",
                                   self.msg_in.raw)
                 if self.msg_in.dest == "16":
-                    if self.msg_in.type == "001":
-                        self.last_hb = datetime.datetime.now()
-                    elif self.msg_in.type == "999":
+                    if self.msg_in.type == "999":
                         self.logger.info("Kill code received - Shutting down")
                         self.close_pending = True
                         self.in_msg_loop = False
+                    elif self.msg_in.type == "005":
+                        apply_levels(parse_levels(self.msg_in.payload))
+                        self.logger.info("Log levels set to [%s]", self.msg_in.payload)
                     else:
-                        self.work_queue.put_nowait(self.msg_in.raw)
+                        self.work_queue.put_nowait(self.msg_in)
                         self.logger.debug("Moving message [%s] over to internal work queue",
                                           self.msg_in.raw)
                 else:
-                    self.msg_out_queue.put_nowait(self.msg_in.raw)
+                    self.msg_out_queue.put_nowait(self.msg_in.packed)
                     self.logger.debug("Redirecting message [%s] back to main", self.msg_in.raw)
                 self.msg_in = message.Message()
             else:
@@ -97,15 +123,15 @@ class WemoProcess(multiprocessing.Process):
 
 
     def process_work_queue(self):
-        """ Method to perform work from the work queue """
-        # Get next message from internal queue or timeout trying to do so
-        try:
-            self.msg_to_process = message.Message(raw=self.work_queue.get_nowait())
-        except:
-            pass
+        """ Method to drain the internal work queue, up to the per-tick time budget """
+        self.work_queue_empty = self.work_drain.drain(self.work_queue, self.process_work_msg) == 0
+
+
+    def process_work_msg(self, msg):
+        """ Method to perform the work requested by a single message from the work queue """
+        self.msg_to_process = msg
         # If there is a message to process, do so
         if len(self.msg_to_process.raw) > 4:
-            self.work_queue_empty = False
             self.logger.debug("Processing message [%s] from internal work queue",
                               self.msg_to_process.raw)
 
@@ -113,12 +139,13 @@ class WemoProcess(multiprocessing.Process):
             if self.msg_to_process.type == "160":
                 self.logger.debug("Message type 160 - attempting to discover device: %s", self.msg_to_process.payload)
                 self.device = self.discover_device(self.msg_to_process.name, self.msg_to_process.payload)
-                self.msg_to_send = message.Message(source="16", dest=self.msg_to_process.source, type="160A", name=self.msg_to_process.name)
+                self.msg_to_send = message.Message(source="16", dest=self.msg_to_process.source, type="160A", name=self.msg_to_process.name,
+                                                   corr_id=self.msg_to_process.corr_id)
                 if self.device is not None:
                     self.msg_to_send.payload = "found"
                 else:
                     self.msg_to_send.payload = "not found"
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
                 self.logger.debug("Sending discovery successful message: [%s]", self.msg_to_send.raw)
 
             # Set Wemo state
@@ -134,19 +161,18 @@ class WemoProcess(multiprocessing.Process):
 
             # Get Wemo state
             if self.msg_to_process.type == "162":
-                self.msg_162(self.msg_to_process.name, self.msg_to_process.source)
+                self.msg_162(self.msg_to_process.name, self.msg_to_process.source, self.msg_to_process.corr_id)
             
             # Clear msg-to-process string
             self.msg_to_process = message.Message()
         else:
-            self.work_queue_empty = True
             self.msg_to_process = message.Message()                
 
     
-    def msg_162(self, name, dest):
+    def msg_162(self, name, dest, corr_id=0):
         self.logger.debug("Sending \"request state\" command to device: %s", name)
         self.status = self.query_status(name)
-        self.msg_to_send = message.Message(source="16", dest=dest, type="162A", name=name)
+        self.msg_to_send = message.Message(source="16", dest=dest, type="162A", name=name, corr_id=corr_id)
         if self.status is not None:
             self.logger.debug("Get status query successfully returned value of: %s", self.status)
             self.msg_to_send.payload = self.status
@@ -154,7 +180,7 @@ class WemoProcess(multiprocessing.Process):
             self.logger.warning("Device [%s] did not respond to Get status query", name)
             self.msg_to_send.payload = ""
         # send response
-        self.msg_out_queue.put_nowait(self.msg_to_send.raw)
+        self.msg_out_queue.put_nowait(self.msg_to_send.packed)
         self.logger.debug("Sending get-status successful message: [%s]", self.msg_to_send.raw)
 
 
@@ -265,10 +291,16 @@ class WemoProcess(multiprocessing.Process):
 
     def run(self):
         """ Actual process loop.  Runs whenever start() method is called """
+        # Apply this process' log levels (in the child, so p00's own loggers are untouched)
+        apply_levels(self.log_levels)
         self.logger.info("Main loop started")
         # Main process loop
         self.main_loop = True
         while self.main_loop is True:
+            # Read the clock once for the whole pass
+            self.clock.tick()
+            # Update this process' slot in the liveness table
+            self.liveness.beat("16", self.clock.monotonic)
             # Process incoming messages
             self.process_in_msg_queue()
 
@@ -294,12 +326,21 @@ class WemoProcess(multiprocessing.Process):
             # Close process
             if self.close_pending is True:
                 self.main_loop = False
-            elif datetime.datetime.now() > self.last_hb + datetime.timedelta(seconds=30):
+            elif self.liveness.age("00", self.clock.monotonic) > COMM_TIMEOUT:
                 self.logger.critical("Comm timeout - shutting down")
                 self.main_loop = False
 
-            # Pause before next process run
-            time.sleep(0.097)
+            # Sleep until a message arrives or it is time to update the liveness table
+            if self.main_loop is True:
+                wait_for_input([self.msg_in_queue, self.work_queue], BEAT_INTERVAL)
 
+        # Report how many messages took the direct path to a peer
+        self.logger.info("Sent %d messages direct to peers and %d through main (%.2f hops/message)",
+                         self.msg_out_queue.direct_count, self.msg_out_queue.relay_count,
+                         self.msg_out_queue.hops())
+        # Report work queue drain counters
+        self.logger.info("Work queue: %s", self.work_drain.report())
+        # Mark process as stopped in the liveness table
+        self.liveness.stop("16")
         # Send final log message when process exits
         self.logger.info("Shutdown complete")
@@ -11,8 +11,15 @@ import os
 import sys
 import time
 import nest
+from modules.log_levels import apply_levels, parse_levels
 from modules.logger_mp import worker_configurer
 import modules.message as message
+from modules.router import PeerChannels
+from modules.batch import WorkDrain
+from modules.clock import Clock
+from modules.liveness import BEAT_INTERVAL, COMM_TIMEOUT, LivenessTable
+from modules.work_queue import WorkQueue
+from modules.wakeup import wait_for_input
 
 
 # Authorship Info *********************************************************************************
@@ -31,28 +38,46 @@ class NestProcess(multiprocessing.Process):
     """ Nest gateway process class and methods """
     def __init__(self, in_queue, out_queue, log_queue, **kwargs):
         self.msg_in_queue = in_queue
-        self.msg_out_queue = out_queue        
         # Initialize logging
         worker_configurer(log_queue)
         self.logger = logging.getLogger(__name__)
         # Set default input parameter values        
         self.name = "undefined"
+        self.work_budget = 0.05
+        self.liveness = None
+        self.log_levels = {}
+        self.clock = None
+        self.peers = {}
         self.logfile = "logfile"    
         # Update default elements based on any parameters passed in
         if kwargs is not None:
             for key, value in kwargs.items():
                 if key == "name":
                     self.name = value
+                if key == "work_budget":
+                    self.work_budget = value
+                if key == "liveness":
+                    self.liveness = value
+                if key == "log_levels":
+                    self.log_levels = value
+                if key == "clock":
+                    self.clock = value
+                if key == "peers":
+                    self.peers = value
+        # Send messages for direct peers straight to their queues, all others through main
+        self.msg_out_queue = PeerChannels(out_queue, self.peers)
         # Initialize parent class 
         multiprocessing.Process.__init__(self, name=self.name)
         # Create remaining class elements        
         self.username = str()
         self.password = str()
-        self.work_queue = multiprocessing.Queue(-1)
+        self.liveness = self.liveness or LivenessTable()
+        self.clock = self.clock or Clock()
+        self.work_queue = WorkQueue()
+        self.work_drain = WorkDrain(budget=self.work_budget, logger=self.logger)
         self.msg_in = message.Message()
         self.msg_to_process = message.Message()
         self.msg_to_send = message.Message()
-        self.last_hb = datetime.datetime.now()
         self.in_msg_loop = bool()
         self.main_loop = bool()
         self.close_pending = False
@@ -81,69 +106,74 @@ class NestProcess(multiprocessing.Process):
             except:
                 self.in_msg_loop = False
             if len(self.msg_in.raw) > 4:
-                self.logger.debug("Processing message [%s] from incoming message queue" % self.msg_in.raw)
+                self.logger.debug("Processing message [%s] from incoming message queue", self.msg_in.raw)
                 if self.msg_in.dest == "17":
-                    if self.msg_in.type == "001":
-                        self.last_hb = datetime.datetime.now()
-                    elif self.msg_in.type == "999":
+                    if self.msg_in.type == "999":
                         self.logger.info("Kill code received - Shutting down")
                         self.close_pending = True
                         self.in_msg_loop = False
+                    elif self.msg_in.type == "005":
+                        apply_levels(parse_levels(self.msg_in.payload))
+                        self.logger.info("Log levels set to [%s]", self.msg_in.payload)
                     else:
-                        self.work_queue.put_nowait(self.msg_in.raw)
+                        self.work_queue.put_nowait(self.msg_in)
                         self.logger.debug("Moving message [%s] over to internal work queue", self.msg_in.raw)
                 else:
-                    self.msg_out_queue.put_nowait(self.msg_in.raw)
-                    self.logger.debug("Redirecting message [%s] back to main" % self.msg_in.raw)
+                    self.msg_out_queue.put_nowait(self.msg_in.packed)
+                    self.logger.debug("Redirecting message [%s] back to main", self.msg_in.raw)
                 self.msg_in = message.Message()
             else:
                 self.in_msg_loop = False
 
     def process_work_queue(self):
-        """ Method to perform work from the work queue """
-        # Get next message from internal queue or timeout trying to do so
-        try:
-            self.msg_to_process = message.Message(raw=self.work_queue.get_nowait())
-        except:
-            pass
+        """ Method to drain the internal work queue, up to the per-tick time budget """
+        self.work_drain.drain(self.work_queue, self.process_work_msg)
+
+
+    def process_work_msg(self, msg):
+        """ Method to perform the work requested by a single message from the work queue """
+        self.msg_to_process = msg
         # If there is a message to process, do so
         if len(self.msg_to_process.raw) > 4:
-            self.logger.debug("Processing message [%s] from internal work queue" % self.msg_to_process.raw)
+            self.logger.debug("Processing message [%s] from internal work queue", self.msg_to_process.raw)
             
             if self.msg_to_process.type == "020":
                 self.logger.debug("Message type 020 [%s] received requesting current conditions")
-                self.msg_to_send = message.Message(source="17", dest=self.msg_to_process.source, type="020A")
+                self.msg_to_send = message.Message(source="17", dest=self.msg_to_process.source, type="020A",
+                                                   corr_id=self.msg_to_process.corr_id)
                 if self.connect() is True:
                     self.logger.debug("Connection to NEST device successful")
                     self.msg_to_send.payload=self.current_conditions()
                 else:
                     self.logger.debug("Error attempting to connect to NEST device")
                     self.msg_to_send.payload=""
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
-                self.logger.debug("Returning 020 ACK response [%s]" % self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
+                self.logger.debug("Returning 020 ACK response [%s]", self.msg_to_send.raw)
                    
             elif self.msg_to_process.type == "021":
                 self.logger.debug("Message type 021 [%s] received requesting current conditions")
-                self.msg_to_send = message.Message(source="17", dest=self.msg_to_process.source, type="021A")                
+                self.msg_to_send = message.Message(source="17", dest=self.msg_to_process.source, type="021A",
+                                                   corr_id=self.msg_to_process.corr_id)
                 if self.connect() is True:
                     self.logger.debug("Connection to NEST device successful")
                     self.msg_to_send.payload=self.current_forecast()
                 else:
                     self.logger.debug("Error attempting to connect to NEST device")
                     self.msg_to_send.payload=""
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
-                self.logger.debug("Returning 021 ACK response [%s]" % self.msg_to_send.raw)                                   
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
+                self.logger.debug("Returning 021 ACK response [%s]", self.msg_to_send.raw)                                   
             elif self.msg_to_process.type == "022":
                 self.logger.debug("Message type 022 [%s] received requesting current conditions")
-                self.msg_to_send = message.Message(source="17", dest=self.msg_to_process.source, type="022A")                
+                self.msg_to_send = message.Message(source="17", dest=self.msg_to_process.source, type="022A",
+                                                   corr_id=self.msg_to_process.corr_id)
                 if self.connect() is True:
                     self.logger.debug("Connection to NEST device successful")
                     self.msg_to_send.payload=self.tomorrow_forecast()
                 else:
                     self.logger.debug("Error attempting to connect to NEST device")
                     self.msg_to_send.payload=""
-                self.msg_out_queue.put_nowait(self.msg_to_send.raw)
-                self.logger.debug("Returning 022 ACK response [%s]" % self.msg_to_send.raw)
+                self.msg_out_queue.put_nowait(self.msg_to_send.packed)
+                self.logger.debug("Returning 022 ACK response [%s]", self.msg_to_send.raw)
 
             # Clear msg-to-process string
             self.msg_to_process = message.Message()
@@ -189,7 +219,7 @@ class NestProcess(multiprocessing.Process):
                 self.current_wind_dir = self.structure.weather.current.wind.direction
                 self.current_humid = str(int(self.structure.weather.current.humidity))
                 self.result = ("%s,%s,%s,%s" % (self.current_condition, self.current_temp, self.current_wind_dir, self.current_humid))
-                self.logger.debug("Data successfully obtained.  Returning [%s] to main" % self.result)
+                self.logger.debug("Data successfully obtained.  Returning [%s] to main", self.result)
                 return self.result
             except:
                 self.logger.warning("Failure reading tomorrow's forecast data from NEST device")
@@ -210,7 +240,7 @@ class NestProcess(multiprocessing.Process):
                 self.forecast_temp_high = str(int((self.forecast.temperature[1] * 1.8) + 32))
                 self.forecast_humid = str(int(self.forecast.humidity))
                 self.result = ("%s,%s,%s,%s" % (self.forecast_condition, self.forecast_temp_low, self.forecast_temp_high, self.forecast_humid))
-                self.logger.debug("Data successfully obtained.  Returning [%s] to main" % self.result)                
+                self.logger.debug("Data successfully obtained.  Returning [%s] to main", self.result)                
                 return self.result
             except:
                 self.logger.warning("Failure reading tomorrow's forecast data from NEST device")
@@ -231,7 +261,7 @@ class NestProcess(multiprocessing.Process):
                 self.forecast_temp_high = str(int((self.forecast.temperature[1] * 1.8) + 32))
                 self.forecast_humid = str(int(self.forecast.humidity))
                 self.result = ("%s,%s,%s,%s" % (self.forecast_condition, self.forecast_temp_low, self.forecast_temp_high, self.forecast_humid))
-                self.logger.debug("Data successfully obtained.  Returning [%s] to main" % self.result)                       
+                self.logger.debug("Data successfully obtained.  Returning [%s] to main", self.result)                       
                 return self.result
             except:
                 self.logger.warning("Failure reading tomorrow's forecast data from NEST device")
@@ -243,12 +273,18 @@ class NestProcess(multiprocessing.Process):
 
     def run(self):
         """ Actual process loop.  Runs whenever start() method is called """
+        # Apply this process' log levels (in the child, so p00's own loggers are untouched)
+        apply_levels(self.log_levels)
         self.logger.info("Main loop started")
         # Get credentials for login
         self.connect()
         # Main process loop
         self.main_loop = True
         while self.main_loop is True:
+            # Read the clock once for the whole pass
+            self.clock.tick()
+            # Update this process' slot in the liveness table
+            self.liveness.beat("17", self.clock.monotonic)
             # Process incoming messages
             self.process_in_msg_queue()
 
@@ -259,13 +295,22 @@ class NestProcess(multiprocessing.Process):
             # Close process
             if self.close_pending is True:
                 self.main_loop = False
-            elif datetime.datetime.now() > self.last_hb + datetime.timedelta(seconds=30):
+            elif self.liveness.age("00", self.clock.monotonic) > COMM_TIMEOUT:
                 self.logger.critical("Comm timeout - shutting down")
                 self.main_loop = False
 
-            # Pause before next process run
-            time.sleep(0.097)
+            # Sleep until a message arrives or it is time to update the liveness table
+            if self.main_loop is True:
+                wait_for_input([self.msg_in_queue, self.work_queue], BEAT_INTERVAL)
 
+        # Report how many messages took the direct path to a peer
+        self.logger.info("Sent %d messages direct to peers and %d through main (%.2f hops/message)",
+                         self.msg_out_queue.direct_count, self.msg_out_queue.relay_count,
+                         self.msg_out_queue.hops())
+        # Report work queue drain counters
+        self.logger.info("Work queue: %s", self.work_drain.report())
+        # Mark process as stopped in the liveness table
+        self.liveness.stop("17")
         # Send final log message when process exits
         self.logger.info("Shutdown complete")
         
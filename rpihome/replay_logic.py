@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+""" replay_logic.py: Replays a recorded debug log through the logic solver, without starting
+    any processes, and prints the difference between the commands it sends and the commands
+    production sent, followed by the solver's per-tick cost.
+    Usage: replay_logic.py [debug logfile] [minutes of resolution]
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ****************************************
+import logging
+import os
+import queue
+import sys
+from modules.log_events import log_events
+from modules.replay import RECEIVED, Replay, diff_commands, solver_commands, solver_inputs
+from p11_logic_solver import LogicProcess
+
+
+# Authorship Info *********************************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2016, The RPi-Home Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Main Routine ************************************************************************************
+def main():
+    """ Main function called when run """
+    process_path = os.path.dirname(os.path.abspath(sys.argv[0]))
+    debug_logfile = sys.argv[1] if len(sys.argv) > 1 else process_path + "/logs/debug.log"
+    resolution = int(sys.argv[2]) * 60 if len(sys.argv) > 2 else 60
+    # The solver sends its log records to a queue; nothing reads it here, so log to the console
+    solver = LogicProcess(queue.Queue(), queue.Queue(), queue.Queue(), name="p11_logic_solver")
+    logging.getLogger().handlers = [logging.StreamHandler()]
+    logging.getLogger().setLevel(logging.WARNING)
+    # One pass for what production sent, one for the solver's inputs
+    recorded = list(solver_commands(log_events(debug_logfile, where=RECEIVED)))
+    replay = Replay(solver)
+    commands = replay.run(solver_inputs(log_events(debug_logfile, where=RECEIVED)),
+                          end=recorded[-1].time if recorded else None)
+    for line in diff_commands(recorded, commands, resolution):
+        print(line)
+    print("Replay: %s" % replay.report())
+
+
+# Run as Script ***********************************************************************************
+if __name__ == "__main__":
+    main()
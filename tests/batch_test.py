@@ -0,0 +1,43 @@
+from unittest import TestCase
+import queue
+from rpihome.modules.batch import WorkDrain
+from rpihome.modules.clock import SimulatedClock
+
+
+class TestWorkDrain(TestCase):
+    def setUp(self):
+        self.queue = queue.Queue()
+        self.seen = []
+
+    def test_drains_burst_in_one_tick(self):
+        self.drain = WorkDrain(budget=1)
+        for i in range(12):
+            self.queue.put_nowait("16,11,160A,dev%d,found" % i)
+        self.assertEqual(self.drain.drain(self.queue, self.seen.append), 12)
+        self.assertEqual(len(self.seen), 12)
+        self.assertTrue(self.queue.empty())
+        self.assertEqual(self.drain.last_depth, 0)
+        self.assertEqual(self.drain.max_depth, 12)
+        self.assertEqual(self.drain.budget_hits, 0)
+
+    def test_stops_at_time_budget(self):
+        # Each message takes 6 ms of simulated time, so the 10 ms budget is spent by the second
+        self.clock = SimulatedClock()
+        self.drain = WorkDrain(budget=0.01, clock=self.clock)
+        for i in range(10):
+            self.queue.put_nowait(i)
+        self.assertEqual(self.drain.drain(self.queue, lambda raw: self.clock.advance(0.006)), 2)
+        self.assertEqual(self.drain.last_depth, 8)
+        self.assertEqual(self.drain.budget_hits, 1)
+        self.assertAlmostEqual(self.drain.last_drain_time, 0.012)
+        # Remaining messages are picked up on the following ticks
+        while self.drain.drain(self.queue, self.seen.append) > 0:
+            pass
+        self.assertEqual(self.seen, list(range(2, 10)))
+        self.assertEqual(self.drain.total_count, 10)
+
+    def test_empty_queue(self):
+        self.drain = WorkDrain()
+        self.assertEqual(self.drain.drain(self.queue, self.seen.append), 0)
+        self.assertEqual(self.drain.counters()["last_count"], 0)
+        self.assertEqual(self.seen, [])
@@ -0,0 +1,123 @@
+from unittest import TestCase
+import queue
+import time
+from rpihome.modules.channel import PriorityChannel
+from rpihome.modules.message import Message, peek_type
+from rpihome.modules.wakeup import wait_for_input
+
+
+class TestPriorityChannel(TestCase):
+    def setUp(self):
+        self.channel = PriorityChannel(maxsize=0)
+
+    def tearDown(self):
+        # Unread data left in a lane must not hold up interpreter exit
+        for lane in self.channel.lanes:
+            lane.cancel_join_thread()
+        self.channel.close()
+
+    def test_peek_type(self):
+        self.assertEqual(peek_type(Message(source="02", dest="11", type="999").packed), "999")
+        self.assertEqual(peek_type(Message(source="02", dest="11", type="???", name="x").packed), "???")
+        self.assertEqual(peek_type("02,11,168,,"), "168")
+
+    def test_control_overtakes_data(self):
+        self.channel.put_nowait(Message(source="17", dest="11", type="021A", payload="Sunny,41,63,30").packed)
+        self.channel.put_nowait(Message(source="00", dest="11", type="999").packed)
+        wait_for_input([self.channel.control], 5)
+        self.assertEqual(Message(raw=self.channel.get_nowait()).type, "999")
+        wait_for_input([self.channel.data], 5)
+        self.assertEqual(Message(raw=self.channel.get_nowait()).type, "021A")
+        with self.assertRaises(queue.Empty):
+            self.channel.get_nowait()
+
+    def test_kill_code_ahead_of_data_flood(self):
+        """ A kill code put behind 5000 data messages is the first message read, and the data
+        follows in order """
+        for i in range(5000):
+            self.channel.put_nowait(Message(source="16", dest="11", type="160A", name="dev%d" % i, payload="found").packed)
+        self.channel.put_nowait(Message(source="00", dest="11", type="999").packed)
+        wait_for_input([self.channel.control], 5)
+        self.assertEqual(Message(raw=self.channel.get_nowait()).type, "999")
+        self.names = []
+        for i in range(10):
+            wait_for_input([self.channel], 5)
+            self.names.append(Message(raw=self.channel.get_nowait()).name)
+        self.assertEqual(self.names, ["dev%d" % i for i in range(10)])
+
+
+class TestBoundedChannel(TestCase):
+    def setUp(self):
+        self.channel = PriorityChannel(maxsize=3, block_timeout=0.05)
+
+    def tearDown(self):
+        for lane in self.channel.lanes:
+            lane.cancel_join_thread()
+        self.channel.close()
+
+    def drain(self):
+        self.received = []
+        while True:
+            try:
+                self.received.append(Message(raw=self.channel.get_nowait()))
+            except queue.Empty:
+                if wait_for_input([self.channel], 0.2) == []:
+                    return self.received
+
+    def test_block_then_drop_newest(self):
+        for i in range(4):
+            self.channel.put_nowait(Message(source="02", dest="11", type="168", name="n%d" % i).packed)
+        self.assertEqual([msg.name for msg in self.drain()], ["n0", "n1", "n2"])
+        self.assertEqual(self.channel.counts()["overflows"], 1)
+        self.assertEqual(self.channel.counts()["dropped"], 1)
+
+    def fill_backlog(self, messages):
+        """ Puts messages and has the consumer take them into its backlog """
+        for msg in messages:
+            self.channel.put_nowait(msg.packed)
+        while len(self.channel.backlog) < len(messages):
+            wait_for_input([self.channel.data], 5)
+            self.channel.pull()
+
+    def test_drop_oldest(self):
+        self.fill_backlog([Message(source="11", dest="15", type="150", name="rpi", payload="cmd%d" % i) for i in range(3)])
+        for i in range(3, 5):
+            self.channel.put_nowait(Message(source="11", dest="15", type="150", name="rpi", payload="cmd%d" % i).packed)
+        self.assertEqual([msg.payload for msg in self.drain()], ["cmd2", "cmd3", "cmd4"])
+        self.assertEqual(self.channel.counts()["dropped"], 2)
+        self.assertEqual(self.channel.counts()["overflows"], 0)
+
+    def test_coalesce_by_type_and_name(self):
+        self.fill_backlog([Message(source="11", dest="16", type="161", name="fylt1", payload="on"),
+                           Message(source="11", dest="16", type="161", name="bylt1", payload="on"),
+                           Message(source="11", dest="16", type="161", name="fylt1", payload="off")])
+        self.channel.put_nowait(Message(source="11", dest="16", type="161", name="fylt1", payload="on").packed)
+        self.assertEqual([(msg.name, msg.payload) for msg in self.drain()], [("bylt1", "on"), ("fylt1", "on")])
+        self.assertEqual(self.channel.counts()["coalesced"], 2)
+        self.assertEqual(self.channel.counts()["dropped"], 0)
+
+    def test_correlated_messages_not_coalesced(self):
+        self.fill_backlog([Message(source="16", dest="11", type="162A", name="fylt1", payload="on", corr_id=corr_id)
+                           for corr_id in (1, 2, 3)])
+        self.channel.put_nowait(Message(source="16", dest="11", type="162A", name="fylt1", payload="on", corr_id=4).packed)
+        self.assertEqual([msg.corr_id for msg in self.drain()], [1, 2, 3, 4])
+        self.assertEqual(self.channel.counts()["coalesced"], 0)
+        self.assertEqual(self.channel.counts()["dropped"], 0)
+
+    def test_order_kept_while_coalescing(self):
+        """ Messages from different producers keep their order around a coalesced one """
+        self.fill_backlog([Message(source="11", dest="16", type="161", name="fylt1", payload="on"),
+                           Message(source="02", dest="16", type="168", name="a"),
+                           Message(source="11", dest="16", type="150", name="rpi", payload="cmd0")])
+        self.channel.put_nowait(Message(source="11", dest="16", type="161", name="fylt1", payload="off").packed)
+        self.channel.put_nowait(Message(source="02", dest="16", type="168", name="b").packed)
+        self.assertEqual([msg.name for msg in self.drain()], ["a", "rpi", "fylt1", "b"])
+        self.assertEqual(self.channel.counts()["coalesced"], 1)
+
+    def test_control_lane_is_not_bounded(self):
+        for i in range(3):
+            self.channel.put_nowait(Message(source="11", dest="16", type="168").packed)
+        self.channel.put_nowait(Message(source="00", dest="16", type="999").packed)
+        wait_for_input([self.channel.control], 5)
+        self.assertEqual(Message(raw=self.channel.get_nowait()).type, "999")
+        self.assertEqual(self.channel.counts()["overflows"], 0)
@@ -0,0 +1,27 @@
+from unittest import TestCase
+import datetime
+import time
+from rpihome.modules.clock import Clock, SimulatedClock
+
+
+class TestClock(TestCase):
+    def test_snapshot_until_tick(self):
+        clock = Clock()
+        now, monotonic = clock.now, clock.monotonic
+        time.sleep(0.01)
+        self.assertEqual((clock.now, clock.monotonic), (now, monotonic))
+        self.assertGreater(clock.tick(), now)
+        self.assertGreater(clock.monotonic, monotonic)
+        self.assertEqual(clock.tick(), clock.now)
+
+    def test_simulated(self):
+        start = datetime.datetime(2016, 11, 5, 18, 0, 0)
+        clock = SimulatedClock(start)
+        self.assertEqual((clock.now, clock.monotonic), (start, 0.0))
+        self.assertEqual(clock.advance(90), start + datetime.timedelta(seconds=90))
+        self.assertEqual(clock.monotonic, 90.0)
+        # Going back in time moves the wall clock only
+        clock.set(start)
+        self.assertEqual((clock.now, clock.monotonic), (start, 90.0))
+        clock.set(start + datetime.timedelta(hours=1))
+        self.assertEqual(clock.monotonic, 3690.0)
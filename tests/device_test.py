@@ -1,8 +1,11 @@
 from unittest import TestCase
 import datetime
 import multiprocessing
-if __name__ == "__main__": sys.path.append("..")
-from rpihome.devices.device import Device
+import os
+import sys
+# The devices import their modules relative to the rpihome folder, as when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rpihome"))
+from devices.device import Device
 from rpihome.modules.schedule import Day, Week, OnRange, Condition
 
 
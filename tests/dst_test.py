@@ -1,6 +1,7 @@
-from unittest import TestCase
+from unittest import TestCase, skipIf
 import datetime
-from rpihome.modules.dst import USdst
+import rpihome.modules.dst as dst
+from rpihome.modules.dst import USdst, ZoneOffsets
 
 
 class Test_USdst(TestCase):
@@ -74,4 +75,43 @@ class Test_USdst(TestCase):
         self.testData.append((datetime.datetime.combine(datetime.date(2018,12,1), datetime.time(1,0)), False))                                                  
 
         for index, data in enumerate(self.testData):
-            self.assertEqual(self.dst.is_active(datetime=data[0]), data[1])
\ No newline at end of file
+            self.assertEqual(self.dst.is_active(datetime=data[0]), data[1])
+
+
+@skipIf(dst.zoneinfo is None, "zoneinfo not available")
+class Test_ZoneOffsets(TestCase):
+    def setUp(self):
+        self.zone = ZoneOffsets("America/Chicago")
+
+    def test_matches_us_rules(self):
+        rules = USdst()
+        when = datetime.datetime(2016, 1, 1, 0, 15)
+        while when.year < 2019:
+            self.assertEqual(self.zone.is_active(when), rules.is_active(datetime=when), when)
+            self.assertEqual(self.zone.utc_offset(when), datetime.timedelta(hours=-5 if self.zone.is_active(when) else -6))
+            when += datetime.timedelta(minutes=30)
+        # Each year's transitions are only worked out once
+        self.assertEqual(sorted(self.zone.years), [2016, 2017, 2018])
+
+    def test_next_transition(self):
+        self.assertEqual(self.zone.next_transition(datetime.datetime(2016, 1, 1)), datetime.datetime(2016, 3, 13, 2, 0))
+        self.assertEqual(self.zone.next_transition(datetime.datetime(2016, 3, 13, 3, 0)), datetime.datetime(2016, 11, 6, 2, 0))
+        self.assertEqual(self.zone.next_transition(datetime.datetime(2016, 12, 1)), datetime.datetime(2017, 3, 12, 2, 0))
+
+    def test_other_zones(self):
+        london = ZoneOffsets("Europe/London")
+        self.assertEqual(london.utc_offset(datetime.datetime(2016, 7, 1)), datetime.timedelta(hours=1))
+        self.assertEqual(london.next_transition(datetime.datetime(2016, 7, 1)), datetime.datetime(2016, 10, 30, 2, 0))
+        tokyo = ZoneOffsets("Asia/Tokyo")
+        self.assertEqual(tokyo.utc_offset(datetime.datetime(2016, 7, 1)), datetime.timedelta(hours=9))
+        self.assertIsNone(tokyo.next_transition(datetime.datetime(2016, 7, 1)))
+
+    def test_short_stretches(self):
+        # Egypt suspended DST for Ramadan in 2010 and it returned for most of September, so the
+        # offset is the same on the first of September and of October
+        cairo = ZoneOffsets("Africa/Cairo")
+        starts = [start for start, offset, dst in cairo.transitions(2010)[0]]
+        self.assertEqual([start.date() for start in starts[1:]],
+                         [datetime.date(2010, 4, 30), datetime.date(2010, 8, 11), datetime.date(2010, 9, 10),
+                          datetime.date(2010, 10, 1)])
+        self.assertEqual(cairo.utc_offset(datetime.datetime(2010, 9, 20)), datetime.timedelta(hours=3))
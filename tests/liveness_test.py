@@ -0,0 +1,43 @@
+from unittest import TestCase
+import multiprocessing
+from rpihome.modules.liveness import COMM_TIMEOUT, RUNNING, STOPPED, LivenessTable
+
+
+def beat_in_child(table):
+    table.beat("16")
+
+
+class TestLivenessTable(TestCase):
+    def setUp(self):
+        self.table = LivenessTable()
+
+    def test_unwritten_slots_are_not_alive(self):
+        self.alive = self.table.alive()
+        self.assertEqual(sorted(self.alive), sorted(self.table.codes))
+        self.assertFalse(any(self.alive.values()))
+
+    def test_unwritten_slots_aged_from_creation(self):
+        # A process given no table by p00 must not see p00 as silent since boot
+        self.assertLess(self.table.age("00"), COMM_TIMEOUT)
+        self.assertEqual(self.table.age("00", now=self.table.created + 4.5), 4.5)
+        self.assertEqual(self.table.read(now=self.table.created + 4.5)["00"], (4.5, STOPPED))
+
+    def test_beat_and_age(self):
+        self.table.beat("11", now=100.0)
+        self.assertEqual(self.table.age("11", now=104.5), 4.5)
+        self.assertEqual(self.table.read(now=104.5)["11"], (4.5, RUNNING))
+        self.assertTrue(self.table.alive(timeout=15, now=110.0)["11"])
+        self.assertFalse(self.table.alive(timeout=15, now=116.0)["11"])
+
+    def test_stop(self):
+        self.table.beat("13")
+        self.table.stop("13")
+        self.assertEqual(self.table.read()["13"][1], STOPPED)
+        self.assertFalse(self.table.alive()["13"])
+
+    def test_slot_written_by_child_process(self):
+        self.process = multiprocessing.Process(target=beat_in_child, args=(self.table,))
+        self.process.start()
+        self.process.join(5)
+        self.assertTrue(self.table.alive()["16"])
+        self.assertFalse(self.table.alive()["17"])
@@ -0,0 +1,78 @@
+from unittest import TestCase
+import gzip
+import logging
+import os
+import tempfile
+import time
+from rpihome.modules.log_events import EventColumns, log_events, log_files, parse_events
+from rpihome.modules.message import ESCAPE, TYPE_CODES
+
+
+FORMAT = '%(processName)-16s,  %(asctime)-24s,  %(levelname)-8s, %(message)s'
+
+
+def log_line(created, process, text, *args):
+    """ Builds a line exactly as the listener's debug handler writes it """
+    record = logging.LogRecord("test.events", logging.DEBUG, __file__, 0, text, args, None)
+    record.created = created
+    record.msecs = (created - int(created)) * 1000
+    record.processName = process
+    return logging.Formatter(FORMAT).format(record)
+
+
+class TestLogEvents(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "debug.log")
+        self.start = time.mktime((2016, 11, 5, 18, 0, 0, 0, 0, -1))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_parse_line(self):
+        lines = [log_line(self.start + 61.25, "p00_main", "Transfered message [%s] to p%s queue", "11,16,161,ewlt1,1", "16"),
+                 log_line(self.start + 62.0, "p00_main", "Main loop started"),
+                 "not a log line [11,16,161,ewlt1,1]"]
+        events = list(parse_events(lines))
+        self.assertEqual(len(events), 1)
+        self.assertAlmostEqual(events[0].time, self.start + 61.25, places=3)
+        self.assertEqual(events[0].process, "p00_main")
+        self.assertEqual(events[0].level, "DEBUG")
+        self.assertEqual(events[0].msg.raw, "11,16,161,ewlt1,1")
+
+    def test_where(self):
+        lines = [log_line(self.start, "p11_logic_solver", "Processing message [%s] from incoming message queue", "16,11,160A,ewlt1,"),
+                 log_line(self.start, "p00_main", "Transfered message [%s] to p%s queue", "16,11,160A,ewlt1,", "11")]
+        events = list(parse_events(lines, where="Transfered message"))
+        self.assertEqual([event.process for event in events], ["p00_main"])
+
+    def test_rotated_and_compressed_files_in_order(self):
+        with gzip.open(self.filename + ".2016-11-05_17.gz", "wt") as f:
+            f.write(log_line(self.start - 10, "p00_main", "Transfered message [%s] to p%s queue", "11,16,161,ewlt1,0", "16") + "\n")
+        os.utime(self.filename + ".2016-11-05_17.gz", (self.start - 10, self.start - 10))
+        with open(self.filename + ".2016-11-05_17.1", "w") as f:
+            f.write(log_line(self.start - 5, "p00_main", "Transfered message [%s] to p%s queue", "11,16,161,ewlt1,1", "16") + "\n")
+        os.utime(self.filename + ".2016-11-05_17.1", (self.start - 5, self.start - 5))
+        with open(self.filename, "w") as f:
+            f.write(log_line(self.start, "p00_main", "Transfered message [%s] to p%s queue", "11,16,161,ewlt1,0", "16") + "\n")
+        self.assertEqual(len(log_files(self.filename)), 3)
+        events = list(log_events(self.filename))
+        self.assertEqual([event.msg.payload for event in events], ["0", "1", "0"])
+        self.assertEqual([event.time for event in events], sorted(event.time for event in events))
+
+    def test_columns(self):
+        lines = [log_line(self.start + i, "p00_main", "Transfered message [%s] to p%s queue",
+                          "11,16,161,ewlt%d,%d" % (i % 3, i % 2), "16") for i in range(30)]
+        lines.append(log_line(self.start + 30, "p00_main", "Transfered message [%s] to p%s queue", "11,16,777,ewlt1,", "16"))
+        columns = EventColumns().extend(parse_events(lines))
+        self.assertEqual(len(columns), 31)
+        self.assertEqual(columns.names, ["ewlt0", "ewlt1", "ewlt2"])
+        self.assertEqual(columns.payloads, ["0", "1", ""])
+        self.assertEqual(TYPE_CODES[columns.type[0]], "161")
+        self.assertEqual(columns.type[30], ESCAPE)
+        self.assertEqual(list(columns.name[:4]), [0, 1, 2, 0])
+        self.assertAlmostEqual(columns.time[29] - columns.time[0], 29.0)
+        # Per-event storage is a handful of bytes
+        self.assertEqual(columns.time.itemsize + columns.source.itemsize + columns.dest.itemsize +
+                         columns.type.itemsize + columns.name.itemsize + columns.payload.itemsize +
+                         columns.process.itemsize, 18)
@@ -0,0 +1,124 @@
+from unittest import TestCase
+import json
+import logging
+import os
+import tempfile
+from rpihome.modules.log_json import (INDEX_ENTRY, JsonFormatter, JsonLinesHandler, find_offset,
+                                      index_filename, read_range)
+
+
+class TestJsonLines(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "messages.jsonl")
+        self.handler = JsonLinesHandler(self.filename, backupCount=2, index_interval=10.0)
+        self.logger = logging.getLogger("test.json")
+
+    def tearDown(self):
+        self.handler.close()
+        self.dir.cleanup()
+
+    def emit(self, created, text, *args):
+        record = self.logger.makeRecord("test.json", logging.DEBUG, __file__, 0, text, args, None)
+        record.created = created
+        self.handler.handle(record)
+
+    def test_message_fields(self):
+        record = self.logger.makeRecord("test.json", logging.DEBUG, __file__, 0,
+                                        "Transfered message [%s] to p16 queue", ("11,16,161,ewlt1,1",), None)
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual((entry["source"], entry["dest"], entry["type"], entry["name"], entry["payload"]),
+                         ("11", "16", "161", "ewlt1", "1"))
+        self.assertEqual(entry["message"], "Transfered message [11,16,161,ewlt1,1] to p16 queue")
+        record = self.logger.makeRecord("test.json", logging.INFO, __file__, 0, "Main loop started", (), None)
+        self.assertNotIn("type", json.loads(JsonFormatter().format(record)))
+
+    def test_index_every_interval(self):
+        for i in range(100):
+            self.emit(1000.0 + i, "Processing message [%s]", "11,16,161,ewlt1,%d" % (i % 2))
+        self.handler.flush()
+        with open(index_filename(self.filename), "rb") as f:
+            entries = list(INDEX_ENTRY.iter_unpack(f.read()))
+        self.assertEqual([created for created, offset in entries], [1000.0 + i for i in range(0, 100, 10)])
+        # Each offset points at the start of the record logged at that time
+        with open(self.filename, "rb") as f:
+            for created, offset in entries:
+                f.seek(offset)
+                self.assertEqual(json.loads(f.readline().decode("utf-8"))["time"], created)
+
+    def test_read_range(self):
+        for i in range(100):
+            self.emit(1000.0 + i, "Processing message [%s]", "11,16,161,ewlt%d,1" % (i % 2))
+        self.handler.flush()
+        self.assertGreater(find_offset(self.filename, 1050.0), 0)
+        entries = list(read_range(self.filename, 1050.0, 1059.0, name="ewlt1"))
+        self.assertEqual([entry["time"] for entry in entries], [1051.0, 1053.0, 1055.0, 1057.0, 1059.0])
+        self.assertEqual(len(list(read_range(self.filename))), 100)
+
+    def test_rotation_moves_index(self):
+        self.emit(1000.0, "before [11,16,161,ewlt1,1]")
+        self.handler.doRollover()
+        self.emit(2000.0, "after [11,16,161,ewlt1,0]")
+        self.handler.flush()
+        self.handler.work.join()
+        rotated = [name for name in os.listdir(self.dir.name)
+                   if name.startswith("messages.jsonl.") and not name.endswith(".idx")]
+        self.assertEqual(len(rotated), 1)
+        self.assertTrue(os.path.exists(index_filename(os.path.join(self.dir.name, rotated[0]))))
+        self.assertEqual([entry["payload"] for entry in read_range(self.filename, 1500.0)], ["0"])
+
+    def test_rollover_checked_once_per_record(self):
+        self.checks = []
+        should_rollover = self.handler.shouldRollover
+        self.handler.shouldRollover = lambda record: self.checks.append(record) or should_rollover(record)
+        for i in range(5):
+            self.emit(1000.0 + i, "Processing message [11,16,161,ewlt1,1]")
+        self.assertEqual(len(self.checks), 5)
+
+    def test_size_rollover_indexes_new_file(self):
+        self.handler.max_bytes = 1000
+        for i in range(30):
+            self.emit(1000.0 + i, "Processing message [%s]", "11,16,161,ewlt1,%d" % i)
+        self.handler.flush()
+        self.handler.work.join()
+        # The live file's index starts with its first record, at offset 0
+        with open(self.filename, "rb") as f:
+            first = json.loads(f.readline().decode("utf-8"))["time"]
+        with open(index_filename(self.filename), "rb") as f:
+            self.assertEqual(INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size)), (first, 0))
+
+    def test_byte_cap_counts_index(self):
+        self.handler.backupCount = 0
+        for hour, name in enumerate(("messages.jsonl.2016-01-01_01.gz", "messages.jsonl.2016-01-01_02.gz")):
+            with open(os.path.join(self.dir.name, name), "wb") as f:
+                f.write(b"x" * 100)
+            with open(os.path.join(self.dir.name, index_filename(name)), "wb") as f:
+                f.write(b"x" * 100)
+            for filename in (name, index_filename(name)):
+                os.utime(os.path.join(self.dir.name, filename), (hour * 3600, hour * 3600))
+        # The logs alone fit under the cap, the logs and their indexes don't
+        self.handler.max_total_bytes = 300
+        deleted = [os.path.basename(name) for name in self.handler.prune()]
+        self.assertEqual(deleted, ["messages.jsonl.2016-01-01_01.gz"])
+
+    def test_old_files_deleted_with_index(self):
+        for hour, name in enumerate(("messages.jsonl.2016-01-01_01.gz", "messages.jsonl.2016-01-01_02.gz",
+                                     "messages.jsonl.2016-01-01_03")):
+            for filename in (name, index_filename(name)):
+                open(os.path.join(self.dir.name, filename), "w").close()
+                os.utime(os.path.join(self.dir.name, filename), (hour * 3600, hour * 3600))
+        deleted = [os.path.basename(name) for name in self.handler.prune()]
+        self.assertEqual(deleted, ["messages.jsonl.2016-01-01_01.gz"])
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, "messages.jsonl.2016-01-01_01.idx")))
+        self.assertTrue(os.path.exists(os.path.join(self.dir.name, "messages.jsonl.2016-01-01_02.idx")))
+
+    def test_read_compressed(self):
+        for i in range(100):
+            self.emit(1000.0 + i, "Processing message [%s]", "11,16,161,ewlt%d,1" % (i % 2))
+        self.handler.doRollover()
+        self.handler.work.join()
+        rotated = [os.path.join(self.dir.name, name) for name in os.listdir(self.dir.name) if name.endswith(".gz")]
+        self.assertEqual(len(rotated), 1)
+        self.assertGreater(find_offset(rotated[0], 1050.0), 0)
+        entries = list(read_range(rotated[0], 1050.0, 1059.0, name="ewlt1"))
+        self.assertEqual([entry["time"] for entry in entries], [1051.0, 1053.0, 1055.0, 1057.0, 1059.0])
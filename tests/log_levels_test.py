@@ -0,0 +1,53 @@
+from unittest import TestCase
+import logging
+import logging.handlers
+import queue
+from rpihome.modules.log_levels import LogLevelMap, apply_levels, format_levels, parse_levels
+from rpihome.modules.message import Message
+
+
+class TestLogLevels(TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.saved_handlers = self.root.handlers[:]
+        self.saved_level = self.root.level
+        self.queue = queue.Queue()
+        self.root.handlers = [logging.handlers.QueueHandler(self.queue)]
+        self.root.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        self.root.handlers = self.saved_handlers
+        self.root.setLevel(self.saved_level)
+        logging.getLogger("test.p16").setLevel(logging.NOTSET)
+
+    def test_parse_levels(self):
+        self.assertEqual(parse_levels("root=INFO;test.p16=debug"), {"root": "INFO", "test.p16": "DEBUG"})
+        self.assertEqual(parse_levels("=WARNING"), {"root": "WARNING"})
+        self.assertEqual(parse_levels("root=LOUD;test.p16"), {})
+        self.assertEqual(parse_levels(""), {})
+
+    def test_format_round_trip(self):
+        levels = {"root": "INFO", "test.p16": "DEBUG"}
+        self.assertEqual(parse_levels(format_levels(levels)), levels)
+
+    def test_filtered_before_enqueue(self):
+        apply_levels({"root": "INFO"})
+        logging.getLogger("test.p11").debug("dropped")
+        logging.getLogger("test.p11").info("kept")
+        self.assertEqual(self.queue.qsize(), 1)
+        self.assertEqual(self.queue.get_nowait().getMessage(), "kept")
+
+    def test_debug_for_one_logger(self):
+        apply_levels(parse_levels("root=INFO;test.p16=DEBUG"))
+        logging.getLogger("test.p16.device").debug("kept")
+        logging.getLogger("test.p11").debug("dropped")
+        self.assertEqual(self.queue.qsize(), 1)
+        self.assertEqual(self.queue.get_nowait().name, "test.p16.device")
+
+    def test_map_records_routed_messages(self):
+        levels = LogLevelMap(default="INFO")
+        self.assertEqual(levels.levels("16"), {"root": "INFO"})
+        levels.record(Message(source="02", dest="16", type="005", payload="root=DEBUG"))
+        levels.record(Message(source="02", dest="16", type="005", payload="p16_wemo_gateway=WARNING"))
+        self.assertEqual(levels.levels("16"), {"root": "DEBUG", "p16_wemo_gateway": "WARNING"})
+        self.assertEqual(levels.levels("11"), {"root": "INFO"})
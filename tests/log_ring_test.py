@@ -0,0 +1,62 @@
+from unittest import TestCase
+import logging
+import multiprocessing
+from rpihome.modules.log_ring import LogRing, LogRingHandler
+
+
+def write_lines(ring, count):
+    for i in range(count):
+        ring.write("child line %d" % i)
+
+
+class TestLogRing(TestCase):
+    def setUp(self):
+        self.ring = LogRing(slots=8, width=32)
+
+    def test_reads_only_new_lines(self):
+        self.ring.write("line 0")
+        self.ring.write("line 1")
+        seq, lines = self.ring.read_since(0)
+        self.assertEqual((seq, lines), (2, ["line 0", "line 1"]))
+        self.ring.write("line 2")
+        seq, lines = self.ring.read_since(seq)
+        self.assertEqual((seq, lines), (3, ["line 2"]))
+        self.assertEqual(self.ring.read_since(seq), (3, []))
+
+    def test_overwritten_lines_skipped(self):
+        for i in range(20):
+            self.ring.write("line %d" % i)
+        seq, lines = self.ring.read_since(3)
+        self.assertEqual(seq, 20)
+        self.assertEqual(lines, ["line %d" % i for i in range(12, 20)])
+
+    def test_long_lines_truncated(self):
+        self.ring.write("x" * 100)
+        self.ring.write("é" * 20)
+        seq, lines = self.ring.read_since(0)
+        self.assertEqual(lines[0], "x" * 32)
+        self.assertEqual(lines[1], "é" * 16)
+
+    def test_sequence_ahead_of_ring(self):
+        self.ring.write("line 0")
+        self.assertEqual(self.ring.read_since(50), (1, ["line 0"]))
+
+    def test_shared_with_child_process(self):
+        process = multiprocessing.Process(target=write_lines, args=(self.ring, 5))
+        process.start()
+        process.join()
+        seq, lines = self.ring.read_since(0)
+        self.assertEqual(seq, 5)
+        self.assertEqual(lines[-1], "child line 4")
+
+    def test_handler(self):
+        logger = logging.getLogger("test.ring")
+        logger.propagate = False
+        handler = LogRingHandler(self.ring)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        logger.addHandler(handler)
+        try:
+            logger.warning("door open")
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(self.ring.read_since(0), (1, ["WARNING door open"]))
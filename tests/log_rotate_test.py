@@ -0,0 +1,91 @@
+from unittest import TestCase
+import gzip
+import logging
+import os
+import tempfile
+from rpihome.modules.log_rotate import CompressingRotatingHandler, compress, open_log
+from rpihome.modules.log_tail import LogTailer
+
+
+class TestCompressingRotatingHandler(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "debug.log")
+        self.logger = logging.getLogger("test.rotate")
+        self.logger.propagate = False
+        self.handler = None
+
+    def tearDown(self):
+        if self.handler is not None:
+            self.logger.removeHandler(self.handler)
+            self.handler.close()
+        self.dir.cleanup()
+
+    def attach(self, **kwargs):
+        self.handler = CompressingRotatingHandler(self.filename, **kwargs)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger.addHandler(self.handler)
+
+    def rotated(self):
+        return sorted(name for name in os.listdir(self.dir.name) if name != "debug.log")
+
+    def log_lines(self, count, start=0):
+        for i in range(start, start + count):
+            self.logger.warning("line %04d %s", i, "x" * 90)
+            self.handler.flush()
+
+    def test_rotates_by_size_and_compresses(self):
+        self.attach(max_bytes=2000, max_total_bytes=0)
+        self.log_lines(60)
+        self.handler.work.join()
+        rotated = self.rotated()
+        self.assertEqual(len(rotated), 2)
+        self.assertTrue(all(name.endswith(".gz") for name in rotated))
+        # Rotations within the same hour get their own names
+        self.assertEqual(rotated[1][:-3] + ".1.gz", rotated[0])
+        lines = []
+        for name in self.handler.rotated_files() + [self.filename]:
+            with open_log(name) as f:
+                lines.extend(line.decode("utf-8").split()[1] for line in f)
+        self.assertEqual(lines, ["%04d" % i for i in range(60)])
+
+    def test_byte_cap(self):
+        self.attach(backupCount=0, max_bytes=1000, max_total_bytes=3000)
+        self.log_lines(400)
+        self.handler.work.join()
+        # The live file keeps growing after the last prune, so only the rotated files are checked
+        total = sum(os.path.getsize(os.path.join(self.dir.name, name)) for name in self.rotated())
+        self.assertLessEqual(total, 3000)
+        self.assertGreater(len(self.rotated()), 1)
+        self.assertLess(len(self.rotated()), 30)
+
+    def test_backup_count(self):
+        self.attach(backupCount=3, max_bytes=1000, max_total_bytes=0)
+        self.log_lines(200)
+        self.handler.work.join()
+        self.assertEqual(len(self.rotated()), 3)
+
+    def test_compress_keeps_mtime(self):
+        name = os.path.join(self.dir.name, "debug.log.2016-01-01_01")
+        with open(name, "w") as f:
+            f.write("hello\n")
+        os.utime(name, (3600, 3600))
+        target = compress(name)
+        self.assertFalse(os.path.exists(name))
+        self.assertEqual(os.path.getmtime(target), 3600)
+        with gzip.open(target, "rt") as f:
+            self.assertEqual(f.read(), "hello\n")
+
+    def test_tailer_follows_rotation(self):
+        self.attach(max_bytes=2000, max_total_bytes=0)
+        tailer = LogTailer(self.filename)
+        self.log_lines(15)
+        self.assertEqual(len(tailer.read_lines()), 15)
+        # Read between rotations, as the gui does on every tick
+        lines = []
+        for start in range(15, 45, 5):
+            self.log_lines(5, start=start)
+            lines.extend(tailer.read_lines())
+        self.handler.work.join()
+        tailer.close()
+        self.assertEqual([line.split()[1] for line in lines], ["%04d" % i for i in range(15, 45)])
@@ -0,0 +1,86 @@
+from unittest import TestCase
+import logging
+import logging.handlers
+import os
+import tempfile
+from rpihome.modules.log_tail import LogTailer
+
+
+class TestLogTailer(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "debug.log")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def append(self, text):
+        with open(self.filename, "a") as f:
+            f.write(text)
+
+    def test_backlog_then_new_lines(self):
+        self.append("".join("line %d\n" % i for i in range(100)))
+        tailer = LogTailer(self.filename, backlog=3)
+        self.assertEqual(tailer.read_lines(), ["line 97", "line 98", "line 99"])
+        self.assertEqual(tailer.read_lines(), [])
+        self.append("line 100\n")
+        self.assertEqual(tailer.read_lines(), ["line 100"])
+        tailer.close()
+
+    def test_partial_line_held_back(self):
+        tailer = LogTailer(self.filename)
+        self.append("first\nsec")
+        self.assertEqual(tailer.read_lines(), ["first"])
+        self.append("ond\n")
+        self.assertEqual(tailer.read_lines(), ["second"])
+        tailer.close()
+
+    def test_missing_file(self):
+        tailer = LogTailer(self.filename, backlog=10)
+        self.assertEqual(tailer.read_lines(), [])
+        self.append("created\n")
+        self.assertEqual(tailer.read_lines(), ["created"])
+        tailer.close()
+
+    def test_rotation(self):
+        self.append("old 1\n")
+        tailer = LogTailer(self.filename)
+        self.append("old 2\nold 3")
+        os.rename(self.filename, self.filename + ".1")
+        self.append("new 1\n")
+        self.assertEqual(tailer.read_lines(), ["old 2", "old 3", "new 1"])
+        self.assertEqual(tailer.rotations, 1)
+        tailer.close()
+
+    def test_truncation(self):
+        self.append("a long line before truncation\n")
+        tailer = LogTailer(self.filename)
+        with open(self.filename, "w") as f:
+            f.write("short\n")
+        self.assertEqual(tailer.read_lines(), ["short"])
+        tailer.close()
+
+    def test_rotating_handler(self):
+        handler = logging.handlers.TimedRotatingFileHandler(self.filename, when="h", backupCount=2)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("test.tail")
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            tailer = LogTailer(self.filename)
+            logger.warning("before rollover")
+            handler.doRollover()
+            logger.warning("after rollover")
+            self.assertEqual(tailer.read_lines(), ["before rollover", "after rollover"])
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+            tailer.close()
+
+    def test_read_cost_independent_of_size(self):
+        self.append(("y" * 79 + "\n") * 50000)
+        tailer = LogTailer(self.filename)
+        self.append("tick\n")
+        self.assertEqual(tailer.read_lines(), ["tick"])
+        self.assertEqual(tailer.offset, os.path.getsize(self.filename))
+        tailer.close()
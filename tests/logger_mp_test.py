@@ -0,0 +1,112 @@
+from unittest import TestCase
+import logging
+import os
+import queue
+import tempfile
+from rpihome.modules.batch import WorkDrain
+from rpihome.modules.logger_mp import DedupFilter, flush_handlers, handle_record, listener_configurer
+
+
+class TestBufferedListener(TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.saved_handlers = self.root.handlers[:]
+        self.saved_level = self.root.level
+        self.root.setLevel(logging.DEBUG)
+        self.dir = tempfile.TemporaryDirectory()
+        self.debug_file = os.path.join(self.dir.name, "debug.log")
+        self.info_file = os.path.join(self.dir.name, "info.log")
+        self.handlers = listener_configurer(self.debug_file, self.info_file, capacity=50)
+        # Keep the console quiet while testing
+        self.handlers[2].setTarget(logging.NullHandler())
+        self.logger = logging.getLogger("test.p11")
+        self.logger.propagate = True
+
+    def tearDown(self):
+        for handler in self.root.handlers:
+            handler.close()
+            if handler.target is not None:
+                handler.target.close()
+        self.root.handlers = self.saved_handlers
+        self.root.setLevel(self.saved_level)
+        self.dir.cleanup()
+
+    def record(self, i, level=logging.DEBUG):
+        return self.logger.makeRecord("test.p11", level, __file__, 0, "record %d", (i,), None)
+
+    def lines(self, filename):
+        with open(filename) as f:
+            return f.readlines()
+
+    def test_writes_held_until_flush(self):
+        for i in range(10):
+            handle_record(self.record(i))
+        self.assertEqual(self.lines(self.debug_file), [])
+        flush_handlers(self.handlers)
+        self.assertEqual(len(self.lines(self.debug_file)), 10)
+        self.assertEqual(self.lines(self.info_file), [])
+
+    def test_full_buffer_flushes_itself(self):
+        for i in range(50):
+            handle_record(self.record(i))
+        self.assertEqual(len(self.lines(self.debug_file)), 50)
+
+    def test_error_flushes_immediately(self):
+        handle_record(self.record(0))
+        handle_record(self.record(1, logging.ERROR))
+        self.assertEqual(len(self.lines(self.debug_file)), 2)
+        self.assertEqual(len(self.lines(self.info_file)), 1)
+
+    def test_batch_drain(self):
+        log_queue = queue.Queue()
+        for i in range(120):
+            log_queue.put_nowait(self.record(i))
+        log_queue.put_nowait(None)
+        drain = WorkDrain(budget=1)
+        self.assertEqual(drain.drain(log_queue, handle_record), 121)
+        flush_handlers(self.handlers)
+        lines = self.lines(self.debug_file)
+        self.assertEqual(len(lines), 120)
+        self.assertTrue(lines[-1].rstrip().endswith("record 119"))
+
+
+class TestDedupFilter(TestCase):
+    def setUp(self):
+        self.filter = DedupFilter(window=1.0, windows={"p16": 0.0, "p11.devices": 5.0})
+
+    def record(self, name, created, text="Processing message [%s] from incoming message queue",
+               raw="11,16,161,ewlt1,1", level=logging.DEBUG):
+        record = logging.getLogger(name).makeRecord(name, level, __file__, 0, text, (raw,), None)
+        record.created = created
+        return record
+
+    def test_collapses_repeats_within_window(self):
+        passed = [record for record in (self.record("p11", 100.0 + i * 0.001) for i in range(1000))
+                  if self.filter.filter(record)]
+        self.assertEqual(len(passed), 1)
+        self.assertEqual(self.filter.suppressed, 999)
+        # The next occurrence after the window carries the repeat count
+        record = self.record("p11", 101.5)
+        self.assertTrue(self.filter.filter(record))
+        self.assertEqual(record.getMessage(),
+                         "Processing message [11,16,161,ewlt1,1] from incoming message queue"
+                         " [+999 similar in the previous 1.0s]")
+
+    def test_templates_and_loggers_kept_apart(self):
+        self.assertTrue(self.filter.filter(self.record("p11", 100.0)))
+        self.assertTrue(self.filter.filter(self.record("p13", 100.0)))
+        self.assertTrue(self.filter.filter(self.record("p11", 100.0, text="Redirecting message [%s] back to main")))
+        self.assertFalse(self.filter.filter(self.record("p11", 100.1, raw="11,17,020,,")))
+
+    def test_per_logger_windows(self):
+        # Turned off for p16 and its children
+        self.assertTrue(self.filter.filter(self.record("p16.devices", 100.0)))
+        self.assertTrue(self.filter.filter(self.record("p16.devices", 100.1)))
+        # Longer window for p11.devices and its children
+        self.assertTrue(self.filter.filter(self.record("p11.devices.wemo", 100.0)))
+        self.assertFalse(self.filter.filter(self.record("p11.devices.wemo", 103.0)))
+        self.assertTrue(self.filter.filter(self.record("p11.devices.wemo", 105.0)))
+
+    def test_info_and_above_always_pass(self):
+        for i in range(3):
+            self.assertTrue(self.filter.filter(self.record("p11", 100.0, level=logging.INFO)))
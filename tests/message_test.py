@@ -0,0 +1,83 @@
+from unittest import TestCase
+from rpihome.modules.message import TYPE_CODES, Message, peek_dest
+
+
+class TestMessageCodec(TestCase):
+    def setUp(self):
+        self.message = Message(source="17", dest="11", type="021A", name="", payload="Sunny,41,63,30")
+
+    def test_packed_round_trip(self):
+        self.copy = Message(raw=self.message.packed)
+        self.assertEqual(self.copy.source, "17")
+        self.assertEqual(self.copy.dest, "11")
+        self.assertEqual(self.copy.type, "021A")
+        self.assertEqual(self.copy.name, "")
+        self.assertEqual(self.copy.payload, "Sunny,41,63,30")
+
+    def test_packed_payload_with_commas_in_name(self):
+        self.message.name = "a,b"
+        self.copy = Message(raw=self.message.packed)
+        self.assertEqual(self.copy.name, "a,b")
+        self.assertEqual(self.copy.payload, "Sunny,41,63,30")
+
+    def test_packed_unknown_type(self):
+        self.message.type = "???"
+        self.copy = Message(raw=self.message.packed)
+        self.assertEqual(self.copy.type, "???")
+        self.assertEqual(self.copy.payload, "Sunny,41,63,30")
+
+    def test_packed_is_compact(self):
+        self.assertLess(len(self.message.packed), len(self.message.raw.encode("utf-8")))
+
+    def test_raw_still_available(self):
+        self.assertEqual(self.message.raw, "17,11,021A,,Sunny,41,63,30")
+        self.copy = Message(raw="02,11,103,fylt1,")
+        self.assertEqual(self.copy.source, "02")
+        self.assertEqual(self.copy.dest, "11")
+        self.assertEqual(self.copy.type, "103")
+        self.assertEqual(self.copy.name, "fylt1")
+        self.assertEqual(self.copy.payload, "")
+
+    def test_empty_message(self):
+        self.copy = Message(raw=Message().packed)
+        self.assertEqual(self.copy.raw, ",,,,")
+
+    def test_peek_dest(self):
+        self.assertEqual(peek_dest(self.message.packed), "11")
+        self.assertEqual(peek_dest(self.message.raw), "11")
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            self.message.device = "fylt1"
+
+    def test_round_trip_both_wire_forms(self):
+        """ Every field survives construct + serialize + parse in both wire forms """
+        for fields in (("11", "16", "161", "fylt1", "on"), ("17", "11", "021A", "", "Sunny,41,63,30"),
+                       ("02", "11", "999", "", ""), ("11", "16", "???", "custom", "x")):
+            self.original = Message(source=fields[0], dest=fields[1], type=fields[2], name=fields[3], payload=fields[4])
+            for data in (self.original.packed, self.original.raw):
+                self.copy = Message(raw=data)
+                self.assertEqual((self.copy.source, self.copy.dest, self.copy.type, self.copy.name, self.copy.payload),
+                                 fields)
+
+    def test_packed_correlation_id(self):
+        self.message.corr_id = 513
+        self.copy = Message(raw=self.message.packed)
+        self.assertEqual(self.copy.corr_id, 513)
+        self.assertEqual(Message(raw=self.message.raw).corr_id, 0)
+
+    def test_type_codes_keep_their_index(self):
+        # Logged and queued messages carry the index, so codes only ever go on the end
+        self.assertEqual(TYPE_CODES.index("003"), 3)
+        self.assertEqual(TYPE_CODES.index("020"), 4)
+        self.assertEqual(TYPE_CODES.index("999"), 20)
+        self.assertEqual(TYPE_CODES.index("004"), 21)
+        self.assertEqual(TYPE_CODES.index("005"), 22)
+
+    def test_packed_limits(self):
+        for fields in (dict(source="x1"), dict(dest="1"), dict(name="n" * 256), dict(payload="p" * 65536),
+                       dict(corr_id=65536), dict(type="t" * 256)):
+            with self.assertRaises(ValueError):
+                Message(**dict(dict(source="11", dest="16", type="161"), **fields)).packed
+        self.assertEqual(Message(raw=Message(source="11", dest="16", name="n" * 255, payload="p" * 65535,
+                                             corr_id=65535).packed).corr_id, 65535)
@@ -0,0 +1,63 @@
+from unittest import TestCase
+import queue
+from rpihome.modules.message import Message
+from rpihome.modules.pending import PendingRequests
+
+
+class TestPendingRequests(TestCase):
+    def setUp(self):
+        self.out_queue = queue.Queue()
+        self.requests = PendingRequests(self.out_queue, timeout=5)
+
+    def reply_to(self, data, type, payload=""):
+        self.request = Message(raw=data)
+        return Message(source=self.request.dest, dest=self.request.source, type=type,
+                       name=self.request.name, payload=payload, corr_id=self.request.corr_id)
+
+    def test_several_requests_to_one_device(self):
+        self.first = self.requests.send(Message(source="02", dest="16", type="162", name="fylt1"), now=0.0)
+        self.second = self.requests.send(Message(source="02", dest="16", type="162", name="fylt1"), now=1.0)
+        self.assertNotEqual(self.first.msg.corr_id, self.second.msg.corr_id)
+        self.reply1 = self.reply_to(self.out_queue.get_nowait(), "162A", "0")
+        self.reply2 = self.reply_to(self.out_queue.get_nowait(), "162A", "1")
+        # Replies may come back in any order
+        self.assertIs(self.requests.resolve(self.reply2, now=1.5), self.second)
+        self.assertIs(self.requests.resolve(self.reply1, now=2.0), self.first)
+        self.assertEqual(self.first.reply.payload, "0")
+        self.assertEqual(self.second.reply.payload, "1")
+        self.assertEqual(self.first.latency, 2.0)
+        self.assertEqual(self.second.latency, 0.5)
+        self.assertEqual(self.requests.latency()["162"], (2, 1.25, 2.0, 0))
+
+    def test_passthrough_and_tracking(self):
+        self.requests.put_nowait(Message(source="11", dest="16", type="161", name="fylt1", payload="on").packed)
+        self.requests.put_nowait(Message(source="11", dest="16", type="160", name="fylt1", payload="192.168.86.21").packed)
+        self.assertEqual(Message(raw=self.out_queue.get_nowait()).corr_id, 0)
+        self.assertNotEqual(Message(raw=self.out_queue.get_nowait()).corr_id, 0)
+        self.assertEqual(len(self.requests.requests), 1)
+
+    def test_unmatched_replies_are_ignored(self):
+        self.request = self.requests.send(Message(source="11", dest="17", type="020"))
+        self.assertIsNone(self.requests.resolve(Message(source="17", dest="11", type="020A")))
+        self.assertIsNone(self.requests.resolve(Message(source="17", dest="11", type="021A", corr_id=self.request.msg.corr_id)))
+        self.assertFalse(self.request.done)
+
+    def test_deadline(self):
+        self.seen = []
+        self.request = self.requests.send(Message(source="11", dest="16", type="160", name="fylt1"),
+                                          callback=self.seen.append, timeout=2, now=10.0)
+        self.assertEqual(self.requests.seconds_to_deadline(now=11.0), 1.0)
+        self.assertEqual(self.requests.expire(now=11.0), [])
+        self.assertEqual(self.requests.expire(now=12.0), [self.request])
+        self.assertTrue(self.request.timed_out)
+        self.assertEqual(self.seen, [self.request])
+        self.assertEqual(self.requests.seconds_to_deadline(default=5), 5)
+        # A late reply no longer matches anything
+        self.assertIsNone(self.requests.resolve(self.reply_to(self.request.msg.packed, "160A", "found")))
+        self.assertEqual(self.requests.latency()["160"][3], 1)
+
+    def test_unpackable_request_dropped(self):
+        with self.assertLogs("rpihome.modules.pending", "WARNING"):
+            self.assertIsNone(self.requests.send(Message(source="11", dest="16", type="160", name="n" * 256)))
+        self.assertTrue(self.out_queue.empty())
+        self.assertEqual(self.requests.requests, {})
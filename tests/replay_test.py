@@ -0,0 +1,78 @@
+from unittest import TestCase
+import datetime
+import logging
+import os
+import queue
+import sys
+import time
+from rpihome.modules.log_events import LogEvent, parse_events
+from rpihome.modules.message import Message
+from rpihome.modules.replay import (RECEIVED, Command, Replay, diff_commands, format_commands,
+                                    solver_commands, solver_inputs)
+# The solver process imports its modules relative to the rpihome folder, as when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rpihome"))
+from p11_logic_solver import LogicProcess
+
+
+def event(when, raw):
+    return LogEvent(time.mktime(when.timetuple()), "p11_logic_solver", "DEBUG", Message(raw=raw))
+
+
+class TestReplay(TestCase):
+    def setUp(self):
+        # The solver points the root logger at its log queue; put it back afterwards
+        root = logging.getLogger()
+        self.root_handlers, self.root_level = root.handlers, root.level
+        # Saturday evening, after sunset
+        self.start = datetime.datetime(2016, 11, 5, 18, 0, 0)
+
+    def tearDown(self):
+        root = logging.getLogger()
+        root.handlers, root.level = self.root_handlers, self.root_level
+
+    def replay(self, events, end):
+        replay = Replay(LogicProcess(queue.Queue(), queue.Queue(), queue.Queue()))
+        commands = replay.run(events, end=time.mktime(end.timetuple()))
+        return replay, commands
+
+    def screen(self, commands):
+        return [(datetime.datetime.fromtimestamp(command.time), command.msg.payload[-5:])
+                for command in commands if command.msg.type == "150"]
+
+    def test_home_away_drives_screen(self):
+        events = [event(self.start, "13,11,100,user1,1"),
+                  event(self.start + datetime.timedelta(hours=1), "13,11,100,user1,0")]
+        replay, commands = self.replay(events, self.start + datetime.timedelta(hours=2))
+        # The screen wakes on the first tick after user1 gets home and sleeps when they leave
+        self.assertEqual(self.screen(commands)[1:],
+                         [(self.start + datetime.timedelta(seconds=1), "reset"),
+                          (self.start + datetime.timedelta(hours=1, seconds=1), "ivate")])
+        self.assertEqual(replay.ticks, 2 * 3600 + 1)
+        self.assertEqual(replay.messages, 2)
+        self.assertIn("us/tick", replay.report())
+        # Only commands are returned; the devices' discovery requests are captured but left out
+        self.assertTrue(all(command.msg.type in ("150", "161") for command in commands))
+        self.assertTrue(any(command.msg.type == "160" for command in replay.out_queue.sent))
+
+    def test_deterministic(self):
+        events = [event(self.start + datetime.timedelta(minutes=i * 7), "13,11,100,user%d,%d" % (i % 3 + 1, i % 2))
+                  for i in range(8)]
+        end = self.start + datetime.timedelta(hours=1)
+        first = self.replay(events, end)[1]
+        second = self.replay(events, end)[1]
+        self.assertGreater(len(first), 0)
+        self.assertEqual(diff_commands(first, second, resolution=1), [])
+
+    def test_inputs_and_commands_from_log(self):
+        lines = ["p11_logic_solver,  2016-11-05 18:00:00,250,  DEBUG   , Processing message [13,11,100,user1,1] " + RECEIVED,
+                 "p11_logic_solver,  2016-11-05 18:00:01,000,  DEBUG   , Processing message [02,11,005,,root=INFO] " + RECEIVED,
+                 "p16_wemo_gateway,  2016-11-05 18:00:01,500,  DEBUG   , Processing message [11,16,161,fylt1,on] " + RECEIVED,
+                 "p16_wemo_gateway,  2016-11-05 18:00:02,000,  DEBUG   , Processing message [02,16,161,fylt1,off] " + RECEIVED]
+        inputs = list(solver_inputs(parse_events(lines, where=RECEIVED)))
+        self.assertEqual([item.msg.raw for item in inputs], ["13,11,100,user1,1"])
+        recorded = list(solver_commands(parse_events(lines, where=RECEIVED)))
+        self.assertEqual([item.msg.raw for item in recorded], ["11,16,161,fylt1,on"])
+        when = time.mktime(self.start.timetuple())
+        self.assertEqual(format_commands(recorded), ["2016-11-05 18:00:00 16,161,fylt1=on"])
+        diff = diff_commands(recorded, [Command(when + 90, Message(raw="11,16,161,fylt1,on"))])
+        self.assertIn("+2016-11-05 18:01:00 16,161,fylt1=on", diff)
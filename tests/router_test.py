@@ -0,0 +1,119 @@
+from unittest import TestCase
+import multiprocessing
+import queue
+from rpihome.modules.message import Message
+from rpihome.modules.router import PeerChannels, Router
+
+
+class TestRouter(TestCase):
+    def setUp(self):
+        self.router = Router()
+        self.p11_queue = queue.Queue()
+        self.p16_queue = queue.Queue()
+        self.router.add_route("11", self.p11_queue)
+        self.router.add_route("16", self.p16_queue)
+
+    def test_route_to_destination(self):
+        self.assertTrue(self.router.route(Message(source="02", dest="16", type="161", name="fylt1", payload="on")))
+        self.assertEqual(Message(raw=self.p16_queue.get_nowait()).raw, "02,16,161,fylt1,on")
+        self.assertTrue(self.p11_queue.empty())
+
+    def test_route_unknown_destination(self):
+        self.assertFalse(self.router.route(Message(source="02", dest="12", type="999")))
+        self.assertTrue(self.p11_queue.empty())
+        self.assertTrue(self.p16_queue.empty())
+
+    def test_side_effects_by_type(self):
+        self.seen = []
+        self.router.add_side_effect("999", self.seen.append)
+        self.router.route(Message(source="02", dest="11", type="999"))
+        self.router.route(Message(source="02", dest="11", type="168"))
+        self.assertEqual(len(self.seen), 1)
+        self.assertEqual(self.seen[0].type, "999")
+        self.assertEqual(self.p11_queue.qsize(), 2)
+
+    def test_route_drops_unpackable(self):
+        with self.assertLogs("rpihome.modules.router", "WARNING"):
+            self.assertFalse(self.router.route(Message(raw="2,16,161,fylt1,on")))
+        self.assertTrue(self.p16_queue.empty())
+
+    def test_replace_route(self):
+        self.new_queue = queue.Queue()
+        self.router.add_route("11", self.new_queue)
+        self.router.route(Message(source="02", dest="11", type="168"))
+        self.assertTrue(self.p11_queue.empty())
+        self.assertEqual(self.new_queue.qsize(), 1)
+
+    def test_rates(self):
+        for i in range(5):
+            self.router.route(Message(source="11", dest="16", type="161", name="fylt1", payload="on"))
+        self.rates = self.router.rates()
+        self.assertGreater(self.rates["16"], 0)
+        self.assertEqual(self.rates["11"], 0)
+        self.assertEqual(self.router.rates()["16"], 0)
+
+    def test_peer_queues(self):
+        self.router.add_peers("11", "16")
+        self.assertEqual(self.router.peer_queues("11"), {"16": self.p16_queue})
+        self.assertEqual(self.router.peer_queues("16"), {"11": self.p11_queue})
+        self.assertEqual(self.router.peer_queues("02"), {})
+
+
+class TestPeerChannels(TestCase):
+    def setUp(self):
+        self.main_queue = queue.Queue()
+        self.p16_queue = queue.Queue()
+        self.channels = PeerChannels(self.main_queue, {"16": self.p16_queue})
+
+    def test_direct_and_relayed(self):
+        self.channels.put_nowait("11,16,161,fylt1,on")
+        self.channels.put_nowait("11,15,150,rpi,export DISPLAY=:0; xset s reset")
+        self.assertEqual(self.p16_queue.get_nowait(), "11,16,161,fylt1,on")
+        self.assertEqual(self.main_queue.get_nowait(), "11,15,150,rpi,export DISPLAY=:0; xset s reset")
+        self.assertEqual(self.channels.direct_count, 1)
+        self.assertEqual(self.channels.relay_count, 1)
+        self.assertEqual(self.channels.hops(), 1.5)
+
+    def test_messages_packed_on_the_way(self):
+        self.channels.put_nowait(Message(source="11", dest="16", type="161", name="fylt1", payload="on"))
+        self.assertEqual(Message(raw=self.p16_queue.get_nowait()).raw, "11,16,161,fylt1,on")
+        with self.assertLogs("rpihome.modules.router", "WARNING"):
+            self.channels.put_nowait(Message(source="11", dest="16", type="161", name="n" * 256))
+        self.assertTrue(self.p16_queue.empty())
+        self.assertEqual(self.channels.direct_count, 1)
+
+    def test_control_messages_relayed(self):
+        """ Restart, kill and log level messages for a peer still pass through main """
+        self.channels = PeerChannels(self.main_queue, {"11": self.p16_queue})
+        for type in ("900", "999", "005"):
+            self.channels.put_nowait(Message(source="02", dest="11", type=type).packed)
+        self.assertTrue(self.p16_queue.empty())
+        self.assertEqual(self.channels.relay_count, 3)
+        # p00 routes the relayed restart to p11 and runs its side effect
+        self.router = Router()
+        self.p11_queue = queue.Queue()
+        self.router.add_route("11", self.p11_queue)
+        self.restarts = []
+        self.router.add_side_effect("900", self.restarts.append)
+        self.router.route(Message(raw=self.main_queue.get_nowait()))
+        self.assertEqual([msg.raw for msg in self.restarts], ["02,11,900,,"])
+        self.assertEqual(Message(raw=self.p11_queue.get_nowait()).type, "900")
+
+    def test_hops_direct_and_relayed(self):
+        """ p11 -> p16 over process queues: one hop direct, two through a relay standing in for
+        p00, and the message arrives unchanged either way """
+        self.p00_queue = multiprocessing.Queue(-1)
+        self.p16_queue = multiprocessing.Queue(-1)
+        self.router = Router()
+        self.router.add_route("16", self.p16_queue)
+        self.data = Message(source="11", dest="16", type="161", name="fylt1", payload="on").packed
+        self.relayed = PeerChannels(self.p00_queue)
+        self.relayed.put_nowait(self.data)
+        self.router.route(Message(raw=self.p00_queue.get(timeout=5)))
+        self.assertEqual(self.p16_queue.get(timeout=5), self.data)
+        self.assertEqual(self.relayed.hops(), 2.0)
+        self.direct = PeerChannels(self.p00_queue, {"16": self.p16_queue})
+        self.direct.put_nowait(self.data)
+        self.assertEqual(self.p16_queue.get(timeout=5), self.data)
+        self.assertEqual(self.direct.hops(), 1.0)
+        self.assertTrue(self.p00_queue.empty())
@@ -0,0 +1,101 @@
+from unittest import TestCase
+import datetime
+import logging
+import os
+import queue
+import sys
+import time
+from rpihome.modules.log_events import LogEvent
+from rpihome.modules.message import Message
+from rpihome.modules.replay import Replay, diff_commands
+from rpihome.modules.rule_schedule import RuleSchedule
+# The solver process and the devices import their modules relative to the rpihome folder, as
+# when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rpihome"))
+from devices.device_wemo_br3lt2 import Wemo_br3lt2
+from devices.device_wemo_fylt1 import Wemo_fylt1
+from p11_logic_solver import LogicProcess
+
+
+class TestRuleSchedule(TestCase):
+    def setUp(self):
+        self.now = datetime.datetime(2016, 11, 5, 18, 0, 0)
+        self.schedule = RuleSchedule(["a", "b", "c"])
+
+    def test_all_due_first_and_on_input_change(self):
+        self.assertEqual(self.schedule.due(self.now, (False,)), ["a", "b", "c"])
+        for name, minutes in (("a", 10), ("b", 5), ("c", 20)):
+            self.schedule.reschedule(name, self.now + datetime.timedelta(minutes=minutes), self.now)
+        self.assertEqual(self.schedule.next_deadline(), self.now + datetime.timedelta(minutes=5))
+        self.assertEqual(self.schedule.due(self.now + datetime.timedelta(minutes=1), (False,)), [])
+        self.assertEqual(self.schedule.due(self.now + datetime.timedelta(minutes=2), (True,)), ["a", "b", "c"])
+
+    def test_only_deadlines_reached(self):
+        self.schedule.due(self.now, ())
+        for name, minutes in (("a", 10), ("b", 5), ("c", 20)):
+            self.schedule.reschedule(name, self.now + datetime.timedelta(minutes=minutes), self.now)
+        self.assertEqual(self.schedule.due(self.now + datetime.timedelta(minutes=10), ()), ["b", "a"])
+        self.assertEqual(self.schedule.next_deadline(), self.now + datetime.timedelta(minutes=20))
+        self.assertEqual(self.schedule.checks, 5)
+
+    def test_unknown_deadline_and_clock_going_back(self):
+        self.schedule.due(self.now, ())
+        self.schedule.reschedule("a", None, self.now)
+        self.assertEqual(self.schedule.due(self.now, ()), ["a"])
+        self.schedule.reschedule("a", self.now + datetime.timedelta(hours=1), self.now)
+        self.assertEqual(self.schedule.due(self.now - datetime.timedelta(seconds=1), ()), ["a", "b", "c"])
+
+    def test_disabled(self):
+        schedule = RuleSchedule(["a"], enabled=False)
+        for i in range(3):
+            self.assertEqual(schedule.due(self.now, ()), ["a"])
+            schedule.reschedule("a", self.now + datetime.timedelta(hours=1), self.now)
+        self.assertIsNone(schedule.next_deadline())
+
+
+class TestNextTransition(TestCase):
+    def test_time_of_day_edges(self):
+        device = Wemo_br3lt2("br3lt2", "192.168.86.32", queue.Queue())
+        device.check_rules(datetime=datetime.datetime(2016, 11, 5, 6, 30), homeArray=[True, False, False])
+        # The edge itself was just checked; the moment after it is next
+        self.assertEqual(device.next_transition(), datetime.datetime(2016, 11, 5, 6, 30, 0, 1))
+        device.check_rules(datetime=datetime.datetime(2016, 11, 5, 12, 0), homeArray=[True, False, False])
+        self.assertEqual(device.next_transition(), datetime.datetime(2016, 11, 5, 19, 0))
+        device.check_rules(datetime=datetime.datetime(2016, 11, 5, 20, 0), homeArray=[True, False, False])
+        self.assertEqual(device.next_transition(), datetime.datetime(2016, 11, 6, 0, 0))
+
+    def test_sun_edges(self):
+        device = Wemo_fylt1("fylt1", "192.168.86.21", queue.Queue())
+        device.check_rules(datetime=datetime.datetime(2016, 11, 5, 12, 0), homeArray=[False, False, False],
+                           utcOffset=datetime.timedelta(hours=-5))
+        self.assertEqual(device.next_transition(), device.sunset)
+
+
+class TestScheduledReplay(TestCase):
+    def setUp(self):
+        # The solver points the root logger at its log queue; put it back afterwards
+        root = logging.getLogger()
+        self.root_handlers, self.root_level = root.handlers, root.level
+
+    def tearDown(self):
+        root = logging.getLogger()
+        root.handlers, root.level = self.root_handlers, self.root_level
+
+    def replay(self, events, end, schedule_rules):
+        replay = Replay(LogicProcess(queue.Queue(), queue.Queue(), queue.Queue(), schedule_rules=schedule_rules),
+                        interval=60)
+        return replay, replay.run(events, end=time.mktime(end.timetuple()))
+
+    def test_same_commands_as_checking_every_tick(self):
+        # Friday morning through Sunday (across the end of DST), with people coming and going
+        start = datetime.datetime(2016, 11, 4, 4, 0, 0)
+        events = [LogEvent(time.mktime((start + datetime.timedelta(minutes=i * 97)).timetuple()), "p11_logic_solver",
+                           "DEBUG", Message(raw="13,11,100,user%d,%d" % (i % 3 + 1, (i // 3) % 2)))
+                  for i in range(40)]
+        end = start + datetime.timedelta(days=2, hours=20)
+        scheduled, expected = self.replay(events, end, True)
+        every_tick, actual = self.replay(events, end, False)
+        self.assertGreater(len(expected), 10)
+        self.assertEqual(diff_commands(expected, actual, resolution=1), [])
+        # Scheduled, a device is checked a few times an hour rather than every tick
+        self.assertLess(scheduled.solver.rule_schedule.checks, every_tick.solver.rule_schedule.checks / 10)
@@ -0,0 +1,119 @@
+from unittest import TestCase
+import datetime
+import logging
+import os
+import queue
+import sys
+import tempfile
+import time
+from rpihome.modules.log_events import LogEvent
+from rpihome.modules.message import Message
+from rpihome.modules.replay import Replay, diff_commands
+from rpihome.modules.rules import RuleSet, load_definitions, time_of_day
+# The solver process and the devices import their modules relative to the rpihome folder, as
+# when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rpihome"))
+from bench_rules import compare, inputs
+import devices.device as device
+from devices.device_rules import RuleWemo, create_devices
+import modules.sun as sun
+from p11_logic_solver import LogicProcess
+
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rpihome", "devices", "rules.json")
+
+
+class TestRuleSet(TestCase):
+    def setUp(self):
+        self.rules = RuleSet("test", [{"weekdays": [0, 1, 2, 3, 4], "all_home": [0], "between": ["06:00", "07:00"], "state": True},
+                                      {"weekdays": [0, 1, 2, 3, 4], "state": False}])
+        self.device = RuleWemo("test", "0.0.0.0", queue.Queue(), self.rules)
+
+    def check(self, when, home):
+        return self.device.check_rules(datetime=when, homeArray=home)
+
+    def test_time_of_day(self):
+        self.assertEqual(time_of_day("05:30"), datetime.time(5, 30))
+
+    def test_first_case_wins(self):
+        monday = datetime.datetime(2016, 11, 7)
+        self.assertIs(self.check(monday.replace(hour=6), [True, False, False]), True)
+        self.assertIs(self.check(monday.replace(hour=7), [True, False, False]), True)
+        self.assertIs(self.check(monday.replace(hour=7, second=1), [True, False, False]), False)
+        self.assertIs(self.check(monday.replace(hour=6, minute=30), [False, True, False]), False)
+        self.assertEqual(self.rules.times, (datetime.time(6, 0), datetime.time(7, 0)))
+
+    def test_no_case_leaves_state(self):
+        saturday = datetime.datetime(2016, 11, 12, 6, 30)
+        self.device.state = True
+        self.assertIs(self.check(saturday, [True, False, False]), True)
+
+    def test_next_transition(self):
+        self.check(datetime.datetime(2016, 11, 7, 6, 30), [True, False, False])
+        self.assertEqual(self.device.next_transition(), datetime.datetime(2016, 11, 7, 7, 0))
+
+    def test_bad_rules(self):
+        with self.assertRaises(ValueError):
+            RuleSet("test", [{"weekdays": [0], "state": "on"}])
+        with self.assertRaises(ValueError):
+            RuleSet("test", [{"moon": "full", "state": True}])
+
+
+class TestRulesFile(TestCase):
+    def setUp(self):
+        # Turning lights on and off is logged at info; keep it quiet
+        self.root_level = logging.getLogger().level
+        logging.getLogger().setLevel(logging.WARNING)
+        self.definitions = load_definitions(RULES_FILE)
+
+    def tearDown(self):
+        logging.getLogger().setLevel(self.root_level)
+
+    def test_matches_hand_written_classes(self):
+        cases = list(inputs(datetime.datetime(2016, 11, 7), datetime.timedelta(minutes=10)))
+        for definition in self.definitions:
+            if "rules" in definition:
+                mismatches, timings = compare(definition, cases, queue.Queue())
+                self.assertEqual(mismatches, [], definition["name"])
+
+    def test_create_devices(self):
+        devices, automated = create_devices(self.definitions, queue.Queue())
+        names = [device.name for device in devices]
+        self.assertEqual(names, ["rpi", "fylt1", "bylt1", "ewlt1", "cclt1", "lrlt1", "lrlt2", "drlt1",
+                                 "br1lt2", "br2lt2", "br3lt1", "br3lt2"])
+        self.assertEqual(len(automated), 9)
+        self.assertEqual(type(devices[2]).__name__, "Wemo_bylt1")
+
+
+class TestRulesReplay(TestCase):
+    def setUp(self):
+        # The solver points the root logger at its log queue; put it back afterwards
+        root = logging.getLogger()
+        self.root_handlers, self.root_level = root.handlers, root.level
+
+    def tearDown(self):
+        root = logging.getLogger()
+        root.handlers, root.level = self.root_handlers, self.root_level
+
+    def test_same_commands_as_classes(self):
+        start = datetime.datetime(2016, 11, 4, 4, 0, 0)
+        events = [LogEvent(time.mktime((start + datetime.timedelta(minutes=i * 97)).timetuple()), "p11_logic_solver",
+                           "DEBUG", Message(raw="13,11,100,user%d,%d" % (i % 3 + 1, (i // 3) % 2)))
+                  for i in range(40)]
+        end = time.mktime((start + datetime.timedelta(days=2, hours=20)).timetuple())
+        results = []
+        for rules_file in (RULES_FILE, None):
+            replay = Replay(LogicProcess(queue.Queue(), queue.Queue(), queue.Queue(), rules_file=rules_file), interval=60)
+            results.append(replay.run(events, end=end))
+        self.assertGreater(len(results[0]), 10)
+        self.assertEqual(diff_commands(results[0], results[1], resolution=1), [])
+
+    def test_devices_read_solver_sun_table(self):
+        sun_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(sun_dir.cleanup)
+        solver = LogicProcess(queue.Queue(), queue.Queue(), queue.Queue(), sun_table_dir=sun_dir.name)
+        solver.load_sun_table()
+        self.addCleanup(solver.sun_table.close)
+        # The table the solver registers is the one the devices look sun times up in
+        self.assertIs(device.ephemeris, sun.ephemeris)
+        self.assertIs(sun.TABLES[(sun.LAT, sun.LONG)], solver.sun_table)
@@ -7,12 +7,15 @@ import copy
 import datetime
 import logging
 import multiprocessing
+import os
 import unittest
 import sys
 
 if __name__ == "__main__": sys.path.append("..")
 from rpihome.modules.schedule import Condition, OnRange, Day, Week, GoogleSheetsSchedule, GoogleSheetToSched
-from rpihome.devices.device import Device
+# The devices import their modules relative to the rpihome folder, as when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rpihome"))
+from devices.device import Device
 
 
 # Define test class *******************************************************************************
@@ -0,0 +1,73 @@
+from unittest import TestCase, skipIf
+import datetime
+import os
+import tempfile
+import rpihome.modules.sun_table as sun_table
+from rpihome.modules.sun import TABLES, Sun, ephemeris
+from rpihome.modules.sun_table import HEADER, ROW, SunTable, compute_year, table_filename
+
+
+class TestSunTable(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.table = SunTable(self.dir.name)
+        self.offset = datetime.timedelta(hours=-6)
+
+    def tearDown(self):
+        self.table.close()
+        ephemeris.cache_clear()
+        self.dir.cleanup()
+
+    def test_matches_sun(self):
+        s = Sun(lat=self.table.lat, long=self.table.long)
+        day = datetime.date(2016, 1, 1)
+        for i in range(366):
+            self.assertEqual(self.table.ephemeris(day, self.offset), s.ephemeris(day, self.offset))
+            day += datetime.timedelta(days=1)
+
+    def test_twilight_order(self):
+        times = self.table.lookup(datetime.date(2016, 11, 5), self.offset)
+        self.assertTrue(times.nautical_dawn < times.civil_dawn < times.sunrise < times.solarnoon <
+                        times.sunset < times.civil_dusk < times.nautical_dusk)
+        self.assertEqual(times.sunrise.date(), datetime.date(2016, 11, 5))
+
+    def test_saved_and_reused(self):
+        expected = self.table.lookup(datetime.date(2017, 3, 1))
+        self.table.close()
+        filename = table_filename(self.dir.name, 2017)
+        self.assertEqual(os.path.getsize(filename), HEADER.size + 365 * ROW.size)
+        mtime = os.path.getmtime(filename)
+        other = SunTable(self.dir.name)
+        self.assertEqual(other.lookup(datetime.date(2017, 3, 1)), expected)
+        self.assertEqual(os.path.getmtime(filename), mtime)
+        other.close()
+        # A damaged file is rebuilt
+        with open(filename, "r+b") as f:
+            f.truncate(100)
+        other = SunTable(self.dir.name)
+        self.assertEqual(other.lookup(datetime.date(2017, 3, 1)), expected)
+        other.close()
+
+    def test_registered(self):
+        ephemeris.cache_clear()
+        self.table.register()
+        self.assertIs(TABLES[(self.table.lat, self.table.long)], self.table)
+        self.assertEqual(ephemeris(datetime.date(2016, 6, 21), self.offset),
+                         Sun(lat=self.table.lat, long=self.table.long).ephemeris(datetime.date(2016, 6, 21), self.offset))
+        self.assertIn(2016, self.table.years)
+        self.table.close()
+        self.assertNotIn((self.table.lat, self.table.long), TABLES)
+
+    @skipIf(sun_table.numpy is None, "numpy not installed")
+    def test_numpy_matches_scalar(self):
+        vectorized = compute_year(2016)
+        numpy = sun_table.numpy
+        try:
+            sun_table.numpy = None
+            scalar = compute_year(2016)
+        finally:
+            sun_table.numpy = numpy
+        self.assertEqual(len(vectorized), len(scalar))
+        for offset in range(HEADER.size, len(scalar), ROW.size):
+            for a, b in zip(ROW.unpack_from(vectorized, offset), ROW.unpack_from(scalar, offset)):
+                self.assertAlmostEqual(a, b, places=9)
@@ -1,6 +1,6 @@
 from unittest import TestCase
 import datetime
-from rpihome.modules.sun import Sun
+from rpihome.modules.sun import Sun, ephemeris
 
 
 class TestSun(TestCase):
@@ -20,3 +20,27 @@ class TestSun(TestCase):
         self.sunset = datetime.datetime.combine(datetime.datetime.today().date(), self.sunset_time)
         self.sunset_compare = datetime.datetime.now()
         self.assertEqual(self.sunset.date(), datetime.datetime.now().date())
+
+
+class TestEphemeris(TestCase):
+    def test_matches_sun(self):
+        s = Sun(lat=38.566, long=-90.410)
+        day = datetime.date(2016, 1, 1)
+        for i in range(0, 366, 5):
+            when = datetime.datetime.combine(day + datetime.timedelta(days=i), datetime.time(18, 30))
+            offset = datetime.timedelta(hours=-5 if 70 < i < 310 else -6)
+            times = ephemeris(when.date(), offset)
+            self.assertEqual(times.sunrise.date(), when.date())
+            self.assertEqual(times.sunset.date(), when.date())
+            self.assertTrue(times.sunrise < times.solarnoon < times.sunset)
+            for value, expected in ((times.sunrise, s.sunrise(when, offset)), (times.sunset, s.sunset(when, offset))):
+                self.assertLess(abs((value - datetime.datetime.combine(when.date(), expected)).total_seconds()), 60)
+
+    def test_cached(self):
+        ephemeris.cache_clear()
+        first = ephemeris(datetime.date(2016, 6, 21), datetime.timedelta(hours=-5))
+        for i in range(100):
+            self.assertIs(ephemeris(datetime.date(2016, 6, 21), datetime.timedelta(hours=-5)), first)
+        self.assertEqual(ephemeris.cache_info().misses, 1)
+        self.assertEqual(ephemeris.cache_info().hits, 100)
+        self.assertNotEqual(ephemeris(datetime.date(2016, 6, 21), datetime.timedelta(hours=-6)), first)
@@ -0,0 +1,52 @@
+from unittest import TestCase
+import datetime
+import multiprocessing
+import time
+from rpihome.modules.channel import PriorityChannel
+from rpihome.modules.wakeup import seconds_until, wait_for_input
+from rpihome.modules.work_queue import WorkQueue
+
+
+class TestWakeup(TestCase):
+    def setUp(self):
+        self.queue1 = multiprocessing.Queue(-1)
+        self.queue2 = multiprocessing.Queue(-1)
+
+    def tearDown(self):
+        self.queue1.close()
+        self.queue2.close()
+
+    def test_wait_times_out_when_idle(self):
+        self.start = time.monotonic()
+        self.assertEqual(wait_for_input([self.queue1, self.queue2], 0.05), [])
+        self.assertGreaterEqual(time.monotonic() - self.start, 0.04)
+
+    def test_wait_wakes_on_input(self):
+        self.queue2.put_nowait("02,16,161,fylt1,on")
+        self.start = time.monotonic()
+        self.ready = wait_for_input([self.queue1, self.queue2], 5)
+        self.assertLess(time.monotonic() - self.start, 1)
+        self.assertEqual(self.ready, [self.queue2])
+        self.assertEqual(self.queue2.get_nowait(), "02,16,161,fylt1,on")
+
+    def test_seconds_until(self):
+        self.now = datetime.datetime(2016, 12, 5, 6, 30)
+        self.assertEqual(seconds_until(self.now + datetime.timedelta(seconds=5),
+                                       self.now + datetime.timedelta(seconds=2),
+                                       now=self.now), 2)
+        self.assertEqual(seconds_until(self.now + datetime.timedelta(seconds=-5), now=self.now), 0)
+
+    def test_wait_returns_immediately_for_pending_work(self):
+        self.work_queue = WorkQueue()
+        self.assertEqual(wait_for_input([self.queue1, self.work_queue], 0), [])
+        self.work_queue.put_nowait("work")
+        self.start = time.monotonic()
+        self.assertEqual(wait_for_input([self.queue1, self.work_queue], 5), [self.work_queue])
+        self.assertLess(time.monotonic() - self.start, 1)
+
+    def test_wait_returns_channel_with_backlog(self):
+        self.channel = PriorityChannel()
+        self.assertEqual(wait_for_input([self.channel], 0), [])
+        self.channel.backlog.append((None, "02,11,168,,"))
+        self.assertEqual(wait_for_input([self.queue1, self.channel], 0), [self.channel])
+        self.channel.close()
@@ -0,0 +1,37 @@
+from unittest import TestCase
+import queue
+from rpihome.modules.message import Message
+from rpihome.modules.work_queue import WorkQueue
+
+
+class TestWorkQueue(TestCase):
+    def setUp(self):
+        self.queue = WorkQueue()
+
+    def test_fifo_order(self):
+        self.queue.put_nowait("a")
+        self.queue.put_nowait("b")
+        self.assertEqual(self.queue.qsize(), 2)
+        self.assertEqual(self.queue.get_nowait(), "a")
+        self.assertEqual(self.queue.get_nowait(), "b")
+        self.assertTrue(self.queue.empty())
+
+    def test_get_from_empty_raises(self):
+        with self.assertRaises(queue.Empty):
+            self.queue.get_nowait()
+
+    def test_holds_message_objects(self):
+        self.msg = Message(source="16", dest="11", type="160A", name="fylt1", payload="found")
+        self.queue.put_nowait(self.msg)
+        self.assertIs(self.queue.get_nowait(), self.msg)
+
+    def test_fifo_order_interleaved(self):
+        """ Order is kept across many messages, with gets interleaved with puts """
+        self.received = []
+        for i in range(1000):
+            self.queue.put_nowait(i)
+            if i % 3 == 0:
+                self.received.append(self.queue.get_nowait())
+        while self.queue.empty() is False:
+            self.received.append(self.queue.get_nowait())
+        self.assertEqual(self.received, list(range(1000)))